@@ -0,0 +1,33 @@
+import struct
+
+from utils.db_accessor import _COPY_BINARY_HEADER, _COPY_BINARY_TRAILER, _CopyStream, _copy_text_line
+
+
+def read_all(stream, size):
+    parts = []
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return b"".join(parts)
+        parts.append(chunk)
+
+
+def test_binary_copy_header_and_trailer():
+    # Signature, int32 flags, int32 header extension length
+    assert _COPY_BINARY_HEADER == b"PGCOPY\n\xff\r\n\x00" + b"\x00\x00\x00\x00" + b"\x00\x00\x00\x00"
+    # int16 field count of -1 ends the data
+    assert _COPY_BINARY_TRAILER == b"\xff\xff"
+
+
+def test_binary_copy_stream_wraps_tuples_in_any_read_size():
+    tuples = [struct.pack(">hi", 1, -1), struct.pack(">hiq", 1, 8, 7)]
+    expected = _COPY_BINARY_HEADER + b"".join(tuples) + _COPY_BINARY_TRAILER
+    for size in (1, 5, 19, 1024, -1):
+        stream = _CopyStream(tuples, encode=bytes, header=_COPY_BINARY_HEADER, trailer=_COPY_BINARY_TRAILER)
+        assert read_all(stream, size) == expected
+        assert stream.count == 2
+
+
+def test_text_copy_escapes_and_nulls():
+    line = _copy_text_line(["a\tb\\c\nd", None, True, b"\x01\xff", {"k": 1}])
+    assert line == b'a\\tb\\\\c\\nd\t\\N\tt\t\\\\x01ff\t{"k": 1}\n'
@@ -0,0 +1,180 @@
+import struct
+
+import pytest
+
+from utils.esri_pbf import EsriPbfDecoder
+
+
+# ----------------------------------------------------------------------
+# Minimal protobuf encoder for building FeatureCollectionPBuffer payloads
+# ----------------------------------------------------------------------
+def varint(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def uint_field(number, value):
+    return varint(number << 3) + varint(value)
+
+
+def bytes_field(number, payload):
+    return varint(number << 3 | 2) + varint(len(payload)) + payload
+
+
+def string_field(number, text):
+    return bytes_field(number, text.encode("utf-8"))
+
+
+def double_field(number, value):
+    return varint(number << 3 | 1) + struct.pack("<d", value)
+
+
+def float_field(number, value):
+    return varint(number << 3 | 5) + struct.pack("<f", value)
+
+
+def packed_field(number, values):
+    return bytes_field(number, b"".join(varint(v) for v in values))
+
+
+def geometry(parts):
+    """Geometry message: part lengths plus zigzag deltas running across all parts."""
+    coords, prev = [], (0, 0)
+    for part in parts:
+        for x, y in part:
+            coords += [zigzag(x - prev[0]), zigzag(y - prev[1])]
+            prev = (x, y)
+    return packed_field(2, [len(part) for part in parts]) + packed_field(3, coords)
+
+
+def transform(origin, scale, translate):
+    return (
+        uint_field(1, origin)
+        + bytes_field(2, double_field(1, scale[0]) + double_field(2, scale[1]))
+        + bytes_field(3, double_field(1, translate[0]) + double_field(2, translate[1]))
+    )
+
+
+def field(name, field_type):
+    return bytes_field(13, string_field(1, name) + uint_field(2, field_type))
+
+
+def feature(values, geom):
+    return bytes_field(15, b"".join(bytes_field(1, v) for v in values) + bytes_field(2, geom))
+
+
+def collection(query_result):
+    return bytes_field(2, query_result)
+
+
+# ----------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------
+def test_polygon_with_hole_and_attribute_values():
+    outer = [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]
+    hole = [(2, 2), (2, 4), (4, 4), (2, 2)]
+    result = (
+        string_field(1, "OBJECTID")
+        + uint_field(7, 3)
+        + bytes_field(8, uint_field(1, 4326))
+        + uint_field(9, 1)
+        + bytes_field(12, transform(0, (0.5, 0.5), (100.0, 50.0)))
+        + field("OBJECTID", 6)
+        + field("NAME", 4)
+        + field("AREA", 3)
+        + field("RATIO", 2)
+        + field("CODE", 0)
+        + field("BIG", 1)
+        + field("COUNT", 1)
+        + field("FLAG", 1)
+        + field("NOTE", 4)
+        + feature(
+            [
+                uint_field(5, 7),  # uint32
+                string_field(1, "Zone Ä"),
+                double_field(3, 1234.5),
+                float_field(2, 0.25),
+                uint_field(4, zigzag(-3)),  # sint32
+                uint_field(6, (1 << 64) - 5),  # int64, two's complement
+                uint_field(8, zigzag(-(1 << 40))),  # sint64
+                uint_field(9, 1),  # bool
+                b"",  # Value with no oneof set (null)
+            ],
+            geometry([outer, hole]),
+        )
+    )
+    decoded = EsriPbfDecoder.decode(collection(bytes_field(1, result)))
+
+    assert decoded["objectIdFieldName"] == "OBJECTID"
+    assert decoded["geometryType"] == "esriGeometryPolygon"
+    assert decoded["spatialReference"] == {"wkid": 4326}
+    assert decoded["exceededTransferLimit"] is True
+    assert decoded["fields"][0] == {"name": "OBJECTID", "type": "esriFieldTypeOID"}
+    assert decoded["fields"][1] == {"name": "NAME", "type": "esriFieldTypeString"}
+
+    [feat] = decoded["features"]
+    assert feat["attributes"] == {
+        "OBJECTID": 7,
+        "NAME": "Zone Ä",
+        "AREA": 1234.5,
+        "RATIO": 0.25,
+        "CODE": -3,
+        "BIG": -5,
+        "COUNT": -(1 << 40),
+        "FLAG": True,
+        "NOTE": None,
+    }
+    # upperLeft origin: y grows downward from the translate
+    assert feat["geometry"] == {
+        "rings": [
+            [[100.0, 50.0], [105.0, 50.0], [105.0, 45.0], [100.0, 45.0], [100.0, 50.0]],
+            [[101.0, 49.0], [101.0, 48.0], [102.0, 48.0], [101.0, 49.0]],
+        ]
+    }
+
+
+def test_multipart_line_with_lower_left_origin():
+    result = (
+        uint_field(7, 2)
+        + bytes_field(12, transform(1, (1.0, 2.0), (-10.0, 20.0)))
+        + field("ID", 1)
+        + feature([uint_field(5, 1)], geometry([[(0, 0), (3, 4)], [(1, 1), (2, 2), (5, 5)]]))
+    )
+    decoded = EsriPbfDecoder.decode(collection(bytes_field(1, result)))
+
+    assert decoded["geometryType"] == "esriGeometryPolyline"
+    [feat] = decoded["features"]
+    assert feat["attributes"] == {"ID": 1}
+    assert feat["geometry"] == {
+        "paths": [
+            [[-10.0, 20.0], [-7.0, 28.0]],
+            [[-9.0, 22.0], [-8.0, 24.0], [-5.0, 30.0]],
+        ]
+    }
+
+
+def test_count_result():
+    decoded = EsriPbfDecoder.decode(collection(bytes_field(2, uint_field(1, 123456))))
+    assert decoded == {"count": 123456}
+
+
+def test_object_ids_result_packed_and_unpacked():
+    ids_result = string_field(1, "FID") + packed_field(3, [1, 2, 300]) + uint_field(3, 70000)
+    decoded = EsriPbfDecoder.decode(collection(bytes_field(3, ids_result)))
+    assert decoded == {"objectIdFieldName": "FID", "objectIds": [1, 2, 300, 70000]}
+
+
+def test_json_error_body_is_rejected():
+    with pytest.raises(ValueError):
+        EsriPbfDecoder.decode(b'{"error": {"code": 400, "message": "Invalid format"}}')
@@ -0,0 +1,26 @@
+import pytest
+
+from utils.featureserver_downloader import FeatureServerDownloader
+
+
+def test_pbf_quantization_geographic_uses_degrees():
+    assert FeatureServerDownloader.pbf_quantization(4326) == {
+        "mode": "edit",
+        "originPosition": "upperLeft",
+        "tolerance": 1e-8,
+    }
+
+
+def test_pbf_quantization_web_mercator_uses_meters():
+    assert FeatureServerDownloader.pbf_quantization(3857)["tolerance"] == pytest.approx(1e-3)
+
+
+def test_pbf_quantization_state_plane_uses_us_survey_feet():
+    # EPSG:2277 is NAD83 / Texas Central (ftUS): 1 mm = 0.0032808333 ftUS
+    tolerance = FeatureServerDownloader.pbf_quantization(2277)["tolerance"]
+    assert tolerance == pytest.approx(1e-3 / 0.3048006096012192)
+
+
+def test_downloader_sends_quantization_for_its_outsr():
+    downloader = FeatureServerDownloader(epsg_code=2277)
+    assert downloader.quantization == FeatureServerDownloader.pbf_quantization(2277)
@@ -0,0 +1,138 @@
+import os
+import struct
+import uuid
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+import shapely
+
+from utils.postgis_loader import PostGISLoader
+
+NULL = struct.pack(">i", -1)
+TYPES = {
+    "flag": "boolean",
+    "n": "bigint",
+    "x": "double precision",
+    "at": "timestamptz",
+    "local": "timestamp",
+    "name": "text",
+}
+
+
+def field(payload):
+    return struct.pack(">i", len(payload)) + payload
+
+
+def ewkb_point(x, y, srid):
+    """Little-endian EWKB point with the SRID flag set."""
+    return struct.pack("<BIIdd", 1, 0x20000001, srid, x, y)
+
+
+@pytest.fixture
+def frame():
+    return gpd.GeoDataFrame(
+        {
+            "flag": pd.Series([True, None, False], dtype=object),
+            "n": [42, None, -1],
+            "x": [1.5, float("nan"), -0.25],
+            "at": ["2000-01-01T00:00:01Z", None, "2000-01-01T01:00:00+02:00"],
+            "local": ["2000-01-02 00:00:00.000", None, "1999-12-31 23:59:59.500"],
+            "name": ["Zoné", None, "tab\there"],
+        },
+        geometry=[shapely.Point(1, 2), None, shapely.Point(-71.5, 42.25)],
+        crs="EPSG:4326",
+    )
+
+
+def test_encode_chunk_matches_binary_copy_layout(frame):
+    rows = PostGISLoader(db=None)._encode_chunk(frame, TYPES, 4326)
+
+    assert rows[0] == (
+        struct.pack(">h", 7)
+        + field(b"\x01")
+        + field(struct.pack(">q", 42))
+        + field(struct.pack(">d", 1.5))
+        + field(struct.pack(">q", 1_000_000))  # microseconds since 2000-01-01 UTC
+        + field(struct.pack(">q", 86_400_000_000))
+        + field("Zoné".encode("utf-8"))
+        + field(ewkb_point(1.0, 2.0, 4326))
+    )
+
+
+def test_encode_chunk_nulls_and_none_geometry(frame):
+    rows = PostGISLoader(db=None)._encode_chunk(frame, TYPES, 4326)
+    assert rows[1] == struct.pack(">h", 7) + NULL * 7
+
+
+def test_encode_chunk_negative_values_and_offsets(frame):
+    rows = PostGISLoader(db=None)._encode_chunk(frame, TYPES, 4326)
+
+    assert rows[2] == (
+        struct.pack(">h", 7)
+        + field(b"\x00")
+        + field(struct.pack(">q", -1))
+        + field(struct.pack(">d", -0.25))
+        # 01:00+02:00 is 23:00 UTC the day before the epoch
+        + field(struct.pack(">q", -3_600_000_000))
+        + field(struct.pack(">q", -500_000))
+        + field(b"tab\there")
+        + field(ewkb_point(-71.5, 42.25, 4326))
+    )
+
+
+def test_missing_column_is_encoded_as_null(frame):
+    rows = PostGISLoader(db=None)._encode_chunk(frame, {"absent": "text"}, 4326)
+    assert rows[0] == struct.pack(">h", 2) + NULL + field(ewkb_point(1.0, 2.0, 4326))
+
+
+# ----------------------------------------------------------------------
+# Round trip against a real PostGIS, e.g.:
+#   docker compose --profile db up -d postgis
+#   POSTGRE_HOST=localhost POSTGRE_USER=postgres POSTGRE_PASSWORD=postgres python -m pytest
+# ----------------------------------------------------------------------
+def _postgis_available():
+    if not os.environ.get("POSTGRE_HOST"):
+        return False
+    import psycopg2
+
+    try:
+        psycopg2.connect(
+            dbname="postgres",
+            user=os.environ.get("POSTGRE_USER"),
+            password=os.environ.get("POSTGRE_PASSWORD"),
+            host=os.environ["POSTGRE_HOST"],
+            port=os.environ.get("POSTGRE_PORT", "5432"),
+            connect_timeout=3,
+        ).close()
+    except psycopg2.OperationalError:
+        return False
+    return True
+
+
+@pytest.mark.skipif(not _postgis_available(), reason="PostGIS not reachable (set POSTGRE_HOST)")
+def test_round_trip_through_postgis(frame):
+    from utils.db_accessor import DBAccessor
+
+    table = f"copy_round_trip_{uuid.uuid4().hex[:8]}"
+    with DBAccessor(os.environ.get("POSTGRE_TEST_DB", "collector_test")) as db:
+        try:
+            loaded = PostGISLoader(db).load_chunks([frame], table, srid=4326, types=TYPES)
+            with db.cursor() as cur:
+                cur.execute(
+                    f'SELECT flag, n, x, at, local, name, ST_SRID(geom), ST_AsText(geom) FROM "{table}" ORDER BY n NULLS FIRST'
+                )
+                rows = cur.fetchall()
+        finally:
+            db.execute(f'DROP TABLE IF EXISTS "{table}"')
+
+    assert loaded == 3
+    assert rows[0] == (None, None, None, None, None, None, None, None)
+    flag, n, x, at, local, name, srid, wkt = rows[1]
+    assert (flag, n, x, name, srid, wkt) == (False, -1, -0.25, "tab\there", 4326, "POINT(-71.5 42.25)")
+    assert at == pd.Timestamp("1999-12-31T23:00:00Z").to_pydatetime()
+    assert local == pd.Timestamp("1999-12-31 23:59:59.5").to_pydatetime()
+    flag, n, x, at, local, name, srid, wkt = rows[2]
+    assert (flag, n, x, name, srid, wkt) == (True, 42, 1.5, "Zoné", 4326, "POINT(1 2)")
+    assert at == pd.Timestamp("2000-01-01T00:00:01Z").to_pydatetime()
+    assert local == pd.Timestamp("2000-01-02").to_pydatetime()
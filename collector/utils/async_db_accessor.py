@@ -0,0 +1,225 @@
+"""
+Async counterpart of DBAccessor
+-------------------------------
+asyncpg-based access for collectors and services running on asyncio, so a
+slow query does not block the event loop.
+
+Same environment variables and bootstrap as DBAccessor (the database is
+created on first use, PostGIS can be enabled), plus:
+    - a connection pool (asyncpg resets connections between uses and
+      closes ones idle for too long)
+    - prepared-statement caching: asyncpg prepares every query and keeps
+      the plan per connection, so repeated queries skip parsing/planning
+    - bulk COPY from (async) iterables and streaming reads
+
+Queries use asyncpg's ``$1, $2`` placeholders, not ``%s``.
+
+Usage:
+    async with AsyncDBAccessor("spatial") as db:
+        await db.enable_postgis()
+        rows = await db.fetch("SELECT id FROM parcels WHERE zone = $1", "R1")
+
+A throwaway PostGIS for local runs: ``docker compose --profile db up postgis``.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable, List, Optional, Sequence, Union
+
+import asyncpg
+
+
+class AsyncDBAccessor:
+    def __init__(
+        self,
+        db_name: str,
+        min_connections: int = 1,
+        max_connections: Optional[int] = None,
+        statement_cache_size: int = 1024,
+        max_inactive_connection_lifetime: float = 300.0,
+    ):
+        """
+        Args:
+            db_name: Database to use (created on first use if missing).
+            min_connections: Connections opened when the pool is created.
+            max_connections: Pool size cap. Defaults to $POSTGRE_POOL_MAX or 10.
+            statement_cache_size: Prepared statements cached per connection.
+            max_inactive_connection_lifetime: Seconds before idle connections are closed.
+        """
+        if not db_name:
+            raise ValueError("db_name is required")
+        self.db_name = db_name
+        self.db_user = os.environ.get("POSTGRE_USER")
+        self.db_password = os.environ.get("POSTGRE_PASSWORD")
+        self.db_host = os.environ.get("POSTGRE_HOST")
+        self.db_port = int(os.environ.get("POSTGRE_PORT", "5432"))
+        self.min_connections = min_connections
+        self.max_connections = max_connections or int(os.environ.get("POSTGRE_POOL_MAX", "10"))
+        self.statement_cache_size = statement_cache_size
+        self.max_inactive_connection_lifetime = max_inactive_connection_lifetime
+        self.logger = logging.getLogger(__name__)
+        self.pool: Optional[asyncpg.Pool] = None
+        # Serializes pool creation when several coroutines make their first call at once
+        self._pool_lock = asyncio.Lock()
+
+    def _connect_kwargs(self, database: str):
+        return dict(
+            user=self.db_user,
+            password=self.db_password,
+            host=self.db_host,
+            port=self.db_port,
+            database=database,
+        )
+
+    async def create_database_if_not_exists(self):
+        """Create the database if it doesn't exist (via the default 'postgres' database)."""
+        conn = None
+        try:
+            conn = await asyncpg.connect(**self._connect_kwargs("postgres"))
+            exists = await conn.fetchval("SELECT 1 FROM pg_database WHERE datname = $1", self.db_name)
+            if not exists:
+                await conn.execute(f'CREATE DATABASE "{self.db_name}"')
+                self.logger.info(f"Created database: {self.db_name}")
+            else:
+                self.logger.info(f"Database already exists: {self.db_name}")
+        except Exception as e:
+            self.logger.error(f"Failed to create database: {e}")
+            raise
+        finally:
+            if conn:
+                await conn.close()
+
+    async def connect(self) -> asyncpg.Pool:
+        """Create the connection pool. Creates the database if it doesn't exist."""
+        if self.pool is not None:
+            return self.pool
+        async with self._pool_lock:
+            if self.pool is None:
+                await self.create_database_if_not_exists()
+                try:
+                    self.pool = await asyncpg.create_pool(
+                        min_size=self.min_connections,
+                        max_size=self.max_connections,
+                        statement_cache_size=self.statement_cache_size,
+                        max_inactive_connection_lifetime=self.max_inactive_connection_lifetime,
+                        **self._connect_kwargs(self.db_name),
+                    )
+                    self.logger.info(
+                        f"Connected to database: {self.db_name} (pool of up to {self.max_connections})"
+                    )
+                except Exception as e:
+                    self.logger.error(f"Failed to connect to database: {e}")
+                    raise
+        return self.pool
+
+    async def close(self):
+        async with self._pool_lock:
+            if self.pool is not None:
+                pool, self.pool = self.pool, None
+                await pool.close()
+                self.logger.info("Database connection closed")
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[asyncpg.Connection]:
+        """Borrow a pooled connection for the duration of the block."""
+        pool = await self.connect()
+        async with pool.acquire() as conn:
+            yield conn
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[asyncpg.Connection]:
+        """Run the block in one transaction on one connection (commit at the end, roll back on error)."""
+        async with self.connection() as conn:
+            async with conn.transaction():
+                yield conn
+
+    async def enable_postgis(self):
+        """Enable PostGIS extension in the database."""
+        try:
+            await self.execute("CREATE EXTENSION IF NOT EXISTS postgis;")
+            self.logger.info("PostGIS extension enabled")
+        except Exception as e:
+            self.logger.error(f"Failed to enable PostGIS: {e}")
+            raise
+
+    async def execute(self, query: str, *args) -> str:
+        """Execute a SQL query; returns the command status (e.g. "INSERT 0 1")."""
+        try:
+            async with self.connection() as conn:
+                return await conn.execute(query, *args)
+        except Exception as e:
+            self.logger.error(f"Query execution failed: {e}")
+            raise
+
+    async def executemany(self, query: str, args: Iterable[Sequence[Any]]):
+        """Execute one (prepared) statement for each argument tuple, in one transaction."""
+        async with self.transaction() as conn:
+            await conn.executemany(query, args)
+
+    async def fetch(self, query: str, *args) -> List[asyncpg.Record]:
+        async with self.connection() as conn:
+            return await conn.fetch(query, *args)
+
+    async def fetchrow(self, query: str, *args) -> Optional[asyncpg.Record]:
+        async with self.connection() as conn:
+            return await conn.fetchrow(query, *args)
+
+    async def fetchval(self, query: str, *args) -> Any:
+        async with self.connection() as conn:
+            return await conn.fetchval(query, *args)
+
+    async def stream(self, query: str, *args, batch_size: int = 10_000) -> AsyncIterator[List[asyncpg.Record]]:
+        """
+        Yield the result of a query in batches of up to batch_size rows
+        through a server-side cursor, so memory stays flat.
+        """
+        async with self.transaction() as conn:
+            cursor = await conn.cursor(query, *args)
+            while True:
+                rows = await cursor.fetch(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    async def copy_records(
+        self,
+        table: str,
+        columns: Sequence[str],
+        records: Union[Iterable[Sequence[Any]], AsyncIterator[Sequence[Any]]],
+    ) -> int:
+        """
+        Bulk load rows with binary COPY (asyncpg encodes each column by its type).
+
+        Args:
+            table: Target table ("table" or "schema.table").
+            columns: Column names, in the order of each record's values.
+            records: Iterable or async iterable of tuples.
+
+        Returns:
+            int: Number of rows copied.
+        """
+        schema, _, name = table.rpartition(".")
+        started = time.perf_counter()
+        try:
+            async with self.connection() as conn:
+                status = await conn.copy_records_to_table(
+                    name, records=records, columns=list(columns), schema_name=schema or None
+                )
+        except Exception as e:
+            self.logger.error(f"❌ COPY into {table} failed: {e}")
+            raise
+        count = int(status.split()[-1])
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else float("inf")
+        self.logger.info(f"✅ Copied {count:,} rows into {table} in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+        return count
@@ -0,0 +1,132 @@
+"""
+Local read-through cache for GCS blobs
+--------------------------------------
+Keeps downloaded blobs on local disk so reprocessing jobs do not fetch the
+same objects from GCS again.
+
+Entries are content-addressed: by MD5 when the blob has one (identical
+objects under different names share one file), otherwise by
+(bucket, name, generation). Keys come from listing metadata, so a lookup
+makes no request; only misses download, through the given downloader.
+
+The cache is capped in size and evicts the least recently used files,
+using each file's mtime as its last-access time. Cached files can be
+opened memory-mapped for zero-copy reads.
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from utils.file_hash_checker import FileHashChecker
+
+
+class BlobCache:
+    DEFAULT_DIR = Path.home() / ".cache" / "collector" / "blobs"
+    DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+    def __init__(
+        self,
+        downloader: Callable[[Dict[str, Any], Path], None],
+        cache_dir: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        namespace: str = "",
+    ):
+        """
+        Args:
+            downloader: Callable (listing entry, path) used on a miss
+                (GCPStorage passes its generation-pinned, sliced download_file).
+            cache_dir: Directory holding cached blobs. Defaults to DEFAULT_DIR.
+            max_bytes: Size cap; least recently used files are evicted beyond it.
+            namespace: Bucket name, part of the key of blobs without an MD5.
+        """
+        self.dir = Path(cache_dir) if cache_dir else self.DEFAULT_DIR
+        self.max_bytes = max_bytes
+        self.downloader = downloader
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, listing: Dict[str, Any]) -> str:
+        """Cache key of a blob from its listing metadata (md5 or generation)."""
+        if listing.get("md5"):
+            return f"md5-{FileHashChecker.gcs_md5_to_hex(listing['md5'])}"
+        if listing.get("generation") is None:
+            raise ValueError(f"{listing['name']} has no MD5 or generation; pass its listing entry")
+        identity = f"{self.namespace}/{listing['name']}#{listing['generation']}"
+        return f"gen-{hashlib.sha256(identity.encode()).hexdigest()}"
+
+    def path_for(self, key: str) -> Path:
+        return self.dir / key[4:6] / key
+
+    def get_path(self, listing: Dict[str, Any]) -> Path:
+        """
+        Return a local path holding a blob's content, downloading it on a miss.
+
+        Args:
+            listing: The blob's listing entry ("name", "size", "md5", "crc32c",
+                "generation"), as yielded by GCPStorage.iter_blobs.
+        """
+        path = self.path_for(self.key(listing))
+
+        if path.exists():
+            self.hits += 1
+            os.utime(path)  # mark as recently used
+            return path
+
+        self.misses += 1
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.downloader(listing, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self.evict(keep=path)
+        return path
+
+    @contextmanager
+    def open_mmap(self, listing: Dict[str, Any]) -> Iterator[mmap.mmap]:
+        """Memory-map a blob's cached file read-only (empty files yield b"")."""
+        with open(self.get_path(listing), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+    def size(self) -> int:
+        return sum(p.stat().st_size for p in self.dir.glob("*/*") if ".tmp" not in p.name)
+
+    def evict(self, keep: Optional[Path] = None):
+        """Delete least recently used files until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for p in self.dir.glob("*/*"):
+                if ".tmp" in p.name:
+                    continue
+                try:
+                    stat = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, p))
+            total = sum(size for _, size, _ in entries)
+            for _, size, p in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                if p == keep:
+                    continue
+                p.unlink(missing_ok=True)
+                total -= size
+
+    def clear(self):
+        for p in self.dir.glob("*/*"):
+            p.unlink(missing_ok=True)
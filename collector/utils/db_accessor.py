@@ -1,13 +1,94 @@
+import io
+import itertools
+import json
 import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2 import pool as pg_pool
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, TRANSACTION_STATUS_IDLE
 from psycopg2.extras import execute_values
 import logging
 
 
+# Backslash escapes of COPY's text format
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_text_value(value):
+    """Render one value in COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif hasattr(value, "isoformat"):
+        value = value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def _copy_text_line(row):
+    return ("\t".join(map(_copy_text_value, row)) + "\n").encode("utf-8")
+
+
+# PGCOPY signature, flags and header extension length of COPY's binary format
+_COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_BINARY_TRAILER = struct.pack(">h", -1)
+
+
+class _CopyStream(io.RawIOBase):
+    """Read-only file over an iterable of rows, encoded for COPY on demand."""
+
+    def __init__(self, rows, encode=_copy_text_line, header=b"", trailer=b""):
+        self.rows = iter(rows)
+        self.encode = encode
+        self.count = 0
+        self._buffer = header
+        self._trailer = trailer
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            row = next(self.rows, None)
+            if row is None:
+                parts.append(self._trailer)
+                length += len(self._trailer)
+                self._trailer = b""
+                break
+            self.count += 1
+            line = self.encode(row)
+            parts.append(line)
+            length += len(line)
+        data = b"".join(parts)
+        if size < 0:
+            size = length
+        self._buffer = data[size:]
+        return data[:size]
+
+
 class DBAccessor:
-    def __init__(self, db_name):
-        self.conn = None
+    # Connections idle for longer than this are pinged before being handed out
+    HEALTH_CHECK_AFTER = 30.0
+
+    def __init__(self, db_name, min_connections=1, max_connections=None, acquire_timeout=30.0):
+        """
+        Args:
+            db_name: Database to use (created on first use if missing).
+            min_connections: Connections opened when the pool is created.
+            max_connections: Pool size cap; callers beyond it wait for a free
+                connection. Defaults to $POSTGRE_POOL_MAX or 10.
+            acquire_timeout: Seconds to wait for a free connection before failing.
+        """
         if not db_name:
             raise ValueError("db_name is required")
         self.db_name = db_name
@@ -15,8 +96,20 @@ class DBAccessor:
         self.db_password = os.environ.get("POSTGRE_PASSWORD")
         self.db_host = os.environ.get("POSTGRE_HOST")
         self.db_port = os.environ.get("POSTGRE_PORT", "5432")
+        self.min_connections = min_connections
+        self.max_connections = max_connections or int(os.environ.get("POSTGRE_POOL_MAX", "10"))
+        self.acquire_timeout = acquire_timeout
         self.logger = logging.getLogger(__name__)
         self._db_ensured = False  # Track if database existence has been checked
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._last_used = {}
+        # Pool each borrowed connection came from, so it goes back there even after close()
+        self._borrowed = {}
+        self._local = threading.local()
+        self._cursor_ids = itertools.count()
 
     def _connect_to_postgres_db(self):
         """Connect to the default 'postgres' database (for creating databases)."""
@@ -55,7 +148,7 @@ class DBAccessor:
                     self.logger.info(f"Created database: {self.db_name}")
                 else:
                     self.logger.info(f"Database already exists: {self.db_name}")
-                    
+
 
         except Exception as e:
             self.logger.error(f"Failed to create database: {e}")
@@ -64,55 +157,440 @@ class DBAccessor:
             if conn:
                 conn.close()
 
-    def connect(self):
-        """Connect to PostgreSQL database. Creates database if it doesn't exist."""
-        if self.conn is None:
-            # Ensure database exists on first connection
-            if not self._db_ensured:
-                self.create_database_if_not_exists()
-                self._db_ensured = True
+    def _get_pool(self):
+        """Create the connection pool on first use. Creates the database if it doesn't exist."""
+        with self._pool_lock:
+            if self.pool is None:
+                # Ensure database exists before the first connection
+                if not self._db_ensured:
+                    self.create_database_if_not_exists()
+                    self._db_ensured = True
+
+                try:
+                    self.pool = pg_pool.ThreadedConnectionPool(
+                        self.min_connections,
+                        self.max_connections,
+                        dbname=self.db_name,
+                        user=self.db_user,
+                        password=self.db_password,
+                        host=self.db_host,
+                        port=self.db_port
+                    )
+                    self.logger.info(
+                        f"Connected to database: {self.db_name} (pool of up to {self.max_connections})"
+                    )
+                except Exception as e:
+                    self.logger.error(f"Failed to connect to database: {e}")
+                    raise
+            return self.pool
+
+    def _is_healthy(self, conn):
+        """Cheap check for closed connections; ping the server if the connection sat idle."""
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.HEALTH_CHECK_AFTER:
+            return True  # Freshly opened or recently used
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _release(self, conn, close=False):
+        pool = self._borrowed.pop(id(conn))
+        try:
+            if pool.closed:
+                # close() gave up waiting for this connection and closed its pool
+                conn.close()
+                return
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+            pool.putconn(conn, close=close)
+        finally:
+            self._slots.release()
 
+    def _acquire(self):
+        """Borrow a healthy connection from the pool, waiting while the pool is at max size."""
+        pool = self._get_pool()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise pg_pool.PoolError(
+                f"No free connection to {self.db_name} after {self.acquire_timeout}s "
+                f"(max_connections={self.max_connections})"
+            )
+        try:
+            conn = pool.getconn()
+            if not self._is_healthy(conn):
+                self.logger.warning("Discarding broken database connection")
+                self._last_used.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            self._borrowed[id(conn)] = pool
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a pooled connection for the duration of the block.
+
+        Work left uncommitted when the block ends is rolled back, so the
+        connection goes back to the pool clean.
+        """
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if not broken and not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            self._release(conn, close=broken or bool(conn.closed))
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the block in one transaction: commit once at the end, roll back on error.
+
+        Nested ``transaction()``/``cursor()``/``execute`` calls in the same
+        thread join the outer transaction instead of committing on their own.
+
+        Usage:
+            with db.transaction() as conn:
+                db.execute("INSERT ...", row_a)
+                db.execute("UPDATE ...", row_b)
+        """
+        outer = getattr(self._local, "conn", None)
+        if outer is not None:
+            yield outer
+            return
+
+        with self.connection() as conn:
+            self._local.conn = conn
             try:
-                self.conn = psycopg2.connect(
-                    dbname=self.db_name,
-                    user=self.db_user,
-                    password=self.db_password,
-                    host=self.db_host,
-                    port=self.db_port
-                )
-                self.logger.info(f"Connected to database: {self.db_name}")
-            except Exception as e:
-                self.logger.error(f"Failed to connect to database: {e}")
+                yield conn
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
                 raise
-        return self.conn
+            finally:
+                self._local.conn = None
+
+    @contextmanager
+    def cursor(self, **kwargs):
+        """Cursor inside a transaction (see transaction()); kwargs go to conn.cursor()."""
+        with self.transaction() as conn:
+            with conn.cursor(**kwargs) as cur:
+                yield cur
+
+    @contextmanager
+    def _reader(self):
+        """The current transaction's connection if there is one, else a pooled one."""
+        outer = getattr(self._local, "conn", None)
+        if outer is not None:
+            yield outer
+        else:
+            with self.connection() as conn:
+                yield conn
+
+    def stream(self, query, params=None, batch_size=10_000, output="rows"):
+        """
+        Stream a query's result through a named (server-side) cursor.
+
+        Only batch_size rows are held in memory at a time, however large the
+        result. The stream reads on its own pooled connection (or the current
+        transaction's), so writes made while iterating commit independently.
+
+        Args:
+            query: SELECT statement.
+            params: Query parameters.
+            batch_size: Rows fetched from the server per round trip.
+            output: "rows" yields tuples one by one; "batches" yields lists of
+                tuples; "pandas" yields DataFrames and "arrow" pyarrow
+                RecordBatches of up to batch_size rows.
+
+        Yields:
+            Rows or batches, see output.
+        """
+        if output not in ("rows", "batches", "pandas", "arrow"):
+            raise ValueError("output must be 'rows', 'batches', 'pandas' or 'arrow'")
+        with self._reader() as conn:
+            with conn.cursor(name=f"stream_{os.getpid()}_{next(self._cursor_ids)}") as cur:
+                cur.itersize = batch_size
+                cur.execute(query, params)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    if output == "rows":
+                        yield from rows
+                    elif output == "batches":
+                        yield rows
+                    else:
+                        columns = [col[0] for col in cur.description]
+                        yield self._to_frame(rows, columns, output)
+
+    @staticmethod
+    def _to_frame(rows, columns, output):
+        if output == "pandas":
+            import pandas as pd
+
+            return pd.DataFrame.from_records(rows, columns=columns)
+        import pyarrow as pa
+
+        return pa.RecordBatch.from_arrays([pa.array(values) for values in zip(*rows)], names=columns)
+
+    def connect(self):
+        """
+        Connect to PostgreSQL database. Creates database if it doesn't exist.
+
+        Only opens the connection pool; queries borrow connections through
+        ``connection()``/``transaction()``/``cursor()``.
+        """
+        self._get_pool()
+        return self
 
     def close(self):
-        """Close database connection."""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
-            self.logger.info("Database connection closed")
+        """
+        Close all pooled connections.
+
+        Waits up to acquire_timeout for connections borrowed by other threads
+        to come back; connections still out after that are closed when released.
+        """
+        with self._pool_lock:
+            if self.pool is None:
+                return
+            drained = 0
+            try:
+                while drained < self.max_connections and self._slots.acquire(timeout=self.acquire_timeout):
+                    drained += 1
+                if drained < self.max_connections:
+                    self.logger.warning(
+                        f"Closing {self.db_name} pool with {self.max_connections - drained} connection(s) still borrowed"
+                    )
+                self.pool.closeall()
+                self.pool = None
+                self._last_used.clear()
+                self.logger.info("Database connection closed")
+            finally:
+                for _ in range(drained):
+                    self._slots.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def enable_postgis(self):
         """Enable PostGIS extension in the database."""
         try:
-            self.connect()
-            with self.conn.cursor() as cur:
-                cur.execute("CREATE EXTENSION IF NOT EXISTS postgis;")
-                self.conn.commit()
-                self.logger.info("PostGIS extension enabled")
+            self.execute("CREATE EXTENSION IF NOT EXISTS postgis;")
+            self.logger.info("PostGIS extension enabled")
         except Exception as e:
             self.logger.error(f"Failed to enable PostGIS: {e}")
             raise
 
     def execute(self, query, params=None):
-        """Execute a SQL query."""
+        """Execute a SQL query (committed on its own unless inside transaction())."""
         try:
-            self.connect()
-            with self.conn.cursor() as cur:
+            with self.cursor() as cur:
                 cur.execute(query, params)
-                self.conn.commit()
         except Exception as e:
-            self.conn.rollback()
             self.logger.error(f"Query execution failed: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def table_identifier(table):
+        """Quote a "table" or "schema.table" name."""
+        return sql.SQL(".").join(sql.Identifier(part) for part in table.split("."))
+
+    def _log_rate(self, action, rows, table, started):
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed > 0 else float("inf")
+        self.logger.info(f"✅ {action} {rows:,} rows into {table} in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+
+    def insert_many(self, table, columns, rows, page_size=1000, on_conflict=""):
+        """
+        Insert rows with multi-row INSERT statements (execute_values).
+
+        Args:
+            table: Target table ("table" or "schema.table").
+            columns: Column names, in the order of each row's values.
+            rows: Iterable of tuples; consumed lazily, page_size rows per statement.
+            page_size: Rows per INSERT statement.
+            on_conflict: Optional SQL appended to each statement, e.g.
+                "ON CONFLICT (id) DO NOTHING".
+
+        Returns:
+            int: Number of rows sent.
+        """
+        query = sql.SQL("INSERT INTO {} ({}) VALUES %s {}").format(
+            self.table_identifier(table),
+            sql.SQL(", ").join(map(sql.Identifier, columns)),
+            sql.SQL(on_conflict),
+        )
+        count = 0
+
+        def counted():
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        started = time.perf_counter()
+        try:
+            with self.cursor() as cur:
+                execute_values(cur, query.as_string(cur), counted(), page_size=page_size)
+        except Exception as e:
+            self.logger.error(f"❌ Bulk insert into {table} failed after {count:,} rows: {e}")
+            raise
+        self._log_rate("Inserted", count, table, started)
+        return count
+
+    def upsert_changed(self, table, key_columns, columns, rows, hash_column, page_size=1000, touch_column=None):
+        """
+        Insert or update rows keyed on key_columns, leaving rows whose content
+        hash is unchanged untouched (no new row version, no trigger, no WAL).
+
+        Args:
+            table: Target table, with a unique constraint on key_columns.
+            key_columns: Columns identifying a record, e.g. ("municipality", "title_path").
+            columns: All columns in the order of each row's values (keys and hash included).
+            rows: Iterable of tuples.
+            hash_column: Column holding the content hash compared on conflict.
+            page_size: Rows per statement.
+            touch_column: Optional timestamp column set to now() on insert/update.
+
+        Returns:
+            Dict[str, int]: Counts of "inserted", "updated" and "unchanged" rows.
+        """
+        updates = [
+            sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(c), sql.Identifier(c))
+            for c in columns if c not in key_columns
+        ]
+        if touch_column:
+            updates.append(sql.SQL("{} = now()").format(sql.Identifier(touch_column)))
+        # xmax is 0 only for freshly inserted row versions
+        query = sql.SQL(
+            "INSERT INTO {table} AS target ({columns}) VALUES %s "
+            "ON CONFLICT ({keys}) DO UPDATE SET {updates} "
+            "WHERE target.{hash} IS DISTINCT FROM EXCLUDED.{hash} "
+            "RETURNING (xmax = 0)"
+        ).format(
+            table=self.table_identifier(table),
+            columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+            keys=sql.SQL(", ").join(map(sql.Identifier, key_columns)),
+            updates=sql.SQL(", ").join(updates),
+            hash=sql.Identifier(hash_column),
+        )
+        count = 0
+
+        def counted():
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        try:
+            with self.cursor() as cur:
+                written = execute_values(cur, query.as_string(cur), counted(), page_size=page_size, fetch=True)
+        except Exception as e:
+            self.logger.error(f"❌ Upsert into {table} failed after {count:,} rows: {e}")
+            raise
+        inserted = sum(1 for (is_insert,) in written if is_insert)
+        changes = {"inserted": inserted, "updated": len(written) - inserted, "unchanged": count - len(written)}
+        self.logger.info(
+            f"✅ Upserted into {table}: {changes['inserted']:,} inserted, "
+            f"{changes['updated']:,} updated, {changes['unchanged']:,} unchanged"
+        )
+        return changes
+
+    def copy_records(self, table, columns, rows, buffer_size=1024 * 1024):
+        """
+        Stream rows into a table with COPY FROM STDIN (text format).
+
+        Rows are encoded while COPY reads them, so memory stays bounded by
+        buffer_size whatever the number of rows. Values may be None, str,
+        numbers, bools, dates/datetimes, bytes (bytea) or dicts/lists (json).
+
+        Args:
+            table: Target table ("table" or "schema.table").
+            columns: Column names, in the order of each row's values.
+            rows: Iterable of tuples.
+            buffer_size: Bytes handed to the server per read.
+
+        Returns:
+            int: Number of rows copied.
+        """
+        stream = _CopyStream(rows)
+        started = time.perf_counter()
+        try:
+            with self.cursor() as cur:
+                query = sql.SQL("COPY {} ({}) FROM STDIN").format(
+                    self.table_identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+                )
+                cur.copy_expert(query.as_string(cur), stream, size=buffer_size)
+        except Exception as e:
+            self.logger.error(f"❌ COPY into {table} failed after {stream.count:,} rows: {e}")
+            raise
+        self._log_rate("Copied", stream.count, table, started)
+        return stream.count
+
+    def copy_dataframe(self, df, table, columns=None, chunk_rows=50_000, buffer_size=1024 * 1024):
+        """
+        Stream a pandas DataFrame into a table with COPY (see copy_records).
+
+        Args:
+            df: DataFrame whose columns match the table's (NaN/NaT become NULL).
+            table: Target table.
+            columns: Subset/order of DataFrame columns to copy. Defaults to all.
+            chunk_rows: Rows converted to Python values at a time.
+
+        Returns:
+            int: Number of rows copied.
+        """
+        columns = list(columns) if columns is not None else list(df.columns)
+        frame = df[columns]
+
+        def rows():
+            for start in range(0, len(frame), chunk_rows):
+                chunk = frame.iloc[start:start + chunk_rows].astype(object)
+                yield from chunk.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+        return self.copy_records(table, columns, rows(), buffer_size=buffer_size)
+
+    def copy_binary(self, table, columns, tuples, buffer_size=1024 * 1024):
+        """
+        Stream pre-encoded tuples into a table with COPY FROM STDIN (FORMAT binary).
+
+        Each tuple must already be in binary COPY tuple layout: an int16
+        field count, then an int32 length (-1 for NULL) and the type's binary
+        representation per field (see PostGISLoader). The PGCOPY header and
+        trailer are added here.
+
+        Returns:
+            int: Number of rows copied.
+        """
+        stream = _CopyStream(tuples, encode=bytes, header=_COPY_BINARY_HEADER, trailer=_COPY_BINARY_TRAILER)
+        started = time.perf_counter()
+        try:
+            with self.cursor() as cur:
+                query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT binary)").format(
+                    self.table_identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+                )
+                cur.copy_expert(query.as_string(cur), stream, size=buffer_size)
+        except Exception as e:
+            self.logger.error(f"❌ Binary COPY into {table} failed after {stream.count:,} rows: {e}")
+            raise
+        self._log_rate("Copied", stream.count, table, started)
+        return stream.count
@@ -0,0 +1,51 @@
+from pathlib import Path
+import re
+import zipfile
+from typing import Union
+from xml.etree import ElementTree
+
+# WordprocessingML namespace of document.xml
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class DocxParser:
+    @staticmethod
+    def extract_text_from_docx(docx_path: Union[Path, str]) -> str:
+        """
+        Extract full text from a .docx file (paragraphs, including those in
+        tables, one per line) without needing Word or python-docx.
+
+        Args:
+            docx_path: Path to .docx file
+
+        Returns:
+            Extracted text string
+        """
+        try:
+            with zipfile.ZipFile(docx_path) as archive:
+                root = ElementTree.fromstring(archive.read("word/document.xml"))
+
+            paragraphs = []
+            for paragraph in root.iter(f"{W}p"):
+                parts = []
+                for node in paragraph.iter():
+                    if node.tag == f"{W}t":
+                        parts.append(node.text or "")
+                    elif node.tag == f"{W}tab":
+                        parts.append("\t")
+                    elif node.tag in (f"{W}br", f"{W}cr"):
+                        parts.append("\n")
+                paragraphs.append("".join(parts))
+
+            full_text = "\n".join(paragraphs)
+
+            # Clean up text - remove null bytes and control characters for PostgreSQL
+            full_text = full_text.replace("\x00", "")
+            full_text = re.sub(r"[\x01-\x08\x0b-\x0c\x0e-\x1f\x7f]", "", full_text)
+            full_text = re.sub(r"\n{3,}", "\n\n", full_text)
+            full_text = re.sub(r" {2,}", " ", full_text)
+
+            return full_text.strip()
+
+        except Exception as e:
+            raise Exception(f"Error extracting text from {docx_path}: {e}")
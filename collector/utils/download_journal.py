@@ -0,0 +1,173 @@
+"""
+Checkpoint journal for resumable downloads
+------------------------------------------
+A journal directory holds one file per downloaded page plus an append-only
+``journal.jsonl`` recording which pages (query offsets, ObjectID chunks,
+tiles) are committed. An interrupted download re-opened with the same key
+skips every committed page and continues from there.
+
+Pages are stored as already-serialized GeoJSON feature fragments, so the
+final merge streams them into one FeatureCollection by concatenating bytes
+instead of parsing every feature into one list.
+
+Only the standard library is used so standalone scripts can import it.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class DownloadJournal:
+    JOURNAL_FILE = "journal.jsonl"
+
+    def __init__(self, journal_dir: str, key: Dict[str, Any]):
+        """
+        Open (or start) a journal.
+
+        Args:
+            journal_dir: Directory holding the journal and page files.
+            key: Identity of the download (URL, filters, format...). A journal
+                written for a different key is discarded instead of resumed.
+        """
+        self.dir = Path(journal_dir)
+        self.key = key
+        self.entries: Dict[str, dict] = {}
+        self.values: Dict[str, Any] = {}
+        self._seq = 0
+
+        if (self.dir / self.JOURNAL_FILE).exists() and not self._load():
+            shutil.rmtree(self.dir)
+        if not (self.dir / self.JOURNAL_FILE).exists():
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._append({"key": key})
+
+    def _load(self) -> bool:
+        """Replay the journal. Returns False if it belongs to another download."""
+        with open(self.dir / self.JOURNAL_FILE, "r+b") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                # A crash mid-append leaves a partial trailing line; cut it off
+                # so the next record does not get glued onto it
+                data = data[:data.rfind(b"\n") + 1]
+                f.truncate(len(data))
+        lines = data.decode("utf-8", errors="replace").splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            return False
+        if header.get("key") != self.key:
+            return False
+
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "unit" in record and (self.dir / record["page"]).exists():
+                self.entries[record["unit"]] = record
+                self._seq = max(self._seq, record["seq"] + 1)
+            elif "name" in record:
+                self.values[record["name"]] = record["value"]
+        return True
+
+    def _append(self, record: dict):
+        with open(self.dir / self.JOURNAL_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @property
+    def resumed(self) -> bool:
+        """True if pages from a previous run were found."""
+        return bool(self.entries)
+
+    def entry(self, unit: str) -> Optional[dict]:
+        """Return the committed record for a unit, or None if it still needs fetching."""
+        return self.entries.get(unit)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.values.get(name, default)
+
+    def set(self, name: str, value: Any):
+        """Persist a JSON-serializable value (e.g. an ObjectID list or tile plan)."""
+        self.values[name] = value
+        self._append({"name": name, "value": value})
+
+    def memo(self, name: str, compute: Callable[[], Any]) -> Any:
+        """Return a persisted value, computing and storing it on first use."""
+        if name not in self.values:
+            self.set(name, compute())
+        return self.values[name]
+
+    def commit_page(self, unit: str, features: Iterable[dict], count: int, **extra) -> Path:
+        """
+        Write a page of GeoJSON features and mark the unit as done.
+
+        Args:
+            unit: Unique name of the page, e.g. "0:offset:2000".
+            features: GeoJSON feature dicts.
+            count: Number of features the server returned for the unit
+                (used to continue pagination on resume).
+            **extra: Additional JSON-serializable fields to record.
+
+        Returns:
+            Path of the page file.
+        """
+        page_name = f"page-{self._seq:06d}.json"
+        page_path = self.dir / page_name
+        tmp_path = page_path.with_suffix(".tmp")
+        written = 0
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for feature in features:
+                if written:
+                    f.write(",\n")
+                f.write(json.dumps(feature))
+                written += 1
+        os.replace(tmp_path, page_path)
+
+        record = {"unit": unit, "page": page_name, "count": count, "features": written, "seq": self._seq, **extra}
+        self._append(record)
+        self.entries[unit] = record
+        self._seq += 1
+        return page_path
+
+    def pages(self) -> List[Path]:
+        """Committed page files in commit order."""
+        ordered = sorted(self.entries.values(), key=lambda r: r["seq"])
+        return [self.dir / r["page"] for r in ordered]
+
+    def feature_count(self) -> int:
+        return sum(r["features"] for r in self.entries.values())
+
+    def merge_geojson(self, out_path: str, crs: Optional[dict] = None) -> int:
+        """
+        Stream all committed pages into one GeoJSON FeatureCollection.
+
+        Returns:
+            Number of features written.
+        """
+        tmp_path = Path(f"{out_path}.tmp")
+        first = True
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            out.write('{"type": "FeatureCollection", ')
+            if crs:
+                out.write(f'"crs": {json.dumps(crs)}, ')
+            out.write('"features": [\n')
+            for page in self.pages():
+                if page.stat().st_size == 0:
+                    continue
+                if not first:
+                    out.write(",\n")
+                with open(page, encoding="utf-8") as f:
+                    shutil.copyfileobj(f, out)
+                first = False
+            out.write("\n]}\n")
+        os.replace(tmp_path, out_path)
+        return self.feature_count()
+
+    def remove(self):
+        """Delete the journal and its pages (after a successful merge)."""
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,261 @@
+"""
+ESRI JSON → Shapely geometry conversion
+---------------------------------------
+Converts the ``geometry`` objects returned by ArcGIS REST queries into
+Shapely 2 geometries in bulk. Coordinates are gathered into flat NumPy
+buffers with offsets and handed to ``shapely.from_ragged_array`` so no
+per-feature geometry objects are built in Python.
+
+Rings are classified by orientation (ESRI outer rings are clockwise, holes
+counter-clockwise), so multi-part polygons and polygons with holes come out
+as proper (Multi)Polygons instead of a single Polygon holding every ring.
+"""
+
+from itertools import chain
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely import GeometryType
+
+
+class EsriGeometryConverter:
+    """Vectorized converter from ESRI JSON geometries to Shapely geometries."""
+
+    @staticmethod
+    def to_shapely(geometries: Sequence[Optional[dict]]) -> np.ndarray:
+        """
+        Convert a sequence of ESRI JSON geometries to Shapely geometries.
+
+        Args:
+            geometries: ESRI geometry dicts (``rings``, ``paths``, ``points`` or
+                ``x``/``y``). ``None`` or unrecognized entries are allowed.
+
+        Returns:
+            Object array of the same length holding Shapely geometries,
+            with ``None`` where the input had no usable geometry.
+        """
+        out = np.full(len(geometries), None, dtype=object)
+
+        polygon_idx, line_idx, multipoint_idx, point_idx = [], [], [], []
+        for i, geom in enumerate(geometries):
+            if not geom:
+                continue
+            if "rings" in geom:
+                polygon_idx.append(i)
+            elif "paths" in geom:
+                line_idx.append(i)
+            elif "points" in geom:
+                multipoint_idx.append(i)
+            elif geom.get("x") is not None and geom.get("y") is not None:
+                point_idx.append(i)
+
+        if polygon_idx:
+            rings = [geometries[i]["rings"] for i in polygon_idx]
+            out[polygon_idx] = EsriGeometryConverter._polygons(rings)
+        if line_idx:
+            paths = [geometries[i]["paths"] for i in line_idx]
+            out[line_idx] = EsriGeometryConverter._lines(paths)
+        if multipoint_idx:
+            points = [geometries[i]["points"] for i in multipoint_idx]
+            out[multipoint_idx] = EsriGeometryConverter._multipoints(points)
+        if point_idx:
+            xs = np.fromiter((geometries[i]["x"] for i in point_idx), dtype=float, count=len(point_idx))
+            ys = np.fromiter((geometries[i]["y"] for i in point_idx), dtype=float, count=len(point_idx))
+            out[point_idx] = shapely.points(xs, ys)
+
+        return out
+
+    # ------------------------------------------------------------------
+    # Flat buffer helpers
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _flatten(parts: List[list]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Flatten a list of coordinate lists into an (N, 2) array plus offsets.
+
+        Returns:
+            (coords, offsets) where part ``k`` spans ``coords[offsets[k]:offsets[k + 1]]``.
+        """
+        lengths = np.fromiter((len(p) for p in parts), dtype=np.int64, count=len(parts))
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        total = int(offsets[-1])
+        if total == 0:
+            return np.empty((0, 2), dtype=float), offsets
+
+        # Vertices may carry z/m values; all vertices of a layer share the same arity
+        dim = len(parts[int(np.argmax(lengths > 0))][0])
+        flat = np.fromiter(
+            chain.from_iterable(chain.from_iterable(parts)), dtype=float
+        )
+        if flat.size == total * dim:
+            coords = flat.reshape(total, dim)[:, :2]
+        else:
+            # Mixed arity, fall back to trimming each vertex
+            coords = np.array([v[:2] for v in chain.from_iterable(parts)], dtype=float)
+        return np.ascontiguousarray(coords), offsets
+
+    @staticmethod
+    def _take_parts(coords: np.ndarray, offsets: np.ndarray, order: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Reorder (or subset) the parts of a flat coordinate buffer."""
+        lengths = (offsets[1:] - offsets[:-1])[order]
+        new_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=new_offsets[1:])
+        # Index of every vertex: part start + position within the part
+        starts = np.repeat(offsets[:-1][order], lengths)
+        within = np.arange(int(new_offsets[-1])) - np.repeat(new_offsets[:-1], lengths)
+        return coords[starts + within], new_offsets
+
+    @staticmethod
+    def _counts_to_offsets(counts: np.ndarray) -> np.ndarray:
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return offsets
+
+    @staticmethod
+    def _unwrap_single_parts(geoms: np.ndarray, part_counts: np.ndarray) -> np.ndarray:
+        """Return single-part Multi* geometries as their only part."""
+        single = part_counts == 1
+        if single.any():
+            geoms[single] = shapely.get_geometry(geoms[single], 0)
+        return geoms
+
+    # ------------------------------------------------------------------
+    # Per-type builders
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _signed_areas(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """Shoelace signed area per ring (positive = counter-clockwise)."""
+        x, y = coords[:, 0], coords[:, 1]
+        cross = np.zeros(len(coords), dtype=float)
+        cross[:-1] = x[:-1] * y[1:] - x[1:] * y[:-1]
+        # Zero the term that would wrap from one ring's last vertex into the next ring
+        cross[offsets[1:-1] - 1] = 0.0
+        if len(cross):
+            cross[-1] = 0.0
+        sums = np.add.reduceat(cross, offsets[:-1]) if len(offsets) > 1 else np.empty(0)
+        return sums / 2.0
+
+    @staticmethod
+    def _polygons(rings_per_feature: List[list]) -> np.ndarray:
+        n = len(rings_per_feature)
+        ring_counts = np.fromiter((len(r) for r in rings_per_feature), dtype=np.int64, count=n)
+        rings = list(chain.from_iterable(rings_per_feature))
+        coords, ring_offsets = EsriGeometryConverter._flatten(rings)
+        ring_feature = np.repeat(np.arange(n), ring_counts)
+
+        # Drop degenerate rings (a closed ring needs at least 4 vertices)
+        ring_lengths = ring_offsets[1:] - ring_offsets[:-1]
+        keep = np.flatnonzero(ring_lengths >= 4)
+        if len(keep) != len(rings):
+            coords, ring_offsets = EsriGeometryConverter._take_parts(coords, ring_offsets, keep)
+            ring_feature = ring_feature[keep]
+
+        areas = EsriGeometryConverter._signed_areas(coords, ring_offsets)
+        # ESRI outer rings are clockwise (negative shoelace area). A hole that
+        # shows up before any outer ring of its feature is promoted to an outer ring.
+        first_of_feature = np.ones(len(ring_feature), dtype=bool)
+        first_of_feature[1:] = ring_feature[1:] != ring_feature[:-1]
+        is_outer = (areas <= 0) | first_of_feature
+
+        order = EsriGeometryConverter._assign_holes(coords, ring_offsets, ring_feature, is_outer)
+        if order is not None:
+            coords, ring_offsets = EsriGeometryConverter._take_parts(coords, ring_offsets, order)
+            ring_feature = ring_feature[order]
+            is_outer = is_outer[order]
+
+        outer_idx = np.flatnonzero(is_outer)
+        polygon_offsets = np.append(outer_idx, len(is_outer)).astype(np.int64)
+        polygon_counts = np.bincount(ring_feature[outer_idx], minlength=n)
+        feature_offsets = EsriGeometryConverter._counts_to_offsets(polygon_counts)
+
+        geoms = shapely.from_ragged_array(
+            GeometryType.MULTIPOLYGON,
+            coords,
+            (ring_offsets, polygon_offsets, feature_offsets),
+        )
+        geoms = EsriGeometryConverter._unwrap_single_parts(geoms, polygon_counts)
+        geoms[polygon_counts == 0] = None
+        return geoms
+
+    @staticmethod
+    def _assign_holes(
+        coords: np.ndarray, ring_offsets: np.ndarray, ring_feature: np.ndarray, is_outer: np.ndarray
+    ) -> Optional[np.ndarray]:
+        """
+        Reorder rings so each hole follows the outer ring that contains it.
+
+        ESRI does not guarantee that a hole directly follows its outer ring.
+        Only features with several outer rings and at least one hole are
+        ambiguous; all other rings keep their order.
+
+        Returns:
+            A ring permutation, or None when the input order is already correct.
+        """
+        n_features = int(ring_feature.max()) + 1 if len(ring_feature) else 0
+        outer_counts = np.bincount(ring_feature[is_outer], minlength=n_features)
+        hole_counts = np.bincount(ring_feature[~is_outer], minlength=n_features)
+        ambiguous = np.flatnonzero((outer_counts > 1) & (hole_counts > 0))
+        if len(ambiguous) == 0:
+            return None
+
+        order = np.arange(len(is_outer))
+        feature_starts = EsriGeometryConverter._counts_to_offsets(np.bincount(ring_feature, minlength=n_features))
+        for fid in ambiguous:
+            start, end = feature_starts[fid], feature_starts[fid + 1]
+            local = np.arange(start, end)
+            outers = local[is_outer[start:end]]
+            holes = local[~is_outer[start:end]]
+
+            shells = shapely.polygons(
+                [coords[ring_offsets[r]:ring_offsets[r + 1]] for r in outers]
+            )
+            probe = coords[ring_offsets[holes]]
+            # Sequential assignment is the fallback for holes that no shell contains
+            owner = np.searchsorted(outers, holes) - 1
+            for k, (hx, hy) in enumerate(probe):
+                hits = np.flatnonzero(shapely.contains_xy(shells, hx, hy))
+                if len(hits):
+                    owner[k] = hits[0]
+
+            grouped = []
+            for j, shell in enumerate(outers):
+                grouped.append(shell)
+                grouped.extend(holes[owner == j])
+            order[start:end] = grouped
+        return order
+
+    @staticmethod
+    def _lines(paths_per_feature: List[list]) -> np.ndarray:
+        n = len(paths_per_feature)
+        paths = list(chain.from_iterable(paths_per_feature))
+        path_feature = np.repeat(
+            np.arange(n),
+            np.fromiter((len(p) for p in paths_per_feature), dtype=np.int64, count=n),
+        )
+        coords, path_offsets = EsriGeometryConverter._flatten(paths)
+
+        # A line part needs at least two vertices
+        path_lengths = path_offsets[1:] - path_offsets[:-1]
+        keep = np.flatnonzero(path_lengths >= 2)
+        if len(keep) != len(paths):
+            coords, path_offsets = EsriGeometryConverter._take_parts(coords, path_offsets, keep)
+            path_feature = path_feature[keep]
+
+        part_counts = np.bincount(path_feature, minlength=n)
+        geoms = shapely.from_ragged_array(
+            GeometryType.MULTILINESTRING,
+            coords,
+            (path_offsets, EsriGeometryConverter._counts_to_offsets(part_counts)),
+        )
+        geoms = EsriGeometryConverter._unwrap_single_parts(geoms, part_counts)
+        geoms[part_counts == 0] = None
+        return geoms
+
+    @staticmethod
+    def _multipoints(points_per_feature: List[list]) -> np.ndarray:
+        coords, offsets = EsriGeometryConverter._flatten(points_per_feature)
+        geoms = shapely.from_ragged_array(GeometryType.MULTIPOINT, coords, (offsets,))
+        geoms[(offsets[1:] - offsets[:-1]) == 0] = None
+        return geoms
@@ -0,0 +1,358 @@
+"""
+ArcGIS protocol-buffer (f=pbf) query decoder
+--------------------------------------------
+Decodes the ``esriPBuffer.FeatureCollectionPBuffer`` payload returned by
+``/query?f=pbf`` into the same dict shape as an ``f=json`` response
+(``features`` with ``attributes``/``geometry``, ``count`` or ``objectIds``),
+so callers can treat both transfer modes as one feature stream.
+
+Only the protobuf wire format is needed, so no generated code or protobuf
+runtime is required. Packed coordinate arrays are decoded with NumPy and
+de-quantized using the transform the server sends with each page.
+"""
+
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class EsriPbfDecoder:
+    """Decoder for ArcGIS FeatureCollection protocol buffers."""
+
+    GEOMETRY_TYPES = {
+        0: "esriGeometryPoint",
+        1: "esriGeometryMultipoint",
+        2: "esriGeometryPolyline",
+        3: "esriGeometryPolygon",
+        4: "esriGeometryMultipatch",
+        127: "esriGeometryNone",
+    }
+
+    FIELD_TYPES = {
+        0: "esriFieldTypeSmallInteger",
+        1: "esriFieldTypeInteger",
+        2: "esriFieldTypeSingle",
+        3: "esriFieldTypeDouble",
+        4: "esriFieldTypeString",
+        5: "esriFieldTypeDate",
+        6: "esriFieldTypeOID",
+        7: "esriFieldTypeGeometry",
+        8: "esriFieldTypeBlob",
+        9: "esriFieldTypeRaster",
+        10: "esriFieldTypeGUID",
+        11: "esriFieldTypeGlobalID",
+        12: "esriFieldTypeXML",
+    }
+
+    # QuantizeOriginPostion enum: upperLeft = 0, lowerLeft = 1
+    ORIGIN_UPPER_LEFT = 0
+
+    @staticmethod
+    def is_supported(layer_info: dict) -> bool:
+        """Return True if a layer's ``?f=json`` metadata advertises PBF queries."""
+        formats = layer_info.get("supportedQueryFormats", "")
+        return "pbf" in [f.strip().lower() for f in formats.split(",")]
+
+    @staticmethod
+    def decode(content: bytes) -> Dict[str, Any]:
+        """
+        Decode a ``f=pbf`` query response.
+
+        Args:
+            content: Raw response body.
+
+        Returns:
+            Dict shaped like the ``f=json`` response for the same query.
+
+        Raises:
+            ValueError: If the payload is not a FeatureCollection buffer
+                (e.g. the server answered with a JSON error).
+        """
+        buf = bytes(content)
+        query_result = None
+        for field, _, value in EsriPbfDecoder._fields(buf, 0, len(buf)):
+            if field == 2:
+                query_result = value
+        if query_result is None:
+            raise ValueError("Response is not an ArcGIS FeatureCollection protocol buffer")
+
+        for field, _, (start, end) in EsriPbfDecoder._fields(buf, *query_result):
+            if field == 1:
+                return EsriPbfDecoder._feature_result(buf, start, end)
+            if field == 2:
+                count = 0
+                for f, _, v in EsriPbfDecoder._fields(buf, start, end):
+                    if f == 1:
+                        count = v
+                return {"count": count}
+            if field == 3:
+                return EsriPbfDecoder._ids_result(buf, start, end)
+        return {"features": []}
+
+    # ------------------------------------------------------------------
+    # Wire format
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _varint(buf: bytes, pos: int) -> Tuple[int, int]:
+        result = 0
+        shift = 0
+        while True:
+            b = buf[pos]
+            pos += 1
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                return result, pos
+            shift += 7
+
+    @staticmethod
+    def _fields(buf: bytes, start: int, end: int):
+        """
+        Iterate over the fields of one message.
+
+        Yields:
+            (field_number, wire_type, value) where value is an int for varints,
+            a (start, end) slice for length-delimited fields and raw bytes for
+            fixed-width fields.
+        """
+        pos = start
+        while pos < end:
+            key, pos = EsriPbfDecoder._varint(buf, pos)
+            field, wire_type = key >> 3, key & 0x07
+            if wire_type == 0:
+                value, pos = EsriPbfDecoder._varint(buf, pos)
+            elif wire_type == 2:
+                length, pos = EsriPbfDecoder._varint(buf, pos)
+                value = (pos, pos + length)
+                pos += length
+            elif wire_type == 1:
+                value = buf[pos:pos + 8]
+                pos += 8
+            elif wire_type == 5:
+                value = buf[pos:pos + 4]
+                pos += 4
+            else:
+                raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+            yield field, wire_type, value
+
+    @staticmethod
+    def _packed_varints(buf: bytes, start: int, end: int) -> np.ndarray:
+        """Decode a packed repeated varint field into a uint64 array."""
+        b = np.frombuffer(buf, dtype=np.uint8, count=end - start, offset=start)
+        if len(b) == 0:
+            return np.empty(0, dtype=np.uint64)
+        last = b < 0x80
+        starts = np.empty(int(last.sum()), dtype=np.int64)
+        starts[0] = 0
+        starts[1:] = np.flatnonzero(last)[:-1] + 1
+        group = np.cumsum(last) - last
+        shift = (np.arange(len(b)) - starts[group]) * 7
+        parts = (b & 0x7F).astype(np.uint64) << shift.astype(np.uint64)
+        return np.bitwise_or.reduceat(parts, starts)
+
+    @staticmethod
+    def _zigzag(values: np.ndarray) -> np.ndarray:
+        return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+    @staticmethod
+    def _repeated_varints(buf: bytes, wire_type: int, value) -> np.ndarray:
+        """Decode a repeated varint field that may or may not be packed."""
+        if wire_type == 2:
+            return EsriPbfDecoder._packed_varints(buf, *value)
+        return np.array([value], dtype=np.uint64)
+
+    @staticmethod
+    def _string(buf: bytes, span: Tuple[int, int]) -> str:
+        return buf[span[0]:span[1]].decode("utf-8")
+
+    @staticmethod
+    def _double(raw: bytes) -> float:
+        return struct.unpack("<d", raw)[0]
+
+    # ------------------------------------------------------------------
+    # Messages
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _value(buf: bytes, start: int, end: int) -> Any:
+        for field, _, value in EsriPbfDecoder._fields(buf, start, end):
+            if field == 1:
+                return EsriPbfDecoder._string(buf, value)
+            if field == 2:
+                return struct.unpack("<f", value)[0]
+            if field == 3:
+                return EsriPbfDecoder._double(value)
+            if field in (4, 8):  # sint32 / sint64
+                return (value >> 1) ^ -(value & 1)
+            if field in (5, 7):  # uint32 / uint64
+                return value
+            if field == 6:  # int64, two's complement
+                return value - (1 << 64) if value >= (1 << 63) else value
+            if field == 9:
+                return bool(value)
+        return None
+
+    @staticmethod
+    def _ids_result(buf: bytes, start: int, end: int) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"objectIds": []}
+        ids = []
+        for field, wire_type, value in EsriPbfDecoder._fields(buf, start, end):
+            if field == 1:
+                result["objectIdFieldName"] = EsriPbfDecoder._string(buf, value)
+            elif field == 3:
+                ids.append(EsriPbfDecoder._repeated_varints(buf, wire_type, value))
+        if ids:
+            result["objectIds"] = np.concatenate(ids).astype(np.int64).tolist()
+        return result
+
+    @staticmethod
+    def _transform(buf: bytes, start: int, end: int) -> Dict[str, Any]:
+        transform = {"origin": 0, "scale": [1.0, 1.0, 1.0, 1.0], "translate": [0.0, 0.0, 0.0, 0.0]}
+        for field, _, value in EsriPbfDecoder._fields(buf, start, end):
+            if field == 1:
+                transform["origin"] = value
+            elif field in (2, 3):
+                # Scale / Translate: x = 1, y = 2, m = 3, z = 4
+                key = "scale" if field == 2 else "translate"
+                for f, _, raw in EsriPbfDecoder._fields(buf, *value):
+                    transform[key][f - 1] = EsriPbfDecoder._double(raw)
+        return transform
+
+    @staticmethod
+    def _feature_result(buf: bytes, start: int, end: int) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"features": []}
+        geometry_type = 127
+        has_z = has_m = False
+        transform = None
+        field_names: List[str] = []
+        fields: List[dict] = []
+        feature_spans = []
+
+        for field, _, value in EsriPbfDecoder._fields(buf, start, end):
+            if field == 1:
+                result["objectIdFieldName"] = EsriPbfDecoder._string(buf, value)
+            elif field == 3:
+                result["globalIdFieldName"] = EsriPbfDecoder._string(buf, value)
+            elif field == 7:
+                geometry_type = value
+            elif field == 8:
+                result["spatialReference"] = EsriPbfDecoder._spatial_reference(buf, *value)
+            elif field == 9:
+                result["exceededTransferLimit"] = bool(value)
+            elif field == 10:
+                has_z = bool(value)
+            elif field == 11:
+                has_m = bool(value)
+            elif field == 12:
+                transform = EsriPbfDecoder._transform(buf, *value)
+            elif field == 13:
+                name, ftype = EsriPbfDecoder._field(buf, *value)
+                field_names.append(name)
+                fields.append({"name": name, "type": EsriPbfDecoder.FIELD_TYPES.get(ftype)})
+            elif field == 15:
+                feature_spans.append(value)
+
+        result["geometryType"] = EsriPbfDecoder.GEOMETRY_TYPES.get(geometry_type, "esriGeometryNone")
+        result["fields"] = fields
+        dims = 2 + int(has_z) + int(has_m)
+        result["features"] = [
+            EsriPbfDecoder._feature(buf, s, e, field_names, geometry_type, dims, has_z, transform)
+            for s, e in feature_spans
+        ]
+        return result
+
+    @staticmethod
+    def _spatial_reference(buf: bytes, start: int, end: int) -> Dict[str, Any]:
+        sr: Dict[str, Any] = {}
+        for field, _, value in EsriPbfDecoder._fields(buf, start, end):
+            if field == 1:
+                sr["wkid"] = value
+            elif field == 2:
+                sr["latestWkid"] = value
+            elif field == 5:
+                sr["wkt"] = EsriPbfDecoder._string(buf, value)
+        return sr
+
+    @staticmethod
+    def _field(buf: bytes, start: int, end: int) -> Tuple[str, int]:
+        name, ftype = "", 4
+        for field, _, value in EsriPbfDecoder._fields(buf, start, end):
+            if field == 1:
+                name = EsriPbfDecoder._string(buf, value)
+            elif field == 2:
+                ftype = value
+        return name, ftype
+
+    @staticmethod
+    def _feature(
+        buf: bytes,
+        start: int,
+        end: int,
+        field_names: List[str],
+        geometry_type: int,
+        dims: int,
+        has_z: bool,
+        transform: Optional[dict],
+    ) -> Dict[str, Any]:
+        values = []
+        geometry = None
+        for field, _, value in EsriPbfDecoder._fields(buf, start, end):
+            if field == 1:
+                values.append(EsriPbfDecoder._value(buf, *value))
+            elif field == 2:
+                geometry = EsriPbfDecoder._geometry(buf, *value, geometry_type, dims, has_z, transform)
+        return {"attributes": dict(zip(field_names, values)), "geometry": geometry}
+
+    @staticmethod
+    def _geometry(
+        buf: bytes,
+        start: int,
+        end: int,
+        geometry_type: int,
+        dims: int,
+        has_z: bool,
+        transform: Optional[dict],
+    ) -> Optional[dict]:
+        lengths, coords = [], []
+        for field, wire_type, value in EsriPbfDecoder._fields(buf, start, end):
+            if field == 1:
+                geometry_type = value
+            elif field == 2:
+                lengths.append(EsriPbfDecoder._repeated_varints(buf, wire_type, value))
+            elif field == 3:
+                coords.append(EsriPbfDecoder._repeated_varints(buf, wire_type, value))
+        if not coords:
+            return None
+
+        deltas = EsriPbfDecoder._zigzag(np.concatenate(coords))
+        # Coordinates are delta-encoded per dimension across all parts of the geometry
+        quantized = np.cumsum(deltas.reshape(-1, dims), axis=0)[:, : 3 if has_z else 2]
+        if transform is None:
+            xy = quantized.astype(float)
+        else:
+            scale = np.array(transform["scale"], dtype=float)
+            translate = np.array(transform["translate"], dtype=float)
+            xy = np.empty(quantized.shape, dtype=float)
+            xy[:, 0] = translate[0] + quantized[:, 0] * scale[0]
+            if transform["origin"] == EsriPbfDecoder.ORIGIN_UPPER_LEFT:
+                xy[:, 1] = translate[1] - quantized[:, 1] * scale[1]
+            else:
+                xy[:, 1] = translate[1] + quantized[:, 1] * scale[1]
+            if has_z:
+                xy[:, 2] = translate[3] + quantized[:, 2] * scale[3]
+
+        if geometry_type == 0:
+            point = {"x": float(xy[0, 0]), "y": float(xy[0, 1])}
+            if has_z:
+                point["z"] = float(xy[0, 2])
+            return point
+
+        vertices = xy.tolist()
+        if geometry_type == 1:
+            return {"points": vertices}
+
+        parts, pos = [], 0
+        part_lengths = np.concatenate(lengths).tolist() if lengths else [len(vertices)]
+        for n in part_lengths:
+            parts.append(vertices[pos:pos + n])
+            pos += n
+        return {"rings": parts} if geometry_type == 3 else {"paths": parts}
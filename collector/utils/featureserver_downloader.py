@@ -3,164 +3,972 @@ Simplified FeatureServerDownloader (GeoPandas integrated)
 ---------------------------------------------------------
 Downloads all layers from an ArcGIS FeatureServer,
 handles pagination or objectId chunking via POST,
-and writes a valid GeoJSON file using GeoPandas.
+and writes a valid GeoJSON file (or a partitioned GeoParquet dataset)
+using GeoPandas.
+``sync_as_single_geojson`` refreshes a previous download incrementally.
+
+Queries use the compact protocol-buffer format (f=pbf) when the layer
+advertises it and fall back to JSON otherwise. Download profiles
+("full", "preview", "training@zoom<N>") let the server generalize
+geometry before it is sent. Layers without pagination can be split into
+spatial tiles instead of long ObjectID lists (``partition_mode="tiles"``).
+With ``resume=True`` pages are checkpointed to a DownloadJournal so an
+interrupted download continues from the last committed page.
+Geometries pass a GeometryQA stage before they are written; its per-layer
+report is stored under ``qa`` in the output metadata.
 """
 
+import hashlib
+import json
+import math
+import os
+import re
 import requests
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import geopandas as gpd
+import pandas as pd
+import shapely
+from pyproj import CRS
+
+from utils.esri_geometry import EsriGeometryConverter
+from utils.download_journal import DownloadJournal
+from utils.esri_pbf import EsriPbfDecoder
+from utils.geometry_qa import GeometryQA
+from utils.geoparquet_store import GeoParquetStore
 
 
 class FeatureServerDownloader:
-    def __init__(self, logger: Optional[logging.Logger] = None, epsg_code: int = 4326, sleep: float = 0.2):
+    TRANSFER_FORMATS = ("auto", "pbf", "json")
+
+    # PBF coordinates are always quantized; "edit" mode keeps full precision
+    # down to the tolerance, given in outSR units (see pbf_quantization)
+    PBF_QUANTIZATION = {"mode": "edit", "originPosition": "upperLeft"}
+    # Full-resolution tolerance: ~1 mm, as degrees for geographic outSRs
+    PBF_TOLERANCE_METERS = 1e-3
+    PBF_TOLERANCE_DEGREES = 1e-8
+
+    # Web-map zoom level each named profile is generalized for
+    # ("training@zoom<N>" accepts any zoom). "full" applies no generalization.
+    PROFILE_ZOOMS = {"preview": 10}
+
+    PARTITION_MODES = ("ids", "tiles")
+    # Quad-tree depth at which a still-too-dense tile falls back to ObjectID chunks
+    MAX_TILE_DEPTH = 12
+
+    def __init__(
+        self,
+        logger: Optional[logging.Logger] = None,
+        epsg_code: int = 4326,
+        sleep: float = 0.2,
+        transfer_format: str = "auto",
+        profile: str = "full",
+        partition_mode: str = "ids",
+        max_workers: int = 8,
+    ):
+        """
+        Args:
+            logger: Logger to use. Defaults to the module logger.
+            epsg_code: Output spatial reference requested from the server.
+            sleep: Delay between page requests in seconds.
+            transfer_format: "auto" uses f=pbf when the layer supports it,
+                "pbf" forces it, "json" always requests f=json.
+            profile: Download profile, see ``resolve_profile``.
+            partition_mode: How layers without pagination are split. "ids"
+                POSTs chunks of ObjectIDs, "tiles" splits the layer extent
+                quad-tree style until each tile fits in one request.
+            max_workers: Concurrent requests used in "tiles" mode.
+        """
+        if transfer_format not in self.TRANSFER_FORMATS:
+            raise ValueError(f"transfer_format must be one of {self.TRANSFER_FORMATS}")
+        if partition_mode not in self.PARTITION_MODES:
+            raise ValueError(f"partition_mode must be one of {self.PARTITION_MODES}")
         self.logger = logger or logging.getLogger(__name__)
         self.epsg_code = epsg_code
         self.sleep = sleep
+        self.transfer_format = transfer_format
+        self.partition_mode = partition_mode
+        self.max_workers = max_workers
+        self.profile = profile
+        self.profile_params = self.resolve_profile(profile, epsg_code)
+        self.quantization = self.pbf_quantization(epsg_code)
+        self.qa = GeometryQA(epsg_code=epsg_code, logger=self.logger)
+
+    @classmethod
+    def pbf_quantization(cls, epsg_code: int) -> Dict[str, Any]:
+        """
+        Full-resolution pbf quantization parameters for an output spatial
+        reference. The tolerance is in the units of its first axis: degrees
+        for geographic CRSs, otherwise meters converted to the CRS's linear
+        unit (e.g. US survey feet for State Plane).
+        """
+        crs = CRS.from_epsg(epsg_code)
+        if crs.is_geographic:
+            tolerance = cls.PBF_TOLERANCE_DEGREES
+        else:
+            tolerance = cls.PBF_TOLERANCE_METERS / crs.axis_info[0].unit_conversion_factor
+        return {**cls.PBF_QUANTIZATION, "tolerance": tolerance}
+
+    @classmethod
+    def resolve_profile(cls, profile: str, epsg_code: int = 4326) -> Dict[str, Any]:
+        """
+        Translate a download profile into ArcGIS query parameters.
+
+        "full" keeps full-resolution geometry. "preview" and "training@zoom<N>"
+        generalize to one pixel of a 256 px web-map tile at that zoom:
+        ``maxAllowableOffset`` and the pbf quantization tolerance are set to
+        the pixel size, and ``geometryPrecision`` to the decimals needed to
+        resolve it. Sizes are in degrees for geographic CRSs, otherwise in the
+        CRS's linear unit.
+
+        Returns:
+            Dict with ``maxAllowableOffset``/``geometryPrecision`` (sent with every
+            feature query) and ``quantizationParameters`` (sent with f=pbf only).
+            Empty for "full".
+        """
+        if profile == "full":
+            return {}
+        match = re.fullmatch(r"training@zoom(\d+)", profile)
+        if match:
+            zoom = int(match.group(1))
+        elif profile in cls.PROFILE_ZOOMS:
+            zoom = cls.PROFILE_ZOOMS[profile]
+        else:
+            raise ValueError(
+                f"Unknown download profile {profile!r}; expected 'full', "
+                f"'training@zoom<N>' or one of {list(cls.PROFILE_ZOOMS)}"
+            )
+
+        crs = CRS.from_epsg(epsg_code)
+        if crs.is_geographic:
+            world_size = 360.0
+        else:
+            world_size = 2 * math.pi * 6378137 / crs.axis_info[0].unit_conversion_factor
+        pixel_size = world_size / (256 * 2 ** zoom)
+        return {
+            "maxAllowableOffset": pixel_size,
+            "geometryPrecision": max(0, math.ceil(-math.log10(pixel_size))),
+            "quantizationParameters": {"mode": "edit", "originPosition": "upperLeft", "tolerance": pixel_size},
+        }
 
     def download_as_single_geojson(
+        self,
+        base_url: str,
+        output_dir: str,
+        merged_filename: str = "merged_layers.geojson",
+        layer_name: str = "Merged Layers",
+        resume: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Download all layers of a FeatureServer into one GeoJSON file.
+
+        With ``resume`` every page is committed to ``<merged stem>.parts/``
+        as it arrives; re-running after an interruption skips committed
+        pages, and the output is produced by concatenating the page files.
+        """
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        out_path = Path(output_dir) / merged_filename
+
+        if resume:
+            journal = DownloadJournal(out_path.with_name(f"{out_path.stem}.parts"), key=self._journal_key(base_url))
+            if journal.resumed:
+                self.logger.info(f"Resuming download with {len(journal.pages())} committed pages")
+            layers, _ = self._download_frames(base_url, journal=journal)
+            count = journal.merge_geojson(out_path, crs=self._geojson_crs())
+            qa = GeometryQA.merge_reports(r.get("qa") for r in journal.entries.values())
+            journal.remove()
+        else:
+            layers, all_frames = self._download_frames(base_url)
+            gdf, qa = self._write_merged(all_frames, out_path)
+            count = len(gdf)
+
+        self.logger.info(f"✅ Merged {len(layers)} layers ({count} valid geometries) → {out_path}")
+
+        return self._write_metadata(out_path, {
+            "layer_name": layer_name,
+            "filename": merged_filename,
+            "filepath": str(out_path),
+            "feature_count": count,
+            "url": base_url,
+            "profile": self.profile,
+            "profile_params": self.profile_params,
+            "qa": qa,
+        })
+
+    def download_as_geoparquet(
+        self,
+        base_url: str,
+        dataset_root: str,
+        state: str,
+        city: str,
+    ) -> Dict[str, Any]:
+        """
+        Download all layers into a partitioned GeoParquet dataset.
+
+        Features are written under ``state=/city=/_source_layer=`` partitions
+        of ``dataset_root`` with bbox covering columns (see GeoParquetStore),
+        replacing any previous download of the same layers.
+        """
+        layers, all_frames = self._download_frames(base_url)
+        gdf, qa = self.qa.run(self._concat(all_frames))
+        files = GeoParquetStore(dataset_root).write(gdf, state=state, city=city)
+
+        self.logger.info(f"✅ Wrote {len(layers)} layers ({len(gdf)} features) → {dataset_root}")
+
+        return {
+            "dataset_root": str(dataset_root),
+            "state": state,
+            "city": city,
+            "files": files,
+            "feature_count": len(gdf),
+            "url": base_url,
+            "profile": self.profile,
+            "profile_params": self.profile_params,
+            "qa": qa,
+        }
+
+    def download_layer_as_geojson(
+        self,
+        layer_url: str,
+        output_dir: str,
+        filename: str,
+        where: str = "1=1",
+        out_fields: Optional[List[str]] = None,
+        layer_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Download a single layer (``.../FeatureServer/<id>``) to GeoJSON.
+
+        Args:
+            layer_url: URL of the layer itself, not the service.
+            output_dir: Directory to write into.
+            filename: Output GeoJSON filename.
+            where: Server-side filter (e.g. a web map's definitionExpression).
+            out_fields: Fields to request; the ObjectID field is always added.
+                None requests all fields.
+            layer_name: Value for ``_source_layer``. Defaults to the layer's name.
+        """
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        layer_url = layer_url.rstrip("/")
+        info = requests.get(f"{layer_url}?f=json").json()
+        lname = layer_name or info.get("name", "Layer")
+
+        fields = "*"
+        if out_fields is not None:
+            oid_field = self._object_id_field(info)
+            fields = ",".join(dict.fromkeys([f for f in [oid_field, *out_fields] if f]))
+
+        frames = self._fetch_layer(f"{layer_url}/query", info, lname, where=where, out_fields=fields)
+        out_path = Path(output_dir) / filename
+        gdf, qa = self._write_merged(frames, out_path)
+
+        self.logger.info(f"✅ Downloaded {lname} ({len(gdf)} features) → {out_path}")
+
+        return self._write_metadata(out_path, {
+            "layer_name": lname,
+            "filename": filename,
+            "filepath": str(out_path),
+            "feature_count": len(gdf),
+            "url": layer_url,
+            "where": where,
+            "out_fields": fields,
+            "profile": self.profile,
+            "profile_params": self.profile_params,
+            "qa": qa,
+        })
+
+    def sync_as_single_geojson(
         self,
         base_url: str,
         output_dir: str,
         merged_filename: str = "merged_layers.geojson",
         layer_name: str = "Merged Layers"
     ) -> Dict[str, Any]:
+        """
+        Incrementally refresh a merged GeoJSON written by a previous sync.
+
+        Per-layer state (max edit date, object IDs and a hash per feature) is
+        kept next to the output in ``<merged stem>.sync_state.json``. A refresh
+        fetches only the features edited since the stored edit date plus the
+        object IDs that were added, drops removed IDs, and patches the stored
+        file. Layers without ``editFieldsInfo`` are re-downloaded in full, and
+        only features whose hash changed are patched. Layers without an
+        ObjectID field cannot be diffed and are replaced in full; layers no
+        longer in the service are removed. Without prior state (or output
+        file) this performs a full download and records the state.
+
+        Only the patched features are built into geometries and QA-checked
+        (the ``qa`` report covers them); the stored file is streamed feature
+        by feature and is not rewritten at all when nothing changed.
+        """
         Path(output_dir).mkdir(parents=True, exist_ok=True)
-        service_info = requests.get(f"{base_url}?f=json")
-        service_info.raise_for_status()
-        layers = service_info.json().get("layers", [])
-        if not layers:
-            raise Exception("No layers found in FeatureServer")
+        out_path = Path(output_dir) / merged_filename
+        state_path = Path(output_dir) / f"{Path(merged_filename).stem}.sync_state.json"
+        state = json.loads(state_path.read_text()) if state_path.exists() and out_path.exists() else {}
+        if state and state.get("profile", "full") != self.profile:
+            # Stored geometry was generalized differently; start over
+            self.logger.info(f"Profile changed from {state.get('profile')} to {self.profile}, re-downloading")
+            state = {}
+        layer_states = state.get("layers", {})
+        incremental = bool(layer_states)
 
-        all_features = []
+        layers = self._service_layers(base_url)
+        patches = []
+        # Stored features to drop, as {layer name: (ObjectID field, ID keys), or None for the whole layer}
+        drop: Dict[str, Optional[tuple]] = {}
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
 
         for layer in layers:
             lid, lname = layer["id"], layer["name"]
             query_url = f"{base_url}/{lid}/query"
-            info = requests.get(f"{base_url}/{lid}?f=json").json()
-
-            supports_pagination = info.get("supportsPagination", False)
-            max_count = info.get("maxRecordCount", 1000)
-
-            self.logger.info(f"Downloading layer {lname} (supportsPagination={supports_pagination})")
+            info = self._layer_info(base_url, lid)
+            oid_field = self._object_id_field(info)
+            edit_field = (info.get("editFieldsInfo") or {}).get("editDateField")
+            previous = layer_states.get(str(lid))
 
             try:
-                if supports_pagination:
-                    # --- Pagination mode ---
-                    offset = 0
-                    while True:
-                        params = {
-                            "where": "1=1",
-                            "outFields": "*",
-                            "returnGeometry": "true",
-                            "f": "pjson",
-                            "outSR": self.epsg_code,
-                            "resultOffset": offset,
-                            "resultRecordCount": max_count
-                        }
-                        r = requests.get(query_url, params=params)
-                        if not r.ok or not r.text.strip():
-                            self.logger.warning(f"Empty response for offset {offset} in {lname}")
-                            break
-                        data = r.json()
-                        feats = data.get("features", [])
-                        if not feats:
-                            break
-                        all_features.extend(self._arcgis_to_geojson(feats, lname))
-                        offset += len(feats)
-                        time.sleep(self.sleep)
-                        if len(feats) < max_count:
-                            break
+                if previous is None or oid_field is None or previous["name"] != lname:
+                    # First sync of this layer, or nothing to diff by: full refresh
+                    frames = self._fetch_layer(query_url, info, lname, with_hash=True)
+                    changed = self._concat(frames)
+                    current_ids = None
+                    if previous:
+                        drop[previous["name"]] = None
+                        stats["removed"] += previous["feature_count"]
+                    removed_ids = set()
                 else:
-                    # --- ObjectID chunking mode using POST ---
-                    ids_resp = requests.get(f"{query_url}?where=1=1&returnIdsOnly=true&f=pjson")
-                    ids_resp.raise_for_status()
-                    ids_data = ids_resp.json()
-                    ids = ids_data.get("objectIds", [])
-                    if not ids:
-                        self.logger.warning(f"No object IDs found for {lname}")
-                        continue
+                    use_pbf = self._use_pbf(info)
+                    current_ids = set(map(str, self._fetch_ids(query_url, "1=1", use_pbf)))
+                    known_ids = set(previous["hashes"])
+                    removed_ids = known_ids - current_ids
+                    added_ids = current_ids - known_ids
 
-                    self.logger.info(f"Found {len(ids)} object IDs in {lname}")
-
-                    for i in range(0, len(ids), max_count):
-                        subset = ids[i:i + max_count]
-                        params = {
-                            "objectIds": ",".join(map(str, subset)),
-                            "outFields": "*",
-                            "returnGeometry": "true",
-                            "f": "pjson",
-                            "outSR": self.epsg_code
-                        }
-                        r = requests.post(query_url, data=params)
-                        if not r.ok or not r.text.strip():
-                            self.logger.warning(f"Empty response chunk {i}-{i+max_count} in {lname}")
-                            continue
-                        data = r.json()
-                        feats = data.get("features", [])
-                        if feats:
-                            all_features.extend(self._arcgis_to_geojson(feats, lname))
-                        time.sleep(self.sleep)
+                    if edit_field and previous.get("max_edit_date") is not None:
+                        where = f"{edit_field} >= TIMESTAMP '{self._esri_timestamp(previous['max_edit_date'])}'"
+                        frames = self._fetch_layer(query_url, info, lname, where=where, with_hash=True)
+                        fetched = {k for f in frames for k in self._oid_keys(f[oid_field])}
+                        missing = sorted(int(i) for i in added_ids - fetched)
+                        frames.extend(self._fetch_by_ids(query_url, missing, info, lname, use_pbf, with_hash=True))
+                    else:
+                        frames = self._fetch_layer(query_url, info, lname, with_hash=True)
+                    fetched_gdf = self._concat(frames)
+
+                    # Keep only features that are new or whose content changed
+                    old_hashes = previous["hashes"]
+                    is_changed = [
+                        old_hashes.get(oid) != h
+                        for oid, h in zip(self._oid_keys(fetched_gdf[oid_field]), fetched_gdf["_feature_hash"])
+                    ] if len(fetched_gdf) else []
+                    changed = fetched_gdf[is_changed] if len(fetched_gdf) else fetched_gdf
             except Exception as e:
-                self.logger.error(f"Error downloading layer {lname}: {e}")
+                self.logger.error(f"Error syncing layer {lname}: {e}")
                 continue
 
-        # --- Build GeoDataFrame and save ---
-        gdf = gpd.GeoDataFrame.from_features(all_features, crs=f"EPSG:{self.epsg_code}")
-
-        # Fix invalid geometries using buffer(0) - repairs topology issues like self-intersections
-        # This is a standard GIS technique that doesn't change the data, just fixes the topology
-        invalid_count = (~gdf.geometry.is_valid).sum()
-        if invalid_count > 0:
-            self.logger.warning(f"Found {invalid_count} invalid geometries, fixing with buffer(0)")
-            gdf['geometry'] = gdf.geometry.buffer(0)
-            still_invalid = (~gdf.geometry.is_valid).sum()
-            if still_invalid > 0:
-                self.logger.error(f"❌ Still have {still_invalid} invalid geometries after buffer(0) fix")
+            if current_ids is None:
+                n_added, n_updated = len(changed), 0
             else:
-                self.logger.info(f"✅ Fixed all {invalid_count} invalid geometries")
+                changed_ids = set(self._oid_keys(changed[oid_field])) if len(changed) else set()
+                n_added = len(changed_ids - set(previous["hashes"]))
+                n_updated = len(changed_ids) - n_added
+                stats["unchanged"] += len(current_ids) - len(changed_ids)
+                if changed_ids or removed_ids:
+                    drop[lname] = (oid_field, changed_ids | removed_ids)
+            stats["added"] += n_added
+            stats["updated"] += n_updated
+            stats["removed"] += len(removed_ids)
+            patches.append(changed)
 
-        out_path = Path(output_dir) / merged_filename
-        gdf.to_file(out_path, driver="GeoJSON")
+            # Hashes of the changed features are added once they pass QA (below)
+            hashes = {}
+            if current_ids is not None:
+                hashes = {k: v for k, v in previous["hashes"].items() if k not in removed_ids}
+            max_edit = previous.get("max_edit_date") if current_ids is not None else None
+            if edit_field and edit_field in changed.columns and len(changed):
+                max_edit = max(v for v in (max_edit, self._to_epoch_ms(changed[edit_field].max())) if v is not None)
+            feature_count = len(changed) if current_ids is None else len(current_ids)
+            layer_states[str(lid)] = {
+                "name": lname,
+                "object_id_field": oid_field,
+                "edit_date_field": edit_field,
+                "max_edit_date": max_edit,
+                "feature_count": feature_count,
+                "hashes": hashes,
+            }
+            self.logger.info(
+                f"Synced layer {lname}: {n_added} added, {n_updated} updated, {len(removed_ids)} removed"
+            )
 
-        count = len(gdf)
-        self.logger.info(f"✅ Merged {len(layers)} layers ({count} valid geometries) → {out_path}")
+        # Layers removed from the service
+        for lid in set(layer_states) - {str(layer["id"]) for layer in layers}:
+            gone = layer_states.pop(lid)
+            drop[gone["name"]] = None
+            stats["removed"] += gone["feature_count"]
+            self.logger.info(f"Layer {gone['name']} is no longer in the service, removed")
 
-        return {
+        patch, qa = self.qa.run(self._concat([p for p in patches if len(p)]))
+        self._record_hashes(layer_states, patch)
+        patch = patch.drop(columns="_feature_hash", errors="ignore")
+        if not incremental:
+            patch.to_file(out_path, driver="GeoJSON")
+            feature_count = len(patch)
+        else:
+            feature_count = state["feature_count"]
+            if drop or len(patch):
+                feature_count = self._patch_merged(out_path, drop, patch)
+        state_path.write_text(json.dumps({
+            "url": base_url, "profile": self.profile, "feature_count": feature_count, "layers": layer_states,
+        }))
+
+        self.logger.info(f"✅ Synced {len(layers)} layers ({feature_count} features) → {out_path}")
+
+        return self._write_metadata(out_path, {
             "layer_name": layer_name,
             "filename": merged_filename,
             "filepath": str(out_path),
-            "feature_count": count,
-            "url": base_url
-        }
+            "feature_count": feature_count,
+            "url": base_url,
+            "profile": self.profile,
+            "profile_params": self.profile_params,
+            "qa": qa,
+            "sync": stats,
+        })
+
+    def _record_hashes(self, layer_states: Dict[str, Any], patch: gpd.GeoDataFrame):
+        """
+        Add the hashes of QA'd patch features to their layers' sync state.
+
+        Features still invalid after QA get no hash, so the next sync treats
+        them as new and fetches them again.
+        """
+        if not len(patch) or "_feature_hash" not in patch.columns:
+            return
+        geometry = patch.geometry
+        settled = patch[geometry.isna() | geometry.is_valid]
+        if len(settled) < len(patch):
+            self.logger.warning(f"{len(patch) - len(settled)} features are still invalid and will be re-fetched")
+        for layer_state in layer_states.values():
+            oid_field = layer_state["object_id_field"]
+            if oid_field is None or oid_field not in settled.columns:
+                continue
+            rows = settled[settled["_source_layer"] == layer_state["name"]]
+            layer_state["hashes"].update(zip(self._oid_keys(rows[oid_field]), rows["_feature_hash"]))
+
+    def _patch_merged(self, out_path: Path, drop: Dict[str, Optional[tuple]], patch: gpd.GeoDataFrame) -> int:
+        """
+        Rewrite a merged GeoJSON without the dropped features and with the
+        patch appended. Stored features are streamed and copied as-is, so
+        memory stays flat and geometries are not rebuilt.
+
+        Args:
+            out_path: Merged GeoJSON to patch in place.
+            drop: {layer name: (ObjectID field, ID keys to drop), or None to drop the whole layer}
+            patch: Features to append (already QA-checked).
+
+        Returns:
+            int: Number of features in the patched file.
+        """
+        import ijson
+
+        tmp_path = out_path.with_name(f"{out_path.name}.tmp")
+        count = 0
+        with open(out_path, "rb") as src, open(tmp_path, "w", encoding="utf-8") as out:
+            out.write('{"type": "FeatureCollection", ')
+            crs = self._geojson_crs()
+            if crs:
+                out.write(f'"crs": {json.dumps(crs)}, ')
+            out.write('"features": [\n')
+            for feature in ijson.items(src, "features.item", use_float=True):
+                props = feature.get("properties") or {}
+                layer = props.get("_source_layer")
+                if layer in drop:
+                    if drop[layer] is None:
+                        continue
+                    oid_field, ids = drop[layer]
+                    if self._oid_key(props.get(oid_field)) in ids:
+                        continue
+                out.write(",\n" if count else "")
+                out.write(json.dumps(feature))
+                count += 1
+            if len(patch):
+                for feature in json.loads(patch.to_json(drop_id=True))["features"]:
+                    out.write(",\n" if count else "")
+                    out.write(json.dumps(feature))
+                    count += 1
+            out.write("\n]}\n")
+        os.replace(tmp_path, out_path)
+        return count
 
     # ------------------------------------------------------------------
-    # Geometry converter (ESRI JSON → GeoJSON)
+    # Layer fetching
     # ------------------------------------------------------------------
-    def _arcgis_to_geojson(self, features: list, layer_name: str) -> list:
-        """Convert ArcGIS PJSON features into GeoJSON-compatible features."""
-        geojson_features = []
-        for f in features:
-            geom = f.get("geometry")
-            attrs = f.get("attributes", {})
-            if not geom:
+    def _download_frames(self, base_url: str, journal: Optional[DownloadJournal] = None) -> tuple:
+        """
+        Fetch every layer of a service. Returns (layers, list of page frames).
+
+        With a journal, pages are committed to it instead of returned, and a
+        failing layer aborts the run so it can be resumed.
+        """
+        layers = self._service_layers(base_url)
+        all_frames = []
+
+        for layer in layers:
+            lid, lname = layer["id"], layer["name"]
+            info = self._layer_info(base_url, lid)
+            try:
+                all_frames.extend(self._fetch_layer(
+                    f"{base_url}/{lid}/query", info, lname, journal=journal, unit=f"{lid}:"
+                ))
+            except Exception as e:
+                self.logger.error(f"Error downloading layer {lname}: {e}")
+                if journal is not None:
+                    raise
                 continue
+        return layers, all_frames
+
+    def _service_layers(self, base_url: str) -> list:
+        service_info = requests.get(f"{base_url}?f=json")
+        service_info.raise_for_status()
+        layers = service_info.json().get("layers", [])
+        if not layers:
+            raise Exception("No layers found in FeatureServer")
+        return layers
+
+    def _layer_info(self, base_url: str, lid: int) -> dict:
+        return requests.get(f"{base_url}/{lid}?f=json").json()
 
-            # Convert ArcGIS geometry to GeoJSON format
-            if "rings" in geom:
-                geometry = {"type": "Polygon", "coordinates": geom["rings"]}
-            elif "paths" in geom:
-                geometry = {"type": "LineString", "coordinates": geom["paths"][0]}
-            elif "x" in geom and "y" in geom:
-                geometry = {"type": "Point", "coordinates": [geom["x"], geom["y"]]}
+    @staticmethod
+    def _object_id_field(layer_info: dict) -> Optional[str]:
+        if layer_info.get("objectIdField"):
+            return layer_info["objectIdField"]
+        for field in layer_info.get("fields", []):
+            if field.get("type") == "esriFieldTypeOID":
+                return field["name"]
+        return None
+
+    def _fetch_layer(
+        self,
+        query_url: str,
+        info: dict,
+        lname: str,
+        where: str = "1=1",
+        with_hash: bool = False,
+        out_fields: str = "*",
+        journal: Optional[DownloadJournal] = None,
+        unit: str = "",
+    ) -> List[gpd.GeoDataFrame]:
+        """
+        Fetch every feature of a layer matching ``where`` as a list of page frames.
+
+        With a journal, pages already committed under the ``unit`` prefix are
+        skipped and new pages are committed instead of returned.
+        """
+        supports_pagination = info.get("supportsPagination", False)
+        max_count = info.get("maxRecordCount", 1000)
+        use_pbf = self._use_pbf(info)
+
+        self.logger.info(
+            f"Downloading layer {lname} (supportsPagination={supports_pagination}, "
+            f"format={'pbf' if use_pbf else 'json'})"
+        )
+
+        frames = []
+        if supports_pagination:
+            # --- Pagination mode ---
+            offset = 0
+            while True:
+                done = journal.entry(f"{unit}offset:{offset}") if journal else None
+                if done:
+                    offset += done["count"]
+                    if done["count"] < max_count:
+                        break
+                    continue
+                params = {
+                    "where": where,
+                    "outFields": out_fields,
+                    "returnGeometry": "true",
+                    "outSR": self.epsg_code,
+                    "resultOffset": offset,
+                    "resultRecordCount": max_count
+                }
+                data = self._query(query_url, params, use_pbf)
+                if data is None:
+                    if journal is not None:
+                        raise RuntimeError(f"Empty response for offset {offset} in {lname}")
+                    self.logger.warning(f"Empty response for offset {offset} in {lname}")
+                    break
+                feats = data.get("features", [])
+                if not feats:
+                    break
+                frame = self._arcgis_to_frame(feats, lname, with_hash=with_hash)
+                self._emit(frames, journal, f"{unit}offset:{offset}", frame, len(feats))
+                offset += len(feats)
+                time.sleep(self.sleep)
+                if len(feats) < max_count:
+                    break
+        elif self.partition_mode == "tiles":
+            # --- Spatial tile mode ---
+            frames.extend(self._fetch_by_tiles(
+                query_url, info, lname, where, use_pbf, with_hash=with_hash, out_fields=out_fields,
+                journal=journal, unit=unit,
+            ))
+        else:
+            # --- ObjectID chunking mode using POST ---
+            if journal is not None:
+                # The ID list is persisted so chunk boundaries stay stable on resume
+                ids = journal.memo(f"{unit}ids", lambda: self._fetch_ids(query_url, where, use_pbf))
             else:
+                ids = self._fetch_ids(query_url, where, use_pbf)
+            if not ids:
+                self.logger.warning(f"No object IDs found for {lname}")
+                return frames
+
+            self.logger.info(f"Found {len(ids)} object IDs in {lname}")
+            frames.extend(self._fetch_by_ids(
+                query_url, ids, info, lname, use_pbf, with_hash=with_hash, out_fields=out_fields,
+                journal=journal, unit=unit,
+            ))
+        return frames
+
+    def _emit(
+        self,
+        frames: List[gpd.GeoDataFrame],
+        journal: Optional[DownloadJournal],
+        unit: str,
+        frame: gpd.GeoDataFrame,
+        count: int,
+        **extra,
+    ):
+        """Collect a page frame, or QA it and commit it (with its QA report) to the journal."""
+        if journal is None:
+            frames.append(frame)
+            return
+        frame, qa = self.qa.run(frame)
+        journal.commit_page(unit, frame.iterfeatures(na="null", drop_id=True), count=count, qa=qa, **extra)
+
+    def _fetch_ids(self, query_url: str, where: str, use_pbf: bool, extra: Optional[dict] = None) -> list:
+        params = {"where": where, "returnIdsOnly": "true", **(extra or {})}
+        ids_data = self._query(query_url, params, use_pbf)
+        return (ids_data or {}).get("objectIds") or []
+
+    def _fetch_by_ids(
+        self,
+        query_url: str,
+        ids: list,
+        info: dict,
+        lname: str,
+        use_pbf: bool,
+        with_hash: bool = False,
+        out_fields: str = "*",
+        journal: Optional[DownloadJournal] = None,
+        unit: str = "",
+    ) -> List[gpd.GeoDataFrame]:
+        max_count = info.get("maxRecordCount", 1000)
+        frames = []
+        for i in range(0, len(ids), max_count):
+            if journal is not None and journal.entry(f"{unit}ids:{i}"):
+                continue
+            subset = ids[i:i + max_count]
+            params = {
+                "objectIds": ",".join(map(str, subset)),
+                "outFields": out_fields,
+                "returnGeometry": "true",
+                "outSR": self.epsg_code
+            }
+            data = self._query(query_url, params, use_pbf, post=True)
+            if data is None:
+                if journal is not None:
+                    raise RuntimeError(f"Empty response chunk {i}-{i+max_count} in {lname}")
+                self.logger.warning(f"Empty response chunk {i}-{i+max_count} in {lname}")
                 continue
+            feats = data.get("features", [])
+            frame = self._arcgis_to_frame(feats, lname, with_hash=with_hash)
+            if feats or journal is not None:
+                self._emit(frames, journal, f"{unit}ids:{i}", frame, len(feats))
+            time.sleep(self.sleep)
+        return frames
+
+    # ------------------------------------------------------------------
+    # Spatial tile partitioning
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _envelope_filter(envelope: dict) -> dict:
+        return {
+            "geometry": json.dumps(envelope),
+            "geometryType": "esriGeometryEnvelope",
+            "spatialRel": "esriSpatialRelIntersects",
+        }
+
+    @staticmethod
+    def _split_envelope(envelope: dict) -> List[dict]:
+        """Split an envelope into its four quadrants."""
+        xmid = (envelope["xmin"] + envelope["xmax"]) / 2
+        ymid = (envelope["ymin"] + envelope["ymax"]) / 2
+        sr = envelope.get("spatialReference")
+        return [
+            {"xmin": x0, "ymin": y0, "xmax": x1, "ymax": y1, "spatialReference": sr}
+            for x0, x1 in ((envelope["xmin"], xmid), (xmid, envelope["xmax"]))
+            for y0, y1 in ((envelope["ymin"], ymid), (ymid, envelope["ymax"]))
+        ]
+
+    def _layer_extent(self, query_url: str, info: dict, where: str, use_pbf: bool) -> Optional[dict]:
+        extent = info.get("extent")
+        if not extent or extent.get("xmin") is None:
+            data = self._query(query_url, {"where": where, "returnExtentOnly": "true"}, False)
+            extent = (data or {}).get("extent")
+        if not extent or extent.get("xmin") is None:
+            return None
+        return {k: extent[k] for k in ("xmin", "ymin", "xmax", "ymax", "spatialReference") if k in extent}
+
+    def _count(self, query_url: str, envelope: dict, where: str, use_pbf: bool) -> int:
+        params = {"where": where, "returnCountOnly": "true", **self._envelope_filter(envelope)}
+        data = self._query(query_url, params, use_pbf)
+        return int((data or {}).get("count") or 0)
+
+    def _plan_tiles(self, query_url: str, extent: dict, where: str, max_count: int, use_pbf: bool) -> List[tuple]:
+        """
+        Split the extent quad-tree style until every tile's count fits in one request.
+
+        Returns:
+            List of (envelope, count) for non-empty tiles. Tiles that are still
+            too dense at MAX_TILE_DEPTH are returned with their full count.
+        """
+        tiles = []
+        pending = [(extent, 0)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending:
+                counts = list(pool.map(lambda t: self._count(query_url, t[0], where, use_pbf), pending))
+                next_level = []
+                for (envelope, depth), count in zip(pending, counts):
+                    if count == 0:
+                        continue
+                    if count <= max_count or depth >= self.MAX_TILE_DEPTH:
+                        tiles.append((envelope, count))
+                    else:
+                        next_level.extend((q, depth + 1) for q in self._split_envelope(envelope))
+                pending = next_level
+        return tiles
+
+    def _fetch_by_tiles(
+        self,
+        query_url: str,
+        info: dict,
+        lname: str,
+        where: str,
+        use_pbf: bool,
+        with_hash: bool = False,
+        out_fields: str = "*",
+        journal: Optional[DownloadJournal] = None,
+        unit: str = "",
+    ) -> List[gpd.GeoDataFrame]:
+        """
+        Fetch a layer tile by tile in parallel, deduplicating features that
+        intersect more than one tile by ObjectID.
+
+        With a journal each tile is one committed page; the ObjectIDs of
+        committed tiles are recorded so duplicates are dropped across resumes.
+        """
+        max_count = info.get("maxRecordCount", 1000)
+        extent = self._layer_extent(query_url, info, where, use_pbf)
+        if extent is None:
+            self.logger.warning(f"No extent for {lname}, falling back to ObjectID chunks")
+            ids = self._fetch_ids(query_url, where, use_pbf)
+            return self._fetch_by_ids(
+                query_url, ids, info, lname, use_pbf, with_hash=with_hash, out_fields=out_fields,
+                journal=journal, unit=unit,
+            )
+
+        if journal is not None:
+            tiles = journal.memo(f"{unit}tiles", lambda: self._plan_tiles(query_url, extent, where, max_count, use_pbf))
+        else:
+            tiles = self._plan_tiles(query_url, extent, where, max_count, use_pbf)
+        self.logger.info(f"Split {lname} into {len(tiles)} tiles")
+
+        def fetch_tile(tile):
+            envelope, count = tile
+            if count > max_count:
+                # Too dense to split further (e.g. stacked points)
+                ids = self._fetch_ids(query_url, where, use_pbf, extra=self._envelope_filter(envelope))
+                return self._fetch_by_ids(query_url, ids, info, lname, use_pbf, with_hash=with_hash, out_fields=out_fields)
+            params = {
+                "where": where,
+                "outFields": out_fields,
+                "returnGeometry": "true",
+                "outSR": self.epsg_code,
+                **self._envelope_filter(envelope),
+            }
+            data = self._query(query_url, params, use_pbf, post=True)
+            if data is None and journal is not None:
+                raise RuntimeError(f"Empty response for tile {envelope} in {lname}")
+            time.sleep(self.sleep)
+            feats = (data or {}).get("features", [])
+            return [self._arcgis_to_frame(feats, lname, with_hash=with_hash)] if feats else []
+
+        oid_field = self._object_id_field(info)
+
+        if journal is not None:
+            seen = set()
+            for k in range(len(tiles)):
+                done = journal.entry(f"{unit}tile:{k}")
+                if done:
+                    seen.update(done.get("oids", []))
+            pending = [k for k in range(len(tiles)) if not journal.entry(f"{unit}tile:{k}")]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                # Results arrive in tile order, so commits happen sequentially here
+                for k, tile_frames in zip(pending, pool.map(lambda k: fetch_tile(tiles[k]), pending)):
+                    frame = self._concat(tile_frames)
+                    count = len(frame)
+                    oids = []
+                    if oid_field and oid_field in frame.columns:
+                        keys = self._oid_keys(frame[oid_field])
+                        frame = frame[~keys.isin(seen).to_numpy()]
+                        oids = list(dict.fromkeys(keys[~keys.isin(seen)]))
+                        seen.update(oids)
+                    self._emit([], journal, f"{unit}tile:{k}", frame, count, oids=oids)
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            frames = [f for tile_frames in pool.map(fetch_tile, tiles) for f in tile_frames]
+
+        gdf = self._concat(frames)
+        if oid_field and oid_field in gdf.columns:
+            before = len(gdf)
+            gdf = gdf.drop_duplicates(subset=oid_field, ignore_index=True)
+            self.logger.info(f"Removed {before - len(gdf)} features duplicated across tiles in {lname}")
+        return [gdf] if len(gdf) else []
+
+    def _concat(self, frames: List[gpd.GeoDataFrame]) -> gpd.GeoDataFrame:
+        if frames:
+            return pd.concat(frames, ignore_index=True)
+        return gpd.GeoDataFrame(geometry=[], crs=f"EPSG:{self.epsg_code}")
+
+    def _write_merged(self, frames: List[gpd.GeoDataFrame], out_path: Path) -> tuple:
+        """Concatenate frames, run geometry QA and write GeoJSON. Returns (gdf, QA report)."""
+        gdf, qa = self.qa.run(self._concat(frames))
+        gdf.to_file(out_path, driver="GeoJSON")
+        return gdf, qa
+
+    def _journal_key(self, base_url: str) -> Dict[str, Any]:
+        """Everything that changes the content of a download; a journal is only resumed if it matches."""
+        return {
+            "url": base_url,
+            "epsg_code": self.epsg_code,
+            "profile": self.profile,
+            "partition_mode": self.partition_mode,
+        }
+
+    def _geojson_crs(self) -> Optional[dict]:
+        """Legacy GeoJSON crs member for non-WGS84 output (RFC 7946 output omits it)."""
+        if self.epsg_code == 4326:
+            return None
+        return {"type": "name", "properties": {"name": f"urn:ogc:def:crs:EPSG::{self.epsg_code}"}}
+
+    @staticmethod
+    def _write_metadata(out_path: Path, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Write the result metadata next to the output as ``<stem>.metadata.json``."""
+        out_path.with_name(f"{out_path.stem}.metadata.json").write_text(json.dumps(metadata, indent=2))
+        return metadata
+
+    @staticmethod
+    def _oid_keys(values) -> pd.Series:
+        """Object IDs as strings, robust to the float upcast NaNs cause after merging layers."""
+        return pd.to_numeric(pd.Series(values), errors="coerce").astype("Int64").astype(str)
+
+    @staticmethod
+    def _oid_key(value) -> str:
+        """Scalar counterpart of _oid_keys (e.g. 12.0 -> "12")."""
+        try:
+            return str(int(float(value)))
+        except (TypeError, ValueError):
+            return "<NA>"
+
+    @staticmethod
+    def _esri_timestamp(epoch_ms: int) -> str:
+        """Format an ESRI epoch-milliseconds date for a standardized SQL where clause."""
+        return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def _to_epoch_ms(value) -> Optional[int]:
+        if value is None or pd.isna(value):
+            return None
+        if isinstance(value, (pd.Timestamp, datetime)):
+            return int(pd.Timestamp(value).timestamp() * 1000)
+        return int(value)
+
+    # ------------------------------------------------------------------
+    # Query transport (f=pbf with JSON fallback)
+    # ------------------------------------------------------------------
+    def _use_pbf(self, layer_info: dict) -> bool:
+        if self.transfer_format == "json":
+            return False
+        if self.transfer_format == "pbf":
+            return True
+        return EsriPbfDecoder.is_supported(layer_info)
+
+    def _query(self, query_url: str, params: dict, use_pbf: bool, post: bool = False) -> Optional[dict]:
+        """
+        Run a layer query and return the response as an f=json shaped dict.
+
+        Tries f=pbf first when ``use_pbf`` is set and falls back to f=json if
+        the server rejects it or answers with something that is not a buffer.
+        Returns None for empty or failed responses.
+        """
+        send = (lambda p: requests.post(query_url, data=p)) if post else (lambda p: requests.get(query_url, params=p))
+
+        quantization = self.quantization
+        if self.profile_params and "returnIdsOnly" not in params and "returnCountOnly" not in params:
+            # Quantized f=json geometries would need their own decoding, so
+            # JSON requests only get the offset/precision generalization
+            quantization = self.profile_params["quantizationParameters"]
+            params = {
+                **params,
+                "maxAllowableOffset": self.profile_params["maxAllowableOffset"],
+                "geometryPrecision": self.profile_params["geometryPrecision"],
+            }
+
+        if use_pbf:
+            pbf_params = {**params, "f": "pbf", "quantizationParameters": json.dumps(quantization)}
+            try:
+                r = send(pbf_params)
+                # Errors come back as JSON even when f=pbf was requested
+                if r.ok and r.content and "json" not in r.headers.get("Content-Type", ""):
+                    return EsriPbfDecoder.decode(r.content)
+                self.logger.warning(f"PBF query rejected by {query_url}, falling back to JSON")
+            except Exception as e:
+                self.logger.warning(f"PBF query failed for {query_url} ({e}), falling back to JSON")
+
+        r = send({**params, "f": "json"})
+        if not r.ok or not r.text.strip():
+            return None
+        data = r.json()
+        if "error" in data:
+            self.logger.warning(f"ArcGIS API error from {query_url}: {data['error']}")
+            return None
+        return data
+
+    # ------------------------------------------------------------------
+    # Geometry converter (ESRI JSON → GeoDataFrame)
+    # ------------------------------------------------------------------
+    def _arcgis_to_frame(self, features: list, layer_name: str, with_hash: bool = False) -> gpd.GeoDataFrame:
+        """
+        Convert a page of ArcGIS PJSON features into a GeoDataFrame in bulk.
 
-            geojson_features.append({
-                "type": "Feature",
-                "geometry": geometry,
-                "properties": {**attrs, "_source_layer": layer_name}
-            })
-        return geojson_features
\ No newline at end of file
+        With ``with_hash`` a ``_feature_hash`` column holds the MD5 of each
+        feature's attributes and geometry WKB, used by incremental sync.
+        """
+        geometry = EsriGeometryConverter.to_shapely([f.get("geometry") for f in features])
+        records = [f.get("attributes") or {} for f in features]
+        attrs = pd.DataFrame.from_records(records)
+        attrs["_source_layer"] = layer_name
+        if with_hash:
+            wkb = shapely.to_wkb(geometry)
+            attrs["_feature_hash"] = [
+                hashlib.md5(json.dumps(r, sort_keys=True, default=str).encode() + (g or b"")).hexdigest()
+                for r, g in zip(records, wkb)
+            ]
+        gdf = gpd.GeoDataFrame(attrs, geometry=geometry, crs=f"EPSG:{self.epsg_code}")
+        # Features without a usable geometry are dropped, as before
+        return gdf[gdf.geometry.notna()].reset_index(drop=True)
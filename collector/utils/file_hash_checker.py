@@ -1,11 +1,218 @@
 import hashlib
 import base64
-from typing import Optional
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+import google_crc32c
 
 
 class FileHashChecker:
     """Utility class for computing and comparing file hashes."""
 
+    # Shared default cache, kept outside any synced (DVC/GCS-tracked) data tree
+    DEFAULT_CACHE_PATH = Path.home() / ".cache" / "collector" / "file_hashes.sqlite"
+    READ_BUFFER = 1024 * 1024
+    ALGORITHMS = ("md5", "crc32c", "sha256")
+    # Digests computed (and cached) for every file: the two GCS reports
+    DEFAULT_ALGORITHMS = ("md5", "crc32c")
+
+    def __init__(self, cache_path: Optional[str] = None, max_workers: Optional[int] = None):
+        """
+        Args:
+            cache_path: SQLite file remembering each file's digests keyed by
+                (path, size, mtime_ns, inode), so unchanged files are not
+                re-read. None keeps the cache in memory only.
+            max_workers: Threads used to hash cache misses (hashlib releases
+                the GIL). Defaults to the CPU count.
+        """
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.max_workers = max_workers or os.cpu_count() or 1
+        if self.cache_path:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path or ":memory:"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(file_hashes)")}
+        if columns and not set(self.ALGORITHMS) <= columns:
+            # MD5-only cache from an older version; it is cheaper to rebuild than to migrate
+            self._conn.execute("DROP TABLE file_hashes")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                md5 TEXT,
+                crc32c TEXT,
+                sha256 TEXT
+            )
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def default(cls, **kwargs) -> "FileHashChecker":
+        """Checker using the shared cache in DEFAULT_CACHE_PATH."""
+        return cls(cls.DEFAULT_CACHE_PATH, **kwargs)
+
+    @staticmethod
+    def _key(filepath) -> str:
+        return os.path.abspath(filepath)
+
+    def is_cache_file(self, filepath) -> bool:
+        """True for the cache database and its -wal/-shm files (never hashed or transferred)."""
+        return bool(self.cache_path) and self._key(filepath).startswith(str(self.cache_path.absolute()))
+
+    def md5(self, filepath: str) -> str:
+        """MD5 of a file, served from the cache while its size, mtime and inode are unchanged."""
+        return self.digests(filepath)["md5"]
+
+    def md5_many(self, filepaths: Iterable[str]) -> Dict[str, str]:
+        """MD5 of many files, as {absolute path: hex MD5} (see digests_many)."""
+        return {key: digests["md5"] for key, digests in self.digests_many(filepaths).items()}
+
+    def digests(self, filepath: str, algorithms: Sequence[str] = DEFAULT_ALGORITHMS) -> Dict[str, str]:
+        """Hex digests of one file, e.g. {"md5": ..., "crc32c": ...}, served from the cache when possible."""
+        return self.digests_many([filepath], algorithms)[self._key(filepath)]
+
+    def digests_many(
+        self, filepaths: Iterable[str], algorithms: Sequence[str] = DEFAULT_ALGORITHMS
+    ) -> Dict[str, Dict[str, str]]:
+        """
+        Hex digests of many files. Cache hits cost one stat each; misses are
+        hashed in parallel, computing all digests in one read pass per file,
+        and written back in one transaction.
+
+        Args:
+            filepaths: Files to hash.
+            algorithms: Digests to return (see ALGORITHMS). MD5 and CRC32C
+                are always computed so the cache can answer either later.
+
+        Returns:
+            Dict[str, Dict[str, str]]: {absolute path: {algorithm: hex digest}}
+        """
+        wanted = tuple(dict.fromkeys((*self.DEFAULT_ALGORITHMS, *algorithms)))
+        stats = {}
+        for filepath in filepaths:
+            key = self._key(filepath)
+            st = os.stat(key)
+            stats[key] = (st.st_size, st.st_mtime_ns, st.st_ino)
+
+        result = {}
+        for key, (state, digests) in self._lookup(stats.keys()).items():
+            if state == stats[key] and all(digests.get(a) for a in algorithms):
+                result[key] = digests
+
+        misses = [key for key in stats if key not in result]
+        if misses:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(misses))) as pool:
+                hashed = list(pool.map(lambda key: self.digests_for_file(key, wanted), misses))
+            result.update(zip(misses, hashed))
+            self._store([(key, stats[key], digests) for key, digests in zip(misses, hashed)])
+        return {key: {a: result[key][a] for a in algorithms} for key in stats}
+
+    def hash_tree(self, root: str, algorithms: Sequence[str] = ("md5",)) -> Dict[str, Dict[str, str]]:
+        """
+        Digests of every file under root (the cache files are skipped if they are in it).
+
+        Returns:
+            Dict[str, Dict[str, str]]: {path relative to root (posix): {algorithm: hex digest}}
+        """
+        root = os.path.abspath(root)
+        files = []
+        stack = [root]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and not self.is_cache_file(entry.path):
+                        files.append(entry.path)
+        digests = self.digests_many(files, algorithms)
+        start = len(root) + 1
+        return {path[start:].replace(os.sep, "/"): d for path, d in digests.items()}
+
+    def _lookup(self, keys: Iterable[str]) -> Dict[str, tuple]:
+        """Cached rows as {path: ((size, mtime_ns, inode), {algorithm: hex digest})}."""
+        keys = list(keys)
+        rows = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 900):
+                chunk = keys[i:i + 900]
+                for row in self._conn.execute(
+                    f"SELECT path, size, mtime_ns, inode, {', '.join(self.ALGORITHMS)} FROM file_hashes "
+                    f"WHERE path IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    rows[row[0]] = (row[1:4], {a: d for a, d in zip(self.ALGORITHMS, row[4:]) if d})
+        return rows
+
+    def _store(self, rows):
+        """Write (path, (size, mtime_ns, inode), digests) rows."""
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, inode, {', '.join(self.ALGORITHMS)}) "
+                f"VALUES ({', '.join('?' * (4 + len(self.ALGORITHMS)))})",
+                [(key, *state, *(digests.get(a) for a in self.ALGORITHMS)) for key, state, digests in rows],
+            )
+            self._conn.commit()
+
+    def remember(self, filepath: str, digests: Dict[str, str]):
+        """
+        Record known digests for a file's current state (e.g. right after
+        downloading it). Digests not given are computed on the next lookup.
+        """
+        key = self._key(filepath)
+        st = os.stat(key)
+        self._store([(key, (st.st_size, st.st_mtime_ns, st.st_ino), digests)])
+
+    def forget(self, filepath: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM file_hashes WHERE path = ?", (self._key(filepath),))
+            self._conn.commit()
+
+    def save(self):
+        """Kept for callers of the former JSON cache; writes are committed immediately."""
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def digests_for_file(filepath: str, algorithms: Sequence[str] = DEFAULT_ALGORITHMS) -> Dict[str, str]:
+        """
+        Compute several digests of a file in a single read pass.
+
+        Args:
+            filepath: Path to the file to hash
+            algorithms: Any of "md5", "crc32c" and "sha256"
+
+        Returns:
+            {algorithm: hexadecimal digest}. CRC32C is big-endian, as GCS reports it.
+        """
+        hashers = {}
+        for algorithm in algorithms:
+            if algorithm == "crc32c":
+                hashers[algorithm] = google_crc32c.Checksum()
+            elif algorithm in ("md5", "sha256"):
+                hashers[algorithm] = hashlib.new(algorithm)
+            else:
+                raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(FileHashChecker.READ_BUFFER), b""):
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+        return {algorithm: hasher.digest().hex() for algorithm, hasher in hashers.items()}
+
     @staticmethod
     def md5_for_file(filepath: str) -> str:
         """
@@ -17,11 +224,20 @@ class FileHashChecker:
         Returns:
             Hexadecimal MD5 hash string
         """
-        hash_md5 = hashlib.md5()
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        return FileHashChecker.digests_for_file(filepath, ("md5",))["md5"]
+
+    @staticmethod
+    def gcs_hash_to_hex(gcs_hash_base64: str) -> str:
+        """
+        Convert a GCS base64-encoded hash (md5Hash or crc32c) to hexadecimal format.
+
+        Args:
+            gcs_hash_base64: Base64-encoded hash from GCS
+
+        Returns:
+            Hexadecimal hash string
+        """
+        return base64.b64decode(gcs_hash_base64).hex()
 
     @staticmethod
     def gcs_md5_to_hex(gcs_md5_base64: str) -> str:
@@ -34,24 +250,53 @@ class FileHashChecker:
         Returns:
             Hexadecimal MD5 hash string
         """
-        return base64.b64decode(gcs_md5_base64).hex()
+        return FileHashChecker.gcs_hash_to_hex(gcs_md5_base64)
+
+    @staticmethod
+    def gcs_digests(gcs_md5_base64: Optional[str], gcs_crc32c_base64: Optional[str]) -> Dict[str, str]:
+        """Hex digests a GCS blob reports ({} if neither; composite objects have no MD5)."""
+        digests = {}
+        if gcs_md5_base64:
+            digests["md5"] = FileHashChecker.gcs_hash_to_hex(gcs_md5_base64)
+        if gcs_crc32c_base64:
+            digests["crc32c"] = FileHashChecker.gcs_hash_to_hex(gcs_crc32c_base64)
+        return digests
+
+    @staticmethod
+    def matches_gcs(
+        local_digests: Dict[str, str], gcs_md5_base64: Optional[str], gcs_crc32c_base64: Optional[str] = None
+    ) -> bool:
+        """
+        Compare local hex digests with the hashes of a GCS blob, using MD5
+        when the blob has one and CRC32C otherwise.
+
+        Returns:
+            True if the strongest digest both sides have matches, False otherwise
+        """
+        remote = FileHashChecker.gcs_digests(gcs_md5_base64, gcs_crc32c_base64)
+        for algorithm in ("md5", "crc32c"):
+            if algorithm in remote and algorithm in local_digests:
+                return local_digests[algorithm] == remote[algorithm]
+        return False
 
     @staticmethod
-    def compare_file_with_gcs_hash(local_filepath: str, gcs_md5_base64: Optional[str]) -> bool:
+    def compare_file_with_gcs_hash(
+        local_filepath: str, gcs_md5_base64: Optional[str], gcs_crc32c_base64: Optional[str] = None
+    ) -> bool:
         """
         Compare local file hash with GCS blob hash.
 
         Args:
             local_filepath: Path to the local file
             gcs_md5_base64: Base64-encoded MD5 hash from GCS (can be None)
+            gcs_crc32c_base64: Base64-encoded CRC32C from GCS, used when there is no MD5
 
         Returns:
             True if hashes match, False otherwise
         """
-        if not gcs_md5_base64:
+        remote = FileHashChecker.gcs_digests(gcs_md5_base64, gcs_crc32c_base64)
+        if not remote:
             return False
 
-        local_md5 = FileHashChecker.md5_for_file(local_filepath)
-        gcs_md5_hex = FileHashChecker.gcs_md5_to_hex(gcs_md5_base64)
-
-        return local_md5 == gcs_md5_hex
\ No newline at end of file
+        local_digests = FileHashChecker.digests_for_file(local_filepath, tuple(remote))
+        return FileHashChecker.matches_gcs(local_digests, gcs_md5_base64, gcs_crc32c_base64)
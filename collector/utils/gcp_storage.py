@@ -1,13 +1,38 @@
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from google.api_core.retry import if_transient_error
 from google.cloud import storage
 from google.oauth2 import service_account
+import errno
+import logging
 import os
+import random
+import time
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from utils.blob_cache import BlobCache
+from utils.file_hash_checker import FileHashChecker
 
 
 class GCPStorage:
+    # File-lock errors seen while a browser still holds freshly downloaded files
+    # (errno 35 is EDEADLK/EAGAIN on macOS)
+    TRANSIENT_ERRNOS = {35, errno.EAGAIN, errno.EDEADLK, errno.EBUSY}
+
+    # Objects at least this large are downloaded as parallel byte ranges
+    SLICED_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024
+    SLICE_SIZE = 16 * 1024 * 1024
+
     def __init__(
-        self, gcp_project: str, bucket_name: str, credentials_path: Optional[str] = None
+        self,
+        gcp_project: str,
+        bucket_name: str,
+        credentials_path: Optional[str] = None,
+        max_workers: int = 8,
+        max_retries: int = 5,
+        logger: Optional[logging.Logger] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = BlobCache.DEFAULT_MAX_BYTES,
     ):
         """
         Initialize GCP Storage client.
@@ -17,7 +42,17 @@ class GCPStorage:
             bucket_name (str): Name of the GCS bucket.
             credentials_path (Optional[str]): Path to service account JSON key file.
                 If not provided, uses default credentials (environment variable or gcloud auth).
+            max_workers (int): Concurrent transfers used by upload_files/upload_dir.
+            max_retries (int): Attempts per file for transient errors, with exponential backoff.
+            logger (Optional[logging.Logger]): Logger to use. Defaults to the module logger.
+            cache_dir (Optional[str]): Local read cache used by cached_path/open_cached
+                (nothing is written to it unless those are called).
+                Defaults to BlobCache.DEFAULT_DIR.
+            cache_max_bytes (int): Size cap of the read cache (LRU eviction).
         """
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.logger = logger or logging.getLogger(__name__)
         if credentials_path:
             credentials = service_account.Credentials.from_service_account_file(
                 credentials_path
@@ -25,7 +60,62 @@ class GCPStorage:
             self.client = storage.Client(project=gcp_project, credentials=credentials)
         else:
             self.client = storage.Client(project=gcp_project)
+        # Keep one pooled HTTP connection per worker thread (requests defaults to 10)
+        self.client._http.mount(
+            "https://", HTTPAdapter(pool_connections=max_workers, pool_maxsize=max(10, max_workers))
+        )
         self.bucket = self.client.bucket(bucket_name)
+        self.cache = BlobCache(
+            lambda listing, path: self.download_file(listing["name"], str(path), listing=listing),
+            cache_dir,
+            cache_max_bytes,
+            namespace=bucket_name,
+        )
+
+    # Listing fields requested by iter_blobs (keeps listing pages small)
+    LIST_FIELDS = "items(name,size,md5Hash,crc32c,generation,updated),prefixes,nextPageToken"
+
+    def iter_blobs(
+        self, prefix: str = "", recursive: bool = True, page_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream blob metadata page by page without holding the whole listing.
+
+        Args:
+            prefix (str, optional): Prefix path to filter files. Defaults to "".
+            recursive (bool, optional): If False, only files directly in the prefix directory.
+            page_size (int, optional): Blobs per listing request.
+
+        Yields:
+            Dict[str, Any]: "name", "size", "md5", "crc32c", "generation" and
+                "updated" (ISO 8601) of each file, skipping directory placeholders.
+        """
+        iterator = self.bucket.list_blobs(
+            prefix=prefix,
+            delimiter=None if recursive else "/",
+            page_size=page_size,
+            fields=self.LIST_FIELDS,
+        )
+        for page in iterator.pages:
+            for blob in page:
+                if blob.name.endswith("/"):
+                    continue
+                yield {
+                    "name": blob.name,
+                    "size": blob.size,
+                    "md5": blob.md5_hash,
+                    "crc32c": blob.crc32c,
+                    "generation": blob.generation,
+                    "updated": blob.updated.isoformat() if blob.updated else None,
+                }
+
+    def iter_dirs(self, prefix: str = "", page_size: int = 1000) -> Iterator[str]:
+        """Stream the directory prefixes directly under prefix, page by page."""
+        iterator = self.bucket.list_blobs(
+            prefix=prefix, delimiter="/", page_size=page_size, fields="prefixes,nextPageToken"
+        )
+        for page in iterator.pages:
+            yield from sorted(page.prefixes)
 
     def list_files(self, prefix: str = "", recursive: bool = False) -> List[str]:
         """
@@ -40,36 +130,14 @@ class GCPStorage:
         Returns:
             List[str]: List of file paths (blob names).
         """
-        if recursive:
-            # List all files recursively under prefix
-            blobs = self.bucket.list_blobs(prefix=prefix)
-            # Filter out directory placeholders (blobs ending with /)
-            return [blob.name for blob in blobs if not blob.name.endswith('/')]
-        else:
-            # List only files directly in this directory (not subdirectories)
-            blobs = self.bucket.list_blobs(prefix=prefix, delimiter='/')
-            return [blob.name for blob in blobs if not blob.name.endswith('/')]
+        return [blob["name"] for blob in self.iter_blobs(prefix=prefix, recursive=recursive)]
 
     def list_dirs(self, prefix: str = "") -> List[str]:
         """
         List all directories in the GCS bucket.
         Returns list of directory prefixes (e.g., "parent/child/").
         """
-        # Use delimiter to get common prefixes (directories)
-        iterator = self.bucket.list_blobs(prefix=prefix, delimiter='/')
-
-        # We need to iterate through the blobs to populate the prefixes
-        # The prefixes attribute is only populated after iteration
-        list(iterator)  # Force iteration to populate prefixes
-
-        # Get the prefixes (directories)
-        directories = []
-        if hasattr(iterator, 'prefixes'):
-            for prefix_obj in iterator.prefixes:
-                directories.append(prefix_obj)
-
-        return directories
-    
+        return list(self.iter_dirs(prefix=prefix))
 
     def upload_file(self, file_path: str, destination_path: str):
         blob = self.bucket.blob(destination_path)
@@ -90,7 +158,114 @@ class GCPStorage:
             content_type='application/json'
         )
 
-    def upload_dir(self, source_path: str, destination_path: str):
+    def _is_transient(self, error: Exception) -> bool:
+        if isinstance(error, OSError) and error.errno in self.TRANSIENT_ERRNOS:
+            return True
+        return if_transient_error(error) or isinstance(error, (ConnectionError, TimeoutError))
+
+    def _with_retries(self, action, description: str) -> Tuple[int, Optional[Exception]]:
+        """
+        Run action() until it succeeds, retrying transient errors with
+        exponential backoff and jitter (1s, 2s, 4s, ... capped at 30s).
+
+        Returns:
+            (attempts made, final error or None on success)
+        """
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                action()
+                return attempt, None
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_transient(e):
+                    return attempt, e
+                delay = min(30.0, 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                self.logger.warning(
+                    f"Transient error on {description}: {e}, retrying in {delay:.1f}s "
+                    f"(attempt {attempt}/{self.max_retries})"
+                )
+                time.sleep(delay)
+
+    def upload_files(
+        self,
+        files: Sequence[Tuple[str, str]],
+        max_workers: Optional[int] = None,
+        skip_unchanged: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Upload files concurrently.
+
+        Args:
+            files (Sequence[Tuple[str, str]]): (local file path, destination blob path) pairs.
+            max_workers (Optional[int]): Concurrent uploads. Defaults to self.max_workers.
+            skip_unchanged (bool): Skip files whose destination blob already has
+                the same content (MD5, or CRC32C for composite objects). The
+                destinations are checked with one prefix listing.
+
+        Returns:
+            List[Dict[str, Any]]: One result per file, in input order, with
+                "file", "destination", "ok", "skipped", "attempts" and "error"
+                (None on success).
+        """
+        files = list(files)
+        unchanged = self._unchanged_uploads(files) if skip_unchanged else set()
+
+        def upload(item):
+            file_path, destination_path = item
+            skipped = (str(file_path), destination_path) in unchanged
+            attempts, error = 0, None
+            if not skipped:
+                attempts, error = self._with_retries(
+                    lambda: self.upload_file(str(file_path), destination_path), str(file_path)
+                )
+            if error:
+                self.logger.error(f"❌ Failed to upload {file_path}: {error}")
+            return {
+                "file": str(file_path),
+                "destination": destination_path,
+                "ok": error is None,
+                "skipped": skipped,
+                "attempts": attempts,
+                "error": None if error is None else str(error),
+            }
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as pool:
+            return list(pool.map(upload, files))
+
+    def _unchanged_uploads(self, files: Sequence[Tuple[str, str]]) -> set:
+        """
+        (local file, destination) pairs whose destination already has the
+        same content. Each destination directory is listed once, without
+        descending into subdirectories, and only size-matching files are
+        hashed, through the shared hash cache.
+        """
+        wanted = {destination for _, destination in files}
+        remote = {}
+        for directory in {destination.rpartition("/")[0] for destination in wanted}:
+            for blob in self.iter_blobs(prefix=f"{directory}/" if directory else "", recursive=False):
+                if blob["name"] in wanted:
+                    remote[blob["name"]] = blob
+        candidates = [
+            (str(file_path), destination) for file_path, destination in files
+            if destination in remote
+            and os.path.isfile(file_path)
+            and (remote[destination]["md5"] or remote[destination]["crc32c"])
+            and remote[destination]["size"] == os.path.getsize(file_path)
+        ]
+        if not candidates:
+            return set()
+        hashes = FileHashChecker.default()
+        try:
+            local_digests = hashes.digests_many(file_path for file_path, _ in candidates)
+        finally:
+            hashes.close()
+        return {
+            (file_path, destination) for file_path, destination in candidates
+            if FileHashChecker.matches_gcs(
+                local_digests[os.path.abspath(file_path)], remote[destination]["md5"], remote[destination]["crc32c"]
+            )
+        }
+
+    def upload_dir(self, source_path: str, destination_path: str) -> List[Dict[str, Any]]:
         """
         Uploads all files from a local directory to a GCS "directory" (prefix),
         preserving the subdirectory structure.
@@ -98,9 +273,13 @@ class GCPStorage:
         Args:
             source_path (str): Local directory path to upload from.
             destination_path (str): Prefix (directory) in the GCS bucket.
+
+        Returns:
+            List[Dict[str, Any]]: Per-file results, see upload_files.
         """
         source_path = Path(source_path)
 
+        files = []
         # Walk through all files in the source directory
         for local_file in source_path.rglob("*"):
             if local_file.is_file():
@@ -108,17 +287,110 @@ class GCPStorage:
                 rel_path = local_file.relative_to(source_path)
                 # Create the GCS blob path
                 gcs_path = f"{destination_path}/{rel_path}".replace("\\", "/")
-                blob = self.bucket.blob(gcs_path)
-                blob.upload_from_filename(str(local_file))
+                files.append((str(local_file), gcs_path))
+        return self.upload_files(files)
+
+    def download_file(
+        self,
+        source_path: str,
+        destination_path: str,
+        sliced: Optional[bool] = None,
+        listing: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Download a blob to a local file.
 
-    def download_file(self, source_path: str, destination_path: str):
-        blob = self.bucket.blob(source_path)
-        blob.download_to_filename(destination_path)
+        Args:
+            source_path (str): Blob path in the GCS bucket.
+            destination_path (str): Local file path.
+            sliced (Optional[bool]): Fetch byte ranges in parallel. None (default)
+                slices objects of at least SLICED_DOWNLOAD_THRESHOLD bytes.
+            listing (Optional[Dict[str, Any]]): The blob's iter_blobs entry. Its
+                size, checksums and generation are used instead of a metadata
+                request, and the download is pinned to that generation.
+        """
+        if listing is None:
+            blob = self.bucket.blob(source_path)
+            if sliced is False:
+                blob.download_to_filename(destination_path)
+                return
+            blob.reload()  # size, checksums and generation
+            listing = blob
+        self._download_blob(listing, destination_path, sliced=sliced)
+
+    @staticmethod
+    def _listing(blob) -> Dict[str, Any]:
+        """iter_blobs-style entry of a listed Blob (or the entry itself)."""
+        if isinstance(blob, dict):
+            return blob
+        return {
+            "name": blob.name,
+            "size": blob.size,
+            "md5": blob.md5_hash,
+            "crc32c": blob.crc32c,
+            "generation": blob.generation,
+        }
+
+    def _download_blob(self, blob, destination_path: str, sliced: Optional[bool] = None):
+        """
+        Download a blob whose metadata is known (a listed Blob or an
+        iter_blobs entry), slicing large ones. The listed generation is pinned.
+        """
+        listing = self._listing(blob)
+        if sliced or (sliced is None and (listing["size"] or 0) >= self.SLICED_DOWNLOAD_THRESHOLD):
+            self._download_sliced(listing, destination_path)
+        else:
+            source = self.bucket.blob(listing["name"], generation=listing["generation"])
+            source.download_to_filename(str(destination_path))
+
+    def _download_sliced(self, listing: Dict[str, Any], destination_path: str):
+        """
+        Fetch SLICE_SIZE byte ranges in parallel into a preallocated file,
+        then verify the whole file against the blob's CRC32C (or MD5).
+        """
+        destination_path = Path(destination_path)
+        tmp_path = destination_path.with_name(f"{destination_path.name}.part")
+        # Pin the generation so every range comes from the same object version
+        source = self.bucket.blob(listing["name"], generation=listing["generation"])
+        size = listing["size"]
+        with open(tmp_path, "wb") as f:
+            f.truncate(size)
+
+        def fetch(start: int):
+            end = min(start + self.SLICE_SIZE, size) - 1
+
+            def download_range():
+                with open(tmp_path, "r+b") as f:
+                    f.seek(start)
+                    source.download_to_file(f, start=start, end=end, checksum=None)
+
+            _, error = self._with_retries(download_range, f"{listing['name']} bytes {start}-{end}")
+            if error:
+                raise error
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                list(pool.map(fetch, range(0, size, self.SLICE_SIZE)))
+            self._verify_download(tmp_path, listing)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, destination_path)
+
+    @staticmethod
+    def _verify_download(path: Path, listing: Dict[str, Any]):
+        """Check a downloaded file against the listed CRC32C and MD5 in one read pass."""
+        expected = FileHashChecker.gcs_digests(listing["md5"], listing["crc32c"])
+        actual = FileHashChecker.digests_for_file(path, tuple(expected))
+        for algorithm, digest in expected.items():
+            if actual[algorithm] != digest:
+                raise ValueError(f"{algorithm.upper()} mismatch for {listing['name']}")
 
     def download_dir(self, source_path: str, destination_path: str):
         """
         Downloads all files from a GCS "directory" (prefix) to a local directory,
-        preserving the subdirectory structure.
+        preserving the subdirectory structure. Large objects are downloaded
+        in parallel slices.
 
         Args:
             source_path (str): Prefix (directory) in the GCS bucket.
@@ -137,7 +409,186 @@ class GCPStorage:
             rel_path = os.path.relpath(blob.name, source_path)
             local_file = destination_path / rel_path
             local_file.parent.mkdir(parents=True, exist_ok=True)
-            blob.download_to_filename(str(local_file))
+            self._download_blob(blob, str(local_file))
+
+    def _list_remote(self, prefix: str) -> Dict[str, Dict[str, Any]]:
+        """
+        One listing of a prefix, keeping the fields sync needs.
+
+        Returns:
+            {path relative to prefix: {"name", "md5", "crc32c", "size", "generation"}}
+        """
+        base = f"{prefix.rstrip('/')}/" if prefix else ""
+        blobs = self.bucket.list_blobs(
+            prefix=base, fields="items(name,md5Hash,crc32c,size,generation),nextPageToken"
+        )
+        return {
+            blob.name[len(base):]: {
+                "name": blob.name,
+                "md5": blob.md5_hash,
+                "crc32c": blob.crc32c,
+                "size": blob.size,
+                "generation": blob.generation,
+            }
+            for blob in blobs
+            if not blob.name.endswith("/")
+        }
+
+    def sync(
+        self,
+        local_dir: str,
+        prefix: str,
+        direction: str = "upload",
+        delete: bool = False,
+        dry_run: bool = False,
+        hash_cache: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        rsync-style sync between a local directory and a GCS prefix.
+
+        The prefix is listed once; files whose size and MD5 (CRC32C for
+        composite objects, which have no MD5) match the listing are skipped
+        (local digests come from a FileHashChecker cache), and only
+        the differences are transferred in parallel. Uploads and deletes are
+        conditioned on the listed generation, so objects changed by someone
+        else in the meantime are not overwritten.
+
+        Args:
+            local_dir (str): Local directory.
+            prefix (str): GCS prefix ("directory") to sync with.
+            direction (str): "upload" (local -> GCS) or "download" (GCS -> local).
+            delete (bool): Delete files on the destination side that do not exist on the source side.
+            dry_run (bool): Only report what would be transferred or deleted.
+            hash_cache (Optional[str]): Local hash cache file. Defaults to
+                FileHashChecker.DEFAULT_CACHE_PATH, outside the synced tree; a
+                cache inside local_dir is never transferred.
+
+        Returns:
+            Dict[str, Any]: "transferred", "deleted" and "failed" lists of relative
+                paths, and the number of "unchanged" files.
+        """
+        if direction not in ("upload", "download"):
+            raise ValueError("direction must be 'upload' or 'download'")
+        local_dir = Path(local_dir)
+        local_dir.mkdir(parents=True, exist_ok=True)
+        hashes = FileHashChecker(hash_cache) if hash_cache else FileHashChecker.default()
+
+        remote = self._list_remote(prefix)
+        local = {
+            path.relative_to(local_dir).as_posix(): path
+            for path in local_dir.rglob("*")
+            if path.is_file() and not hashes.is_cache_file(path)
+        }
+
+        # Only files present on both sides with equal sizes need hashing
+        candidates = [
+            rel for rel, blob in remote.items()
+            if rel in local and (blob["md5"] or blob["crc32c"]) and blob["size"] == local[rel].stat().st_size
+        ]
+        local_digests = hashes.digests_many(local[rel] for rel in candidates)
+        unchanged = {
+            rel for rel in candidates
+            if FileHashChecker.matches_gcs(
+                local_digests[os.path.abspath(local[rel])], remote[rel]["md5"], remote[rel]["crc32c"]
+            )
+        }
+
+        sources = local if direction == "upload" else remote
+        targets = remote if direction == "upload" else local
+        to_transfer = sorted(rel for rel in sources if rel not in unchanged)
+        to_delete = sorted(set(targets) - set(sources)) if delete else []
+        result = {
+            "transferred": to_transfer,
+            "deleted": to_delete,
+            "failed": [],
+            "unchanged": len(sources) - len(to_transfer),
+        }
+        if dry_run:
+            return result
+
+        base = f"{prefix.rstrip('/')}/" if prefix else ""
+
+        def transfer(rel: str):
+            blob_info = remote.get(rel)
+            if direction == "upload":
+                # Only create, or replace exactly the generation we listed
+                generation = blob_info["generation"] if blob_info else 0
+                blob = self.bucket.blob(f"{base}{rel}")
+                blob.upload_from_filename(str(local[rel]), if_generation_match=generation)
+                hashes.digests(local[rel])
+            else:
+                path = local_dir / rel
+                path.parent.mkdir(parents=True, exist_ok=True)
+                self._download_blob(blob_info, str(path))
+                # Verified against these digests while downloading
+                hashes.remember(path, FileHashChecker.gcs_digests(blob_info["md5"], blob_info["crc32c"]))
+
+        def remove(rel: str):
+            if direction == "upload":
+                self.bucket.blob(remote[rel]["name"]).delete(if_generation_match=remote[rel]["generation"])
+            else:
+                local[rel].unlink()
+                hashes.forget(local[rel])
+
+        def run(item):
+            action, rel = item
+            _, error = self._with_retries(lambda: action(rel), rel)
+            if error:
+                self.logger.error(f"❌ Failed to sync {rel}: {error}")
+            return rel, error
+
+        tasks = [(transfer, rel) for rel in to_transfer] + [(remove, rel) for rel in to_delete]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for rel, error in pool.map(run, tasks):
+                if error:
+                    result["failed"].append(rel)
+        hashes.close()
+
+        failed = set(result["failed"])
+        result["transferred"] = [rel for rel in to_transfer if rel not in failed]
+        result["deleted"] = [rel for rel in to_delete if rel not in failed]
+        self.logger.info(
+            f"✅ Synced {local_dir} {'→' if direction == 'upload' else '←'} gs://{self.bucket.name}/{base}: "
+            f"{len(result['transferred'])} transferred, {len(result['deleted'])} deleted, "
+            f"{result['unchanged']} unchanged, {len(failed)} failed"
+        )
+        return result
+
+    def _cache_listing(self, blob_or_path) -> Dict[str, Any]:
+        """Listing metadata for the read cache; only a bare path or Blob needs a (listing) request."""
+        if isinstance(blob_or_path, dict):
+            return blob_or_path
+        if not isinstance(blob_or_path, str) and (blob_or_path.md5_hash or blob_or_path.generation is not None):
+            return self._listing(blob_or_path)
+        name = blob_or_path if isinstance(blob_or_path, str) else blob_or_path.name
+        for listing in self.iter_blobs(prefix=name):
+            if listing["name"] == name:
+                return listing
+        raise FileNotFoundError(f"gs://{self.bucket.name}/{name} not found")
+
+    def cached_path(self, blob_or_path) -> Path:
+        """
+        Local path of a blob's content via the read-through cache.
+
+        Args:
+            blob_or_path: iter_blobs entry, listed Blob, or blob path in this
+                bucket. Listing metadata is used as is; a bare path costs one
+                listing request.
+
+        Returns:
+            Path: Cached file; only downloaded if not cached yet.
+        """
+        return self.cache.get_path(self._cache_listing(blob_or_path))
+
+    def open_cached(self, blob_or_path):
+        """
+        Memory-map a blob's cached content read-only (see cached_path).
+
+        Usage:
+            with storage.open_cached("maps/plan.pdf") as data:
+                doc = fitz.open(stream=data, filetype="pdf")
+        """
+        return self.cache.open_mmap(self._cache_listing(blob_or_path))
 
     def get_blob(self, blob_path: str):
         """
@@ -0,0 +1,207 @@
+"""
+Local manifest snapshots of a GCS bucket
+----------------------------------------
+Persists the listing of a bucket (or prefix) in a SQLite file so tools can
+query the bucket layout — files, sizes, checksums, directories — without
+listing GCS again.
+
+``refresh`` streams the listing page by page (see GCPStorage.iter_blobs)
+and applies it as a diff: rows are only written for new or changed
+generations, and rows not seen anymore are removed. GCS cannot list only
+objects modified since a time, so a refresh still reads the listing, but
+it can be limited to the sub-prefixes that are known to have changed.
+
+Usage:
+    python -m utils.gcs_manifest --manifest tmp/bucket.sqlite --prefix zoning_ordinance/
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from utils.gcp_storage import GCPStorage
+from utils.smart_arg_parser import SmartArgItem, SmartArgParser
+
+
+class GCSManifest:
+    COLUMNS = ("name", "size", "md5", "crc32c", "generation", "updated")
+
+    def __init__(self, db_path: str, storage: Optional[GCPStorage] = None):
+        """
+        Args:
+            db_path: SQLite file holding the snapshot (created if missing).
+            storage: Storage to refresh from. Not needed for read-only queries.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.storage = storage
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                name TEXT PRIMARY KEY,
+                size INTEGER,
+                md5 TEXT,
+                crc32c TEXT,
+                generation INTEGER,
+                updated TEXT,
+                seen INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS refreshes (
+                prefix TEXT PRIMARY KEY,
+                refreshed_at REAL
+            );
+            """
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+    def refresh(self, prefixes: Sequence[str] = ("",), page_size: int = 1000) -> Dict[str, int]:
+        """
+        Bring the snapshot of the given prefixes up to date.
+
+        Args:
+            prefixes: Prefixes to re-list. Defaults to the whole bucket.
+            page_size: Blobs per listing request.
+
+        Returns:
+            Dict[str, int]: Counts of "added", "updated", "removed" and "unchanged" blobs.
+        """
+        if self.storage is None:
+            raise ValueError("A GCPStorage is required to refresh the manifest")
+
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        run_id = time.time_ns()
+        with self.conn:
+            for prefix in prefixes:
+                batch: List[Dict[str, Any]] = []
+                for blob in self.storage.iter_blobs(prefix=prefix, page_size=page_size):
+                    batch.append(blob)
+                    if len(batch) >= page_size:
+                        self._apply(batch, run_id, stats)
+                        batch = []
+                self._apply(batch, run_id, stats)
+
+                removed = self.conn.execute(
+                    "DELETE FROM blobs WHERE name >= ? AND name < ? AND seen != ?",
+                    (prefix, self._prefix_end(prefix), run_id),
+                ).rowcount
+                stats["removed"] += removed
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO refreshes (prefix, refreshed_at) VALUES (?, ?)",
+                    (prefix, time.time()),
+                )
+        return stats
+
+    def _apply(self, batch: List[Dict[str, Any]], run_id: int, stats: Dict[str, int]):
+        """Upsert one listing page, only rewriting rows whose generation changed."""
+        if not batch:
+            return
+        names = [b["name"] for b in batch]
+        known = dict(self.conn.execute(
+            f"SELECT name, generation FROM blobs WHERE name IN ({','.join('?' * len(names))})", names
+        ).fetchall())
+
+        changed = [b for b in batch if known.get(b["name"]) != b["generation"]]
+        for b in changed:
+            stats["updated" if b["name"] in known else "added"] += 1
+        stats["unchanged"] += len(batch) - len(changed)
+
+        changed_names = {b["name"] for b in changed}
+        self.conn.executemany(
+            "UPDATE blobs SET seen = ? WHERE name = ?",
+            [(run_id, name) for name in names if name in known and name not in changed_names],
+        )
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO blobs ({', '.join(self.COLUMNS)}, seen) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(*(b[c] for c in self.COLUMNS), run_id) for b in changed],
+        )
+
+    @staticmethod
+    def _prefix_end(prefix: str) -> str:
+        """Smallest string greater than every string starting with prefix."""
+        if not prefix:
+            return "\U0010ffff"
+        return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def files(self, prefix: str = "", recursive: bool = True) -> Iterator[Dict[str, Any]]:
+        """Yield blob metadata under prefix from the snapshot, in name order."""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM blobs WHERE name >= ? AND name < ? ORDER BY name",
+            (prefix, self._prefix_end(prefix)),
+        )
+        for row in cursor:
+            if recursive or "/" not in row[0][len(prefix):]:
+                yield dict(zip(self.COLUMNS, row))
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM blobs WHERE name = ?", (name,)
+        ).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def dirs(self, prefix: str = "") -> List[str]:
+        """Directory prefixes directly under prefix (e.g. "parent/child/")."""
+        dirs = set()
+        for (name,) in self.conn.execute(
+            "SELECT name FROM blobs WHERE name >= ? AND name < ?", (prefix, self._prefix_end(prefix))
+        ):
+            rest = name[len(prefix):]
+            if "/" in rest:
+                dirs.add(prefix + rest.split("/", 1)[0] + "/")
+        return sorted(dirs)
+
+    def stats(self, prefix: str = "") -> Dict[str, Any]:
+        """File count and total size under prefix, plus when it was last refreshed."""
+        count, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs WHERE name >= ? AND name < ?",
+            (prefix, self._prefix_end(prefix)),
+        ).fetchone()
+        refreshed = self.conn.execute(
+            "SELECT MAX(refreshed_at) FROM refreshes WHERE ? LIKE prefix || '%'", (prefix,)
+        ).fetchone()[0]
+        return {"files": count, "bytes": size, "refreshed_at": refreshed}
+
+
+if __name__ == "__main__":
+    import json
+    import os
+
+    schema = {
+        "manifest": SmartArgItem(
+            flags=["--manifest"],
+            prompt="Path to the manifest SQLite file?",
+            arg_type=str,
+            required=True,
+        ),
+        "prefix": SmartArgItem(
+            flags=["--prefix"],
+            prompt="Prefix to refresh (empty for the whole bucket)?",
+            arg_type=str,
+            required=False,
+            default="",
+        ),
+    }
+    parser = SmartArgParser(schema)
+    args = parser.parse()
+
+    storage = GCPStorage(
+        gcp_project=os.environ["GCP_PROJECT"], bucket_name=os.environ["GCS_BUCKET_NAME"]
+    )
+    with GCSManifest(args["manifest"], storage) as manifest:
+        print(json.dumps(manifest.refresh([args["prefix"] or ""])))
+        print(json.dumps(manifest.stats(args["prefix"] or "")))
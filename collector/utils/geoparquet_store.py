@@ -0,0 +1,150 @@
+"""
+Partitioned GeoParquet store for downloaded GIS layers
+------------------------------------------------------
+Writes GeoDataFrames as a Hive-partitioned GeoParquet dataset:
+
+    <root>/state=<state>/city=<city>/_source_layer=<layer>/part-0.parquet
+
+Files carry a ``bbox`` covering column (GeoParquet 1.1) and are sorted
+along a Hilbert curve, so row-group statistics stay tight and readers can
+push down bbox, partition and column filters instead of parsing whole
+GeoJSON files.
+
+Partition directory names are sanitized, so each file also keeps its
+original layer name in ``_source_layer_name``; ``read`` restores
+``_source_layer`` from it.
+"""
+
+import re
+import shutil
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow.parquet as pq
+
+
+class GeoParquetStore:
+    PARTITION_COLUMNS = ("state", "city", "_source_layer")
+    LAYER_COLUMN = "_source_layer"
+    # Unsanitized layer name, stored in the files (a partition column must not also be a file column)
+    LAYER_NAME_COLUMN = "_source_layer_name"
+
+    def __init__(self, root: str, compression: str = "zstd", row_group_size: int = 50_000):
+        """
+        Args:
+            root: Dataset root directory.
+            compression: Parquet compression codec.
+            row_group_size: Rows per row group; smaller groups prune better on bbox reads.
+        """
+        self.root = Path(root)
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    @staticmethod
+    def _partition_value(value: str) -> str:
+        """Make a value safe to use as a Hive partition directory name."""
+        return re.sub(r"[/\\=]", "_", str(value)).strip() or "_"
+
+    def partition_path(self, state: str, city: str, layer: str) -> Path:
+        values = (state, city, layer)
+        parts = [f"{col}={self._partition_value(v)}" for col, v in zip(self.PARTITION_COLUMNS, values)]
+        return self.root.joinpath(*parts)
+
+    def write(self, gdf: gpd.GeoDataFrame, state: str, city: str, layer_name: Optional[str] = None) -> List[str]:
+        """
+        Write a GeoDataFrame into the store, one partition per ``_source_layer``.
+
+        Existing partitions for the same state/city/layer are replaced.
+
+        Args:
+            gdf: Features to write. Rows are grouped by ``_source_layer``;
+                ``layer_name`` is used if the column is missing.
+            state: State partition value (e.g. "MA").
+            city: City partition value (e.g. "boston").
+            layer_name: Fallback layer name.
+
+        Returns:
+            List of written file paths.
+        """
+        if self.LAYER_COLUMN not in gdf.columns:
+            if layer_name is None:
+                raise ValueError(f"GeoDataFrame has no {self.LAYER_COLUMN} column and no layer_name was given")
+            gdf = gdf.assign(**{self.LAYER_COLUMN: layer_name})
+
+        written = []
+        for layer, part in gdf.groupby(self.LAYER_COLUMN, sort=False):
+            out_dir = self.partition_path(state, city, layer)
+            if out_dir.exists():
+                shutil.rmtree(out_dir)
+            out_dir.mkdir(parents=True)
+
+            # Partition values live in the directory names, not in the files
+            part = part.drop(columns=[c for c in self.PARTITION_COLUMNS if c in part.columns])
+            part = part.assign(**{self.LAYER_NAME_COLUMN: layer})
+            if len(part) > 1 and not part.geometry.is_empty.all():
+                part = part.iloc[part.geometry.hilbert_distance().argsort()]
+
+            out_path = out_dir / "part-0.parquet"
+            part.to_parquet(
+                out_path,
+                index=False,
+                compression=self.compression,
+                row_group_size=self.row_group_size,
+                write_covering_bbox=True,
+            )
+            written.append(str(out_path))
+        return written
+
+    def read(
+        self,
+        state: Optional[str] = None,
+        city: Optional[str] = None,
+        layers: Optional[Sequence[str]] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> gpd.GeoDataFrame:
+        """
+        Read features from the store, pushing filters down to Parquet.
+
+        Args:
+            state: Only read this state partition.
+            city: Only read this city partition.
+            layers: Only read these ``_source_layer`` partitions.
+            bbox: (xmin, ymin, xmax, ymax) filter on the bbox covering column.
+            columns: Columns to read; the geometry column is always included.
+
+        Returns:
+            GeoDataFrame with partition columns restored as regular columns.
+        """
+        wanted = {
+            "state": None if state is None else {self._partition_value(state)},
+            "city": None if city is None else {self._partition_value(city)},
+            self.LAYER_COLUMN: None if layers is None else {self._partition_value(v) for v in layers},
+        }
+        if columns is not None:
+            columns = list(dict.fromkeys([*columns, "geometry", self.LAYER_NAME_COLUMN]))
+
+        frames = []
+        # Partition pruning happens on the directory names; bbox and column
+        # filters are pushed down into each file
+        for path in sorted(self.root.glob("state=*/city=*/_source_layer=*/*.parquet")):
+            values = dict(part.split("=", 1) for part in path.parent.relative_to(self.root).parts)
+            if any(allowed is not None and values[col] not in allowed for col, allowed in wanted.items()):
+                continue
+            file_columns = columns
+            if columns is not None and self.LAYER_NAME_COLUMN not in pq.read_schema(path).names:
+                file_columns = [c for c in columns if c != self.LAYER_NAME_COLUMN]
+            part = gpd.read_parquet(path, columns=file_columns, bbox=bbox)
+            if len(part):
+                part = part.assign(**values)
+                if self.LAYER_NAME_COLUMN in part.columns:
+                    # Unsanitized name; older files without the column keep the directory value
+                    part[self.LAYER_COLUMN] = part.pop(self.LAYER_NAME_COLUMN)
+                frames.append(part)
+
+        if not frames:
+            names = [c for c in columns or [] if c != self.LAYER_NAME_COLUMN]
+            return gpd.GeoDataFrame(columns=[*names, *self.PARTITION_COLUMNS], geometry=[])
+        return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=frames[0].crs)
@@ -0,0 +1,305 @@
+"""
+Ordinance text store with full-text search
+------------------------------------------
+Keeps downloaded ordinance sections in PostgreSQL so they can be searched
+across cities instead of grepping files.
+
+Each row is one section, keyed by (municipality, title_path). The title
+path comes from the downloaded file name, where the scraper joins the
+section hierarchy with ``MunicodeScraper.FILE_NAME_SEPARATOR``
+(e.g. "ARTICLE 4 ⫸ Sec. 4-1 Use Regulations.docx"). Its first title is stored
+as ``document_title`` and its last as ``document_subtitle``.
+
+Search runs on indexes:
+    - ``search``: a generated tsvector (titles weighted above body text)
+      with a GIN index, queried with websearch syntax
+      ("accessory dwelling unit" -garage)
+    - trigram GIN indexes on title_path/document_title for fuzzy title lookups
+
+Usage:
+    python -m utils.ordinance_store --db-name spatial --directory tmp/al/birmingham --municipality al/birmingham
+    python -m utils.ordinance_store --db-name spatial --query '"accessory dwelling unit"'
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+
+from utils.db_accessor import DBAccessor
+from utils.docx_parser import DocxParser
+from utils.pdf_parser import PDFParser
+from utils.scrapers.municode_scraper import MunicodeScraper
+from utils.smart_arg_parser import SmartArgItem, SmartArgParser
+
+
+class OrdinanceStore:
+    TITLE_SEPARATOR = MunicodeScraper.FILE_NAME_SEPARATOR
+    TEXT_SEARCH_CONFIG = "english"
+    RECORD_COLUMNS = (
+        "municipality", "title_path", "section_path", "document_title",
+        "document_subtitle", "content", "content_md5", "source",
+    )
+
+    def __init__(self, db: DBAccessor, table: str = "ordinance_sections", logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            db: Accessor of the database holding the store.
+            table: Table name ("table" or "schema.table").
+            logger: Logger to use. Defaults to the module logger.
+        """
+        self.db = db
+        self.table = table
+        self.logger = logger or logging.getLogger(__name__)
+
+    # ------------------------------------------------------------------
+    # Schema
+    # ------------------------------------------------------------------
+    def create_schema(self):
+        """Create the table and its search indexes if they don't exist."""
+        table = DBAccessor.table_identifier(self.table)
+        name = self.table.rpartition(".")[2]
+        config = sql.Literal(self.TEXT_SEARCH_CONFIG)
+        with self.db.transaction():
+            self.db.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            schema = self.table.rpartition(".")[0]
+            if schema:
+                self.db.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(schema)))
+            self.db.execute(
+                sql.SQL(
+                    """
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id BIGSERIAL PRIMARY KEY,
+                        municipality TEXT NOT NULL,
+                        title_path TEXT NOT NULL,
+                        section_path TEXT[] NOT NULL,
+                        document_title TEXT,
+                        document_subtitle TEXT,
+                        content TEXT NOT NULL,
+                        content_md5 TEXT NOT NULL,
+                        source TEXT,
+                        updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                        search TSVECTOR GENERATED ALWAYS AS (
+                            setweight(to_tsvector({config}::regconfig, title_path), 'A')
+                            || setweight(to_tsvector({config}::regconfig, content), 'B')
+                        ) STORED,
+                        UNIQUE (municipality, title_path)
+                    )
+                    """
+                ).format(table=table, config=config)
+            )
+            for suffix, definition in (
+                ("search_gin", "USING GIN (search)"),
+                ("title_path_trgm", "USING GIN (title_path gin_trgm_ops)"),
+                ("document_title_trgm", "USING GIN (document_title gin_trgm_ops)"),
+            ):
+                self.db.execute(
+                    sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} {}").format(
+                        sql.Identifier(f"{name}_{suffix}"), table, sql.SQL(definition)
+                    )
+                )
+        self.logger.info(f"✅ Ordinance store ready: {self.table}")
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    @classmethod
+    def section_path(cls, file_path: str) -> List[str]:
+        """Section hierarchy encoded in a downloaded file name."""
+        return [title.strip() for title in Path(file_path).stem.split(cls.TITLE_SEPARATOR) if title.strip()]
+
+    @classmethod
+    def section_record(cls, file_path: str, municipality: str, content: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the row of one downloaded section file.
+
+        Args:
+            file_path: .docx (or .pdf/.txt) section file.
+            municipality: Municipality key, e.g. "al/birmingham" (see collector.city()).
+            content: Section text; extracted from the file if not given.
+        """
+        path = cls.section_path(file_path)
+        if content is None:
+            suffix = Path(file_path).suffix.lower()
+            if suffix == ".docx":
+                content = DocxParser.extract_text_from_docx(file_path)
+            elif suffix == ".pdf":
+                content = PDFParser.extract_text_from_pdf(file_path)
+            else:
+                content = Path(file_path).read_text(encoding="utf-8").replace("\x00", "")
+        return {
+            "municipality": municipality,
+            "title_path": f" {cls.TITLE_SEPARATOR} ".join(path),
+            "section_path": path,
+            "document_title": path[0] if path else None,
+            "document_subtitle": path[-1] if len(path) > 1 else None,
+            "content": content,
+            "content_md5": hashlib.md5(content.encode("utf-8")).hexdigest(),
+            "source": Path(file_path).name,
+        }
+
+    def save_sections(self, records: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Upsert sections keyed on (municipality, title_path). Sections whose
+        content MD5 is unchanged are not rewritten.
+
+        Returns:
+            Dict[str, int]: Counts of "inserted", "updated" and "unchanged" sections.
+        """
+        # One statement cannot update the same row twice; the last record of a key wins
+        unique = {(r["municipality"], r["title_path"]): r for r in records}
+        return self.db.upsert_changed(
+            self.table,
+            ("municipality", "title_path"),
+            self.RECORD_COLUMNS,
+            ([record[c] for c in self.RECORD_COLUMNS] for record in unique.values()),
+            hash_column="content_md5",
+            touch_column="updated_at",
+        )
+
+    def load_directory(self, directory: str, municipality: str, pattern: str = "*.docx") -> Dict[str, int]:
+        """
+        Extract and store every section file of a collector's download directory.
+
+        Returns:
+            Dict[str, int]: Counts of "inserted", "updated" and "unchanged" sections.
+        """
+        records = []
+        for file_path in sorted(Path(directory).glob(pattern)):
+            try:
+                records.append(self.section_record(str(file_path), municipality))
+            except Exception as e:
+                self.logger.error(f"❌ Skipping {file_path.name}: {e}")
+        return self.save_sections(records)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def search(
+        self,
+        query: str,
+        municipalities: Optional[List[str]] = None,
+        limit: int = 20,
+        snippet_words: int = 30,
+    ) -> List[Dict[str, Any]]:
+        """
+        Full-text search over section titles and text.
+
+        Args:
+            query: Web-search style query: words, "quoted phrases", OR, -excluded.
+            municipalities: Restrict to these municipalities. Defaults to all.
+            limit: Maximum number of results.
+            snippet_words: Approximate length of the highlighted snippet.
+
+        Returns:
+            List of dicts with municipality, title_path, document_title,
+            document_subtitle, rank and snippet (matches wrapped in ** **),
+            best matches first.
+        """
+        config = sql.Literal(self.TEXT_SEARCH_CONFIG)
+        # Rank and limit first so ts_headline only runs on the returned rows
+        statement = sql.SQL(
+            """
+            SELECT municipality, title_path, document_title, document_subtitle, rank,
+                   ts_headline({config}::regconfig, content, q, %(headline)s) AS snippet
+            FROM (
+                SELECT s.*, ts_rank_cd(s.search, q) AS rank, q
+                FROM {table} s, websearch_to_tsquery({config}::regconfig, %(query)s) q
+                WHERE s.search @@ q
+                  AND (%(municipalities)s::text[] IS NULL OR s.municipality = ANY(%(municipalities)s))
+                ORDER BY rank DESC
+                LIMIT %(limit)s
+            ) hits
+            ORDER BY rank DESC
+            """
+        ).format(table=DBAccessor.table_identifier(self.table), config=config)
+        params = {
+            "query": query,
+            "municipalities": municipalities,
+            "limit": limit,
+            "headline": f"StartSel=**, StopSel=**, MaxWords={snippet_words}, MinWords={snippet_words // 2}",
+        }
+        with self.db.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(statement, params)
+            return [dict(row) for row in cur.fetchall()]
+
+    def search_titles(
+        self, text: str, municipalities: Optional[List[str]] = None, limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuzzy lookup of sections by title (substring or trigram similarity
+        against the full title path or the document title), e.g. "use regul"
+        or "acessory dwelling".
+
+        Returns:
+            List of dicts with municipality, title_path, document_title,
+            document_subtitle and similarity, most similar first.
+        """
+        # The document title is a prefix of the title path, so only its trigram
+        # similarity (higher on the shorter string) adds matches; each predicate
+        # uses its column's trigram index
+        statement = sql.SQL(
+            """
+            SELECT municipality, title_path, document_title, document_subtitle,
+                   GREATEST(similarity(title_path, %(text)s), similarity(document_title, %(text)s)) AS similarity
+            FROM {table}
+            WHERE (title_path ILIKE '%%' || %(text)s || '%%' OR title_path %% %(text)s
+                   OR document_title %% %(text)s)
+              AND (%(municipalities)s::text[] IS NULL OR municipality = ANY(%(municipalities)s))
+            ORDER BY similarity DESC
+            LIMIT %(limit)s
+            """
+        ).format(table=DBAccessor.table_identifier(self.table))
+        with self.db.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(statement, {"text": text, "municipalities": municipalities, "limit": limit})
+            return [dict(row) for row in cur.fetchall()]
+
+
+if __name__ == "__main__":
+    import json
+
+    schema = {
+        "db_name": SmartArgItem(
+            flags=["--db-name"],
+            prompt="Database name?",
+            arg_type=str,
+            required=True,
+        ),
+        "directory": SmartArgItem(
+            flags=["--directory"],
+            prompt="Download directory of section files to load (empty to skip)?",
+            arg_type=str,
+            required=False,
+            default="",
+        ),
+        "municipality": SmartArgItem(
+            flags=["--municipality"],
+            prompt="Municipality of the loaded files (e.g. al/birmingham)?",
+            arg_type=str,
+            required=False,
+            default="",
+        ),
+        "query": SmartArgItem(
+            flags=["--query"],
+            prompt="Full-text query to run (empty to skip)?",
+            arg_type=str,
+            required=False,
+            default="",
+        ),
+    }
+    parser = SmartArgParser(schema)
+    args = parser.parse()
+
+    logging.basicConfig(level=logging.INFO)
+    with DBAccessor(args["db_name"]) as db:
+        store = OrdinanceStore(db)
+        store.create_schema()
+        if args["directory"]:
+            if not args["municipality"]:
+                raise ValueError("--municipality is required with --directory")
+            print(json.dumps(store.load_directory(args["directory"], args["municipality"])))
+        if args["query"]:
+            print(json.dumps(store.search(args["query"]), indent=2, default=str))
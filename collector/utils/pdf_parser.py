@@ -1,49 +1,121 @@
 from pathlib import Path
 import fitz  # pymupdf
 import re
-from typing import Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, List, Optional, Union
+
+if TYPE_CHECKING:
+    import google.cloud.storage
+    from utils.gcp_storage import GCPStorage
+
+# PDF bytes of the current pool, handed to each worker once by _init_worker
+_worker_pdf_bytes: Optional[bytes] = None
+
+
+def _init_worker(pdf_bytes: Optional[bytes]):
+    global _worker_pdf_bytes
+    _worker_pdf_bytes = pdf_bytes
+
+
+def _extract_page_range(
+    pdf_path: Optional[str], start: int, stop: int, pdf_bytes: Optional[bytes] = None
+) -> List[str]:
+    """
+    Extract the text of pages [start, stop). Module-level so it can run in
+    worker processes; each call opens the document itself, from pdf_path,
+    pdf_bytes or the bytes given to the worker.
+    """
+    if pdf_path is None:
+        doc = fitz.open(stream=pdf_bytes or _worker_pdf_bytes, filetype="pdf")
+    else:
+        doc = fitz.open(pdf_path)
+    try:
+        return [doc[page_num].get_text() for page_num in range(start, stop)]
+    finally:
+        doc.close()
+
 
 class PDFParser:
+    # Documents with fewer pages are extracted in-process (a pool costs more than it saves)
+    PARALLEL_MIN_PAGES = 64
+    # Page ranges per worker; several smaller ranges even out slow pages
+    RANGES_PER_WORKER = 4
+
     @staticmethod
-    def extract_text_from_pdf(pdf_source: Union[Path, str, 'google.cloud.storage.Blob']) -> str:
+    def extract_text_from_pdf(
+        pdf_source: Union[Path, str, bytes, 'google.cloud.storage.Blob'],
+        storage: Optional['GCPStorage'] = None,
+        max_workers: Optional[int] = None,
+    ) -> str:
         """
         Extract full text from PDF file using pymupdf.
 
+        With max_workers > 1, large documents are split into page ranges
+        extracted in a process pool; every worker opens the document itself
+        and the page texts are joined back in page order.
+
         Args:
-            pdf_source: Path to PDF file (str/Path) or GCS Blob object
+            pdf_source: Path to PDF file (str/Path), PDF bytes or GCS Blob object
+            storage: GCPStorage whose read cache (cached_path) serves blobs, so
+                a blob is only downloaded once. None downloads blobs into memory.
+            max_workers: Worker processes for documents of at least
+                PARALLEL_MIN_PAGES pages (e.g. os.cpu_count()). None (default)
+                extracts everything in-process.
 
         Returns:
             Extracted text string
         """
         try:
+            pdf_path, pdf_bytes = None, None
             # Check if it's a GCS blob object
             if hasattr(pdf_source, 'download_as_bytes'):
-                # It's a GCS blob - download content to memory
-                pdf_bytes = pdf_source.download_as_bytes()
-                doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+                # It's a GCS blob - open the locally cached copy, or download content to memory
+                if storage is not None:
+                    pdf_path = str(storage.cached_path(pdf_source))
+                else:
+                    pdf_bytes = pdf_source.download_as_bytes()
+            elif isinstance(pdf_source, (bytes, bytearray, memoryview)):
+                pdf_bytes = bytes(pdf_source)
             else:
                 # It's a file path
-                doc = fitz.open(pdf_source)
-
-            text_parts = []
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                page_text = page.get_text()
-                text_parts.append(page_text)
+                pdf_path = str(pdf_source)
 
+            doc = fitz.open(pdf_path) if pdf_path else fitz.open(stream=pdf_bytes, filetype="pdf")
+            page_count = len(doc)
             doc.close()
 
-            full_text = "\n\n".join(text_parts)
-
-            # Clean up text - remove null bytes and control characters for PostgreSQL
-            full_text = full_text.replace("\x00", "")  # Remove null bytes
-            full_text = re.sub(
-                r"[\x01-\x08\x0b-\x0c\x0e-\x1f\x7f]", "", full_text
-            )  # Remove other control chars
-            full_text = re.sub(r"\n{3,}", "\n\n", full_text)
-            full_text = re.sub(r" {2,}", " ", full_text)
+            workers = min(max_workers or 1, page_count)
+            if workers <= 1 or page_count < PDFParser.PARALLEL_MIN_PAGES:
+                text_parts = _extract_page_range(pdf_path, 0, page_count, pdf_bytes)
+            else:
+                text_parts = PDFParser._extract_parallel(pdf_path, pdf_bytes, page_count, workers)
 
-            return full_text.strip()
+            return PDFParser.clean_text("\n\n".join(text_parts))
 
         except Exception as e:
-            raise Exception(f"Error extracting text from {pdf_source}: {e}")
\ No newline at end of file
+            raise Exception(f"Error extracting text from {pdf_source}: {e}")
+
+    @staticmethod
+    def _extract_parallel(
+        pdf_path: Optional[str], pdf_bytes: Optional[bytes], page_count: int, workers: int
+    ) -> List[str]:
+        step = -(-page_count // (workers * PDFParser.RANGES_PER_WORKER))
+        starts = list(range(0, page_count, step))
+        stops = [min(start + step, page_count) for start in starts]
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(pdf_bytes,)
+        ) as pool:
+            ranges = pool.map(_extract_page_range, [pdf_path] * len(starts), starts, stops)
+            return [text for page_texts in ranges for text in page_texts]
+
+    @staticmethod
+    def clean_text(full_text: str) -> str:
+        """Clean up text - remove null bytes and control characters for PostgreSQL."""
+        full_text = full_text.replace("\x00", "")  # Remove null bytes
+        full_text = re.sub(
+            r"[\x01-\x08\x0b-\x0c\x0e-\x1f\x7f]", "", full_text
+        )  # Remove other control chars
+        full_text = re.sub(r"\n{3,}", "\n\n", full_text)
+        full_text = re.sub(r" {2,}", " ", full_text)
+
+        return full_text.strip()
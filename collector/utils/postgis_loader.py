@@ -0,0 +1,342 @@
+"""
+Bulk PostGIS loader for downloaded layers
+-----------------------------------------
+Loads GeoDataFrames (or streamed GeoJSON features) into PostGIS through
+binary ``COPY``: geometries are sent as EWKB and attributes in their
+binary wire format, encoded chunk by chunk, so nothing is parsed as text
+on the server and memory stays bounded.
+
+A "replace" load runs in one transaction: the rows go into a fresh
+``<table>__staging`` table, the GiST index is built once all rows are in
+(much faster than maintaining it row by row), and the staging table is
+swapped in for the old one. Readers keep seeing the old table until the
+commit. The table is ANALYZEd afterwards so the planner knows its size.
+
+Usage:
+    python -m utils.postgis_loader --db-name spatial --file tmp/boston.geojson --table zoning.boston
+"""
+
+import itertools
+import json
+import logging
+import struct
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from psycopg2 import sql
+
+from utils.db_accessor import DBAccessor
+from utils.smart_arg_parser import SmartArgItem, SmartArgParser
+
+_NULL = struct.pack(">i", -1)
+# Binary timestamps count microseconds since 2000-01-01
+_PG_EPOCH_US = np.datetime64("2000-01-01T00:00:00", "us").astype(np.int64)
+
+
+def _fixed_width(values: np.ndarray, mask: np.ndarray, dtype: str) -> List[bytes]:
+    """Length-prefixed binary fields of a fixed-width column (NULL where mask)."""
+    width = np.dtype(dtype).itemsize
+    packed = np.empty(len(values), dtype=[("len", ">i4"), ("value", dtype)])
+    packed["len"] = width
+    packed["value"] = values
+    buf = packed.tobytes()
+    step = 4 + width
+    return [_NULL if null else buf[i * step:(i + 1) * step] for i, null in enumerate(mask)]
+
+
+def _varlena(values: Iterable[Optional[bytes]]) -> List[bytes]:
+    """Length-prefixed binary fields of a variable-width column (None is NULL)."""
+    return [_NULL if v is None else struct.pack(">i", len(v)) + v for v in values]
+
+
+def _text(value: Any) -> Optional[bytes]:
+    if value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).encode("utf-8")
+
+
+class PostGISLoader:
+    STAGING_SUFFIX = "__staging"
+
+    def __init__(
+        self,
+        db: DBAccessor,
+        chunk_rows: int = 50_000,
+        maintenance_work_mem: Optional[str] = "512MB",
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Args:
+            db: Accessor of the target database (PostGIS is enabled on first load).
+            chunk_rows: Features encoded at a time.
+            maintenance_work_mem: Memory for the GiST index build (None keeps
+                the server setting).
+            logger: Logger to use. Defaults to the module logger.
+        """
+        self.db = db
+        self.chunk_rows = chunk_rows
+        self.maintenance_work_mem = maintenance_work_mem
+        self.logger = logger or logging.getLogger(__name__)
+        self._postgis_enabled = False
+
+    # ------------------------------------------------------------------
+    # Schema and encoding
+    # ------------------------------------------------------------------
+    @staticmethod
+    def column_types(gdf: gpd.GeoDataFrame) -> Dict[str, str]:
+        """PostgreSQL type of each attribute column (everything else becomes text)."""
+        types = {}
+        for name, dtype in gdf.drop(columns=gdf.geometry.name).dtypes.items():
+            if pd.api.types.is_bool_dtype(dtype):
+                types[name] = "boolean"
+            elif pd.api.types.is_integer_dtype(dtype):
+                types[name] = "bigint"
+            elif pd.api.types.is_float_dtype(dtype):
+                types[name] = "double precision"
+            elif isinstance(dtype, pd.DatetimeTZDtype):
+                types[name] = "timestamptz"
+            elif pd.api.types.is_datetime64_dtype(dtype):
+                types[name] = "timestamp"
+            else:
+                types[name] = "text"
+        return types
+
+    @staticmethod
+    def _encode_column(series: pd.Series, pg_type: str) -> List[bytes]:
+        if pg_type in ("bigint", "double precision", "boolean"):
+            numeric = series if pg_type == "boolean" else pd.to_numeric(series, errors="coerce")
+            mask = numeric.isna().to_numpy()
+            if pg_type == "boolean":
+                return _fixed_width(numeric.fillna(False).astype(bool).to_numpy(), mask, "?")
+            if pg_type == "bigint":
+                return _fixed_width(numeric.fillna(0).astype(np.int64).to_numpy(), mask, ">i8")
+            return _fixed_width(numeric.fillna(0).astype(np.float64).to_numpy(), mask, ">f8")
+        if pg_type in ("timestamp", "timestamptz"):
+            stamps = pd.to_datetime(series, errors="coerce", utc=pg_type == "timestamptz")
+            mask = stamps.isna().to_numpy()
+            if pg_type == "timestamptz":
+                stamps = stamps.dt.tz_localize(None)
+            micros = stamps.to_numpy(dtype="datetime64[us]").astype(np.int64) - _PG_EPOCH_US
+            return _fixed_width(micros, mask, ">i8")
+        return _varlena(_text(v) for v in series.to_numpy(dtype=object))
+
+    def _encode_chunk(self, gdf: gpd.GeoDataFrame, types: Dict[str, str], srid: int) -> List[bytes]:
+        """Binary COPY tuples (attributes in `types` order, then the geometry)."""
+        columns = [
+            self._encode_column(gdf[name] if name in gdf.columns else pd.Series(None, index=gdf.index), pg_type)
+            for name, pg_type in types.items()
+        ]
+        wkb = shapely.to_wkb(shapely.set_srid(gdf.geometry.to_numpy(), srid), include_srid=True)
+        columns.append(_varlena(wkb))
+        field_count = struct.pack(">h", len(columns))
+        return [field_count + b"".join(fields) for fields in zip(*columns)]
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    def load_geodataframe(self, gdf: gpd.GeoDataFrame, table: str, **kwargs) -> int:
+        """
+        Load a GeoDataFrame into a PostGIS table (see load_chunks for kwargs).
+
+        Returns:
+            int: Number of rows loaded.
+        """
+        if gdf.crs is None or gdf.crs.to_epsg() is None:
+            raise ValueError("GeoDataFrame needs a CRS with an EPSG code to load into PostGIS")
+        chunks = (gdf.iloc[i:i + self.chunk_rows] for i in range(0, len(gdf), self.chunk_rows))
+        return self.load_chunks(chunks, table, srid=gdf.crs.to_epsg(), types=self.column_types(gdf), **kwargs)
+
+    def load_features(self, features: Iterable[Dict[str, Any]], table: str, srid: int = 4326, **kwargs) -> int:
+        """
+        Load GeoJSON-like feature dicts from any iterable (e.g. a streamed
+        download) without holding them all in memory. Column types are taken
+        from the first chunk; later properties not in it are ignored.
+
+        Returns:
+            int: Number of rows loaded.
+        """
+        features = iter(features)
+
+        def chunks():
+            while True:
+                batch = list(itertools.islice(features, self.chunk_rows))
+                if not batch:
+                    return
+                yield gpd.GeoDataFrame.from_features(batch, crs=f"EPSG:{srid}")
+
+        return self.load_chunks(chunks(), table, srid=srid, **kwargs)
+
+    def load_geojson(self, path: str, table: str, srid: int = 4326, **kwargs) -> int:
+        """Stream the features of a GeoJSON FeatureCollection file into a table."""
+        import ijson
+
+        with open(path, "rb") as f:
+            return self.load_features(ijson.items(f, "features.item", use_float=True), table, srid=srid, **kwargs)
+
+    def load_chunks(
+        self,
+        chunks: Iterable[gpd.GeoDataFrame],
+        table: str,
+        srid: int,
+        types: Optional[Dict[str, str]] = None,
+        geometry_column: str = "geom",
+        mode: str = "replace",
+    ) -> int:
+        """
+        Load GeoDataFrame chunks through one binary COPY.
+
+        Args:
+            chunks: GeoDataFrames with the same columns, in the given SRID.
+            table: Target table ("table" or "schema.table").
+            srid: SRID of the geometries.
+            types: {column: PostgreSQL type}. Defaults to column_types of the first chunk.
+            geometry_column: Name of the geometry column in the table.
+            mode: "replace" builds the table in staging and swaps it in;
+                "append" copies into the existing table (created if missing).
+
+        Returns:
+            int: Number of rows loaded.
+        """
+        if mode not in ("replace", "append"):
+            raise ValueError("mode must be 'replace' or 'append'")
+        if not self._postgis_enabled:
+            self.db.enable_postgis()
+            self._postgis_enabled = True
+
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            self.logger.warning(f"No features to load into {table}")
+            return 0
+        types = types or self.column_types(first)
+        columns = [*types, geometry_column]
+        tuples = (
+            row
+            for chunk in itertools.chain([first], chunks)
+            for row in self._encode_chunk(chunk, types, srid)
+        )
+
+        started = time.perf_counter()
+        with self.db.transaction():
+            if mode == "append" and self._table_exists(table):
+                count = self.db.copy_binary(table, columns, tuples)
+            else:
+                staging = table + self.STAGING_SUFFIX
+                self._create_table(staging, types, geometry_column, srid)
+                count = self.db.copy_binary(staging, columns, tuples)
+                self._create_spatial_index(staging, geometry_column)
+                self._swap(staging, table)
+        self.db.execute(sql.SQL("ANALYZE {}").format(DBAccessor.table_identifier(table)))
+
+        self.logger.info(f"✅ Loaded {count:,} features into {table} in {time.perf_counter() - started:.1f}s")
+        return count
+
+    # ------------------------------------------------------------------
+    # DDL
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _split(table: str) -> Tuple[Optional[str], str]:
+        schema, _, name = table.rpartition(".")
+        return schema or None, name
+
+    def _table_exists(self, table: str) -> bool:
+        with self.db.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s)", (table,))
+            return cur.fetchone()[0] is not None
+
+    def _create_table(self, table: str, types: Dict[str, str], geometry_column: str, srid: int):
+        definitions = [sql.SQL("{} {}").format(sql.Identifier(name), sql.SQL(pg_type)) for name, pg_type in types.items()]
+        definitions.append(
+            sql.SQL("{} geometry(Geometry, {})").format(sql.Identifier(geometry_column), sql.Literal(srid))
+        )
+        table_sql = DBAccessor.table_identifier(table)
+        schema, _ = self._split(table)
+        if schema:
+            self.db.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(schema)))
+        self.db.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(table_sql))
+        self.db.execute(sql.SQL("CREATE TABLE {} ({})").format(table_sql, sql.SQL(", ").join(definitions)))
+
+    def _create_spatial_index(self, table: str, geometry_column: str):
+        """GiST index on a loaded table (_swap renames it along with the table)."""
+        if self.maintenance_work_mem:
+            self.db.execute("SELECT set_config('maintenance_work_mem', %s, true)", (self.maintenance_work_mem,))
+        _, name = self._split(table)
+        index = f"{name}_{geometry_column}_gist"
+        self.db.execute(
+            sql.SQL("CREATE INDEX {} ON {} USING GIST ({})").format(
+                sql.Identifier(index), DBAccessor.table_identifier(table), sql.Identifier(geometry_column)
+            )
+        )
+
+    def _swap(self, staging: str, table: str):
+        """Replace table with staging (inside the caller's transaction)."""
+        schema, name = self._split(table)
+        _, staging_name = self._split(staging)
+        self.db.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(DBAccessor.table_identifier(table)))
+        self.db.execute(
+            sql.SQL("ALTER TABLE {} RENAME TO {}").format(DBAccessor.table_identifier(staging), sql.Identifier(name))
+        )
+        for (index,) in self._indexes(table):
+            if index.startswith(staging_name):
+                self.db.execute(
+                    sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                        DBAccessor.table_identifier(f"{schema}.{index}" if schema else index),
+                        sql.Identifier(name + index[len(staging_name):]),
+                    )
+                )
+
+    def _indexes(self, table: str) -> List[Tuple[str]]:
+        schema, name = self._split(table)
+        with self.db.cursor() as cur:
+            cur.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = %s AND schemaname = COALESCE(%s, current_schema())",
+                (name, schema),
+            )
+            return cur.fetchall()
+
+
+if __name__ == "__main__":
+    schema = {
+        "db_name": SmartArgItem(
+            flags=["--db-name"],
+            prompt="Target database name?",
+            arg_type=str,
+            required=True,
+        ),
+        "file": SmartArgItem(
+            flags=["--file"],
+            prompt="GeoJSON or GeoParquet file to load?",
+            arg_type=str,
+            required=True,
+        ),
+        "table": SmartArgItem(
+            flags=["--table"],
+            prompt="Target table (table or schema.table)?",
+            arg_type=str,
+            required=True,
+        ),
+        "mode": SmartArgItem(
+            flags=["--mode"],
+            prompt="Replace the table or append to it?",
+            arg_type=str,
+            required=False,
+            default="replace",
+            choices=["replace", "append"],
+        ),
+    }
+    parser = SmartArgParser(schema)
+    args = parser.parse()
+
+    logging.basicConfig(level=logging.INFO)
+    with DBAccessor(args["db_name"]) as db:
+        loader = PostGISLoader(db)
+        if args["file"].endswith(".parquet"):
+            loader.load_geodataframe(gpd.read_parquet(args["file"]), args["table"], mode=args["mode"])
+        else:
+            loader.load_geojson(args["file"], args["table"], mode=args["mode"])
@@ -0,0 +1,308 @@
+"""
+Fast raster previews of large GeoJSON layers
+--------------------------------------------
+Rasterizes GeoJSON geometries straight into a NumPy canvas instead of
+building a GeoDataFrame and drawing every polygon with matplotlib.
+
+Coordinates are mapped to pixels and decimated to at most one vertex per
+pixel, polygons are filled with a vectorized even-odd scanline fill and
+outlines/lines are stroked into a separate mask. Features can be added in
+batches (e.g. one DownloadJournal page at a time), so a preview of a
+million-feature layer never needs all features in memory.
+
+Only NumPy and the standard library are used (the PNG is encoded with zlib).
+"""
+
+import itertools
+import json
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Bounds = Tuple[float, float, float, float]
+
+
+class RasterPreview:
+    BACKGROUND = (255, 255, 255)
+    FILL_COLOR = (98, 160, 203)
+    EDGE_COLOR = (24, 62, 110)
+
+    def __init__(self, bounds: Bounds, width: int = 1024, max_height: int = 1024):
+        """
+        Args:
+            bounds: (xmin, ymin, xmax, ymax) of the area to render.
+            width: Maximum canvas width in pixels.
+            max_height: Maximum canvas height in pixels.
+        """
+        xmin, ymin, xmax, ymax = map(float, bounds)
+        # Pad degenerate extents (single point, horizontal line...)
+        pad = max(xmax - xmin, ymax - ymin) * 0.01 or 1e-6
+        if xmax - xmin < pad:
+            xmin, xmax = xmin - pad, xmax + pad
+        if ymax - ymin < pad:
+            ymin, ymax = ymin - pad, ymax + pad
+
+        self.res = max((xmax - xmin) / width, (ymax - ymin) / max_height)
+        self.width = max(1, int(np.ceil((xmax - xmin) / self.res)))
+        self.height = max(1, int(np.ceil((ymax - ymin) / self.res)))
+        self.xmin, self.ymax = xmin, ymax
+
+        # Span boundaries of the scanline fill, summed up in render()
+        self._fill_diff = np.zeros(self.height * (self.width + 1), dtype=np.int32)
+        self._edges = np.zeros((self.height, self.width), dtype=bool)
+        self.feature_count = 0
+
+    # ------------------------------------------------------------------
+    # Geometry flattening
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _flatten(features: Iterable[dict]) -> tuple:
+        """
+        Flatten GeoJSON features into one coordinate list.
+
+        Returns:
+            (coords, part_lengths, part_polygon, part_closed, n_features) where
+            part_polygon is the polygon index a ring belongs to (-1 for lines
+            and points) and part_closed marks polygon rings.
+        """
+        coords: List[Sequence[float]] = []
+        lengths: List[int] = []
+        polygon_ids: List[int] = []
+        closed: List[bool] = []
+        n_features = 0
+        n_polygons = 0
+
+        for feature in features:
+            n_features += 1
+            stack = [feature.get("geometry") if feature.get("type") == "Feature" else feature]
+            while stack:
+                geom = stack.pop()
+                if not geom:
+                    continue
+                gtype = geom.get("type")
+                parts = geom.get("coordinates")
+                if gtype == "GeometryCollection":
+                    stack.extend(geom.get("geometries") or [])
+                    continue
+                if not parts:
+                    continue
+                if gtype == "Point":
+                    parts, gtype = [[parts]], "MultiLineString"
+                elif gtype == "MultiPoint":
+                    parts, gtype = [[p] for p in parts], "MultiLineString"
+                elif gtype == "LineString":
+                    parts, gtype = [parts], "MultiLineString"
+                elif gtype == "Polygon":
+                    parts, gtype = [parts], "MultiPolygon"
+
+                if gtype == "MultiLineString":
+                    for line in parts:
+                        coords.extend(line)
+                        lengths.append(len(line))
+                        polygon_ids.append(-1)
+                        closed.append(False)
+                elif gtype == "MultiPolygon":
+                    for polygon in parts:
+                        for ring in polygon:
+                            coords.extend(ring)
+                            lengths.append(len(ring))
+                            polygon_ids.append(n_polygons)
+                            closed.append(True)
+                        n_polygons += 1
+
+        return coords, lengths, polygon_ids, closed, n_features
+
+    @staticmethod
+    def _coords_array(coords: list) -> np.ndarray:
+        if not coords:
+            return np.empty((0, 2))
+        flat = np.fromiter(itertools.chain.from_iterable(coords), dtype=float)
+        if len(flat) != 2 * len(coords):
+            # Z/M values present: keep only x and y
+            flat = np.fromiter(itertools.chain.from_iterable(c[:2] for c in coords), dtype=float)
+        return flat.reshape(-1, 2)
+
+    @classmethod
+    def feature_bounds(cls, features: Iterable[dict]) -> Optional[Bounds]:
+        """Bounds of GeoJSON features, or None if they have no coordinates."""
+        xy = cls._coords_array(cls._flatten(features)[0])
+        if not len(xy):
+            return None
+        return (*map(float, xy.min(axis=0)), *map(float, xy.max(axis=0)))
+
+    @staticmethod
+    def union_bounds(bounds: Iterable[Optional[Sequence[float]]]) -> Optional[Bounds]:
+        boxes = np.array([b for b in bounds if b], dtype=float).reshape(-1, 4)
+        if not len(boxes):
+            return None
+        return (*map(float, boxes[:, :2].min(axis=0)), *map(float, boxes[:, 2:].max(axis=0)))
+
+    # ------------------------------------------------------------------
+    # Rasterization
+    # ------------------------------------------------------------------
+    def add_features(self, features: Iterable[dict]):
+        """Rasterize a batch of GeoJSON features (or bare geometries) onto the canvas."""
+        coords, lengths, polygon_ids, closed, n_features = self._flatten(features)
+        self.feature_count += n_features
+        if not coords:
+            return
+
+        xy = self._coords_array(coords)
+        px = (xy[:, 0] - self.xmin) / self.res
+        py = (self.ymax - xy[:, 1]) / self.res
+
+        lengths = np.asarray(lengths)
+        part = np.repeat(np.arange(len(lengths)), lengths)
+
+        # Decimate: keep a vertex only if it falls in a different pixel than
+        # its predecessor within the same part
+        cell = np.floor(px).astype(np.int64) * (self.height + 1) + np.floor(py).astype(np.int64)
+        keep = np.ones(len(px), dtype=bool)
+        keep[1:] = (cell[1:] != cell[:-1]) | (part[1:] != part[:-1])
+        px, py, part = px[keep], py[keep], part[keep]
+
+        # Edge endpoints: next vertex in the part, wrapping around for rings
+        n = len(px)
+        last = np.ones(n, dtype=bool)
+        last[:-1] = part[1:] != part[:-1]
+        starts = np.flatnonzero(np.r_[True, part[1:] != part[:-1]])
+        part_start = np.repeat(starts, np.diff(np.r_[starts, n]))
+        nxt = np.arange(1, n + 1)
+        nxt[last] = part_start[last]
+
+        is_closed = np.asarray(closed)[part]
+        edge = ~last | is_closed
+        x0, y0, x1, y1 = px[edge], py[edge], px[nxt[edge]], py[nxt[edge]]
+
+        self._stroke(x0, y0, x1, y1)
+
+        # Single-vertex parts (points, lines/rings collapsed to one pixel)
+        single = last & (part_start == np.arange(n))
+        self._plot(px[single], py[single])
+
+        ring = edge & is_closed
+        polygon = np.asarray(polygon_ids)[part][ring]
+        self._fill(polygon, px[ring], py[ring], px[nxt[ring]], py[nxt[ring]])
+
+    def _plot(self, x: np.ndarray, y: np.ndarray):
+        # The extent's right/bottom edges (x == width, y == height) belong to the last pixel
+        inside = (x >= 0) & (x <= self.width) & (y >= 0) & (y <= self.height)
+        col = np.minimum(np.floor(x[inside]).astype(np.int64), self.width - 1)
+        row = np.minimum(np.floor(y[inside]).astype(np.int64), self.height - 1)
+        self._edges[row, col] = True
+
+    def _stroke(self, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray):
+        """Draw line segments by sampling them once per pixel step."""
+        if not len(x0):
+            return
+        steps = np.ceil(np.maximum(np.abs(x1 - x0), np.abs(y1 - y0))).astype(np.int64) + 1
+        seg = np.repeat(np.arange(len(x0)), steps)
+        k = np.arange(len(seg)) - np.repeat(np.cumsum(steps) - steps, steps)
+        t = k / np.maximum(steps - 1, 1)[seg]
+        self._plot(x0[seg] + (x1 - x0)[seg] * t, y0[seg] + (y1 - y0)[seg] * t)
+
+    def _fill(self, polygon: np.ndarray, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray):
+        """
+        Even-odd scanline fill of polygon rings given as edges.
+
+        Every edge is intersected with the pixel-row centers it spans; the
+        crossings of each (polygon, row) are sorted and paired into spans,
+        whose start/end are accumulated into a difference array.
+        """
+        horizontal = y0 == y1
+        polygon, x0, y0, x1, y1 = (a[~horizontal] for a in (polygon, x0, y0, x1, y1))
+        if not len(x0):
+            return
+
+        # Rows whose center lies in [min(y0, y1), max(y0, y1))
+        r0 = np.ceil(np.minimum(y0, y1) - 0.5).astype(np.int64)
+        r1 = np.ceil(np.maximum(y0, y1) - 0.5).astype(np.int64)
+        counts = np.maximum(r1 - r0, 0)
+        if not counts.sum():
+            return
+
+        e = np.repeat(np.arange(len(x0)), counts)
+        row = r0[e] + np.arange(len(e)) - np.repeat(np.cumsum(counts) - counts, counts)
+        x = x0[e] + (row + 0.5 - y0[e]) * (x1 - x0)[e] / (y1 - y0)[e]
+
+        # Each (polygon, row) has an even number of crossings, so pairing
+        # consecutive sorted crossings yields the interior spans
+        order = np.lexsort((x, row, polygon[e]))
+        row, x = row[order], x[order]
+        row, xs, xe = row[0::2], x[0::2], x[1::2]
+
+        inside = (row >= 0) & (row < self.height)
+        row, xs, xe = row[inside], xs[inside], xe[inside]
+        cs = np.clip(np.ceil(xs - 0.5).astype(np.int64), 0, self.width)
+        ce = np.clip(np.ceil(xe - 0.5).astype(np.int64), 0, self.width)
+        span = ce > cs
+        base = row[span] * (self.width + 1)
+        size = len(self._fill_diff)
+        self._fill_diff += np.bincount(base + cs[span], minlength=size).astype(np.int32)
+        self._fill_diff -= np.bincount(base + ce[span], minlength=size).astype(np.int32)
+
+    def add_page(self, page_path: str):
+        """Rasterize a DownloadJournal page file (comma-separated GeoJSON features)."""
+        text = Path(page_path).read_text(encoding="utf-8")
+        if text.strip():
+            self.add_features(json.loads(f"[{text}]"))
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+    def render(self) -> np.ndarray:
+        """Return the preview as an (height, width, 3) uint8 RGB array."""
+        filled = np.cumsum(self._fill_diff.reshape(self.height, self.width + 1), axis=1)[:, :self.width] > 0
+        image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        image[:] = self.BACKGROUND
+        image[filled] = self.FILL_COLOR
+        image[self._edges] = self.EDGE_COLOR
+        return image
+
+    def save_png(self, out_path: str) -> str:
+        """Encode the preview as an 8-bit RGB PNG."""
+        image = self.render()
+        # Filter type 0 (None) byte in front of every scanline
+        raw = np.concatenate([np.zeros((self.height, 1), dtype=np.uint8), image.reshape(self.height, -1)], axis=1)
+
+        def chunk(tag: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+        with open(out_path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            f.write(chunk(b"IHDR", header))
+            f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+            f.write(chunk(b"IEND", b""))
+        return str(out_path)
+
+    @classmethod
+    def from_pages(
+        cls,
+        pages: Sequence[str],
+        bounds: Optional[Bounds] = None,
+        width: int = 1024,
+        max_height: int = 1024,
+    ) -> "RasterPreview":
+        """
+        Render page files one at a time.
+
+        Args:
+            pages: DownloadJournal page files.
+            bounds: Extent to render. If omitted, an extra pass over the pages computes it.
+            width: Maximum canvas width in pixels.
+            max_height: Maximum canvas height in pixels.
+        """
+        if bounds is None:
+            bounds = cls.union_bounds(
+                cls.feature_bounds(json.loads(f"[{text}]"))
+                for text in (Path(p).read_text(encoding="utf-8") for p in pages)
+                if text.strip()
+            )
+        preview = cls(bounds or (0.0, 0.0, 1.0, 1.0), width=width, max_height=max_height)
+        for page in pages:
+            preview.add_page(page)
+        return preview
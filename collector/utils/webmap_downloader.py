@@ -0,0 +1,178 @@
+"""
+Webmap-driven multi-layer download
+----------------------------------
+Reads an ArcGIS web map definition (e.g. ``webmap.json``) and downloads
+every feature-layer in ``operationalLayers`` concurrently.
+
+Each layer's ``definitionExpression`` is pushed to the server as the
+``where`` clause, and only the fields its renderer and labels reference
+are requested, so filtered-out features and unused columns never leave
+the server.
+
+Usage:
+    python -m utils.webmap_downloader --webmap ../webmap.json --output_dir tmp/webmap
+"""
+
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from utils.featureserver_downloader import FeatureServerDownloader
+from utils.smart_arg_parser import SmartArgItem, SmartArgParser
+
+
+class WebmapDownloader:
+    # Renderer / visual-variable keys that name attribute fields
+    RENDERER_FIELD_KEYS = ("field", "field1", "field2", "field3", "normalizationField")
+
+    # Arcade $feature.FIELD / $feature["FIELD"] and label [FIELD] references
+    ARCADE_FIELD = re.compile(r"\$feature(?:\.(\w+)|\[\s*[\"'](\w+)[\"']\s*\])")
+    LABEL_FIELD = re.compile(r"\[(\w+)\]")
+
+    def __init__(
+        self,
+        downloader: Optional[FeatureServerDownloader] = None,
+        logger: Optional[logging.Logger] = None,
+        max_workers: int = 4,
+    ):
+        """
+        Args:
+            downloader: Downloader used per layer. Defaults to a new FeatureServerDownloader.
+            logger: Logger to use. Defaults to the module logger.
+            max_workers: Number of layers downloaded concurrently.
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.downloader = downloader or FeatureServerDownloader(logger=self.logger)
+        self.max_workers = max_workers
+
+    @staticmethod
+    def feature_layers(webmap: dict) -> List[dict]:
+        """
+        Flatten ``operationalLayers`` (including group layers) into the
+        feature layers that can be queried.
+
+        Returns:
+            List of dicts with ``id``, ``title``, ``url``, ``where`` and
+            ``out_fields``.
+        """
+        layers = []
+        stack = list(reversed(webmap.get("operationalLayers", [])))
+        while stack:
+            layer = stack.pop()
+            if layer.get("layers"):
+                stack.extend(reversed(layer["layers"]))
+                continue
+            url = (layer.get("url") or "").rstrip("/")
+            if not re.search(r"/(FeatureServer|MapServer)/\d+$", url):
+                continue
+            definition = layer.get("layerDefinition") or {}
+            layers.append({
+                "id": layer.get("id"),
+                "title": layer.get("title") or layer.get("id"),
+                "url": url,
+                "where": definition.get("definitionExpression") or "1=1",
+                "out_fields": WebmapDownloader.used_fields(layer),
+            })
+        return layers
+
+    @staticmethod
+    def used_fields(layer: dict) -> List[str]:
+        """
+        Collect the fields referenced by a layer's renderer and labels.
+
+        Returns:
+            Sorted field names. Empty when nothing is referenced, in which
+            case only the ObjectID field is requested.
+        """
+        drawing_info = (layer.get("layerDefinition") or {}).get("drawingInfo") or {}
+        fields = set()
+
+        def walk(node):
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    if key in WebmapDownloader.RENDERER_FIELD_KEYS and isinstance(value, str):
+                        fields.add(value)
+                    elif key in ("valueExpression", "expression") and isinstance(value, str):
+                        fields.update(a or b for a, b in WebmapDownloader.ARCADE_FIELD.findall(value))
+                    elif key == "labelExpression" and isinstance(value, str):
+                        fields.update(WebmapDownloader.LABEL_FIELD.findall(value))
+                    else:
+                        walk(value)
+            elif isinstance(node, list):
+                for item in node:
+                    walk(item)
+
+        walk(drawing_info.get("renderer"))
+        if layer.get("showLabels", True):
+            walk(drawing_info.get("labelingInfo"))
+        return sorted(fields)
+
+    def download(self, webmap: Union[str, Path, dict], output_dir: str) -> List[Dict[str, Any]]:
+        """
+        Download every feature layer of a web map into ``output_dir``.
+
+        Args:
+            webmap: Path to a web map JSON file, or the parsed definition.
+            output_dir: Directory for ``<layer title>.geojson`` files.
+
+        Returns:
+            Per-layer result dicts from ``download_layer_as_geojson``; failed
+            layers are reported with an ``error`` key.
+        """
+        if not isinstance(webmap, dict):
+            webmap = json.loads(Path(webmap).read_text())
+        layers = self.feature_layers(webmap)
+        self.logger.info(f"Found {len(layers)} feature layers in web map")
+
+        filenames = {}
+        for layer in layers:
+            safe_title = re.sub(r"[^\w\s-]", "", layer["title"]).strip().replace(" ", "_") or "layer"
+            filename = f"{safe_title}.geojson"
+            if filename in filenames.values():
+                filename = f"{safe_title}_{layer['id']}.geojson"
+            filenames[layer["id"]] = filename
+
+        def download_layer(layer):
+            self.logger.info(f"Downloading {layer['title']} where {layer['where']} (fields={layer['out_fields']})")
+            try:
+                return self.downloader.download_layer_as_geojson(
+                    layer["url"],
+                    output_dir,
+                    filenames[layer["id"]],
+                    where=layer["where"],
+                    out_fields=layer["out_fields"],
+                    layer_name=layer["title"],
+                )
+            except Exception as e:
+                self.logger.error(f"Error downloading layer {layer['title']}: {e}")
+                return {"layer_name": layer["title"], "url": layer["url"], "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(download_layer, layers))
+
+
+if __name__ == "__main__":
+    schema = {
+        "webmap": SmartArgItem(
+            flags=["--webmap"],
+            prompt="Path to the web map JSON?",
+            arg_type=str,
+            required=True,
+        ),
+        "output_dir": SmartArgItem(
+            flags=["--output_dir"],
+            prompt="Output directory?",
+            arg_type=str,
+            required=True,
+        ),
+    }
+    parser = SmartArgParser(schema)
+    args = parser.parse()
+
+    logging.basicConfig(level=logging.INFO)
+    results = WebmapDownloader().download(args["webmap"], args["output_dir"])
+    for result in results:
+        print(json.dumps({k: v for k, v in result.items() if k != "profile_params"}))
@@ -4,6 +4,7 @@ from abc import ABC, abstractmethod
 import logging
 import os
 import sys
+from pathlib import Path
 
 
 class ZoningOrdinanceBaseCollector(BaseCollector, ABC):
@@ -25,7 +26,10 @@ class ZoningOrdinanceBaseCollector(BaseCollector, ABC):
         if self.bucket_name and self.gcp_project:
             try:
                 self.gcp_storage = GCPStorage(
-                    gcp_project=self.gcp_project, bucket_name=self.bucket_name
+                    gcp_project=self.gcp_project,
+                    bucket_name=self.bucket_name,
+                    max_workers=int(os.environ.get("GCS_UPLOAD_WORKERS", 8)),
+                    logger=self.logger,
                 )
                 self.logger.info("GCS connection established")
             except Exception as e:
@@ -55,7 +59,29 @@ class ZoningOrdinanceBaseCollector(BaseCollector, ABC):
         """Upload the data to the database."""
         pass
 
-    @abstractmethod
-    def upload_to_gcs(self):
-        """Upload the data to GCS."""
-        pass
+    def upload_to_gcs(self, downloaded_files: list) -> list:
+        """
+        Upload downloaded files to GCS concurrently, skipping files whose
+        content is already in the bucket.
+
+        Returns:
+            Per-file results from GCPStorage.upload_files (empty if GCS is not configured).
+        """
+        if not self.gcp_storage:
+            self.logger.warning("GCS not configured, skipping upload")
+            return []
+
+        parent = self.gcp_storage_parent_directory()
+        results = self.gcp_storage.upload_files(
+            [(str(file_path), f"{parent}/{Path(file_path).name}") for file_path in downloaded_files],
+            skip_unchanged=True,
+        )
+        failed = [r for r in results if not r["ok"]]
+        skipped = [r for r in results if r["skipped"]]
+        self.logger.info(
+            f"Uploaded {len(results) - len(failed) - len(skipped)}/{len(results)} files to GCS "
+            f"({len(skipped)} unchanged)"
+        )
+        if failed:
+            self.logger.error(f"❌ {len(failed)} uploads failed: {', '.join(Path(r['file']).name for r in failed)}")
+        return results
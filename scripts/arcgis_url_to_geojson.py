@@ -3,22 +3,51 @@
 Download GeoJSON from ArcGIS map viewer links and display a preview.
 
 Usage:
-    python arcgis_url_to_geojson.py <arcgis_url> [output_file]
+    python arcgis_url_to_geojson.py <arcgis_url> [output_file] [--format auto|pbf|geojson]
+        [--geoparquet DATASET_ROOT --state STATE --city CITY] [--preview raster|matplotlib|none]
+
+Options:
+    output_file         Output GeoJSON path (defaults to the item title).
+    --format            Query transfer format: "auto" (default) uses f=pbf
+                        when the layer supports it, "pbf" forces it,
+                        "geojson" always requests f=geojson.
+    --geoparquet ROOT   Also write the layer into the partitioned GeoParquet
+                        dataset under ROOT; needs --state and --city for the
+                        partition (e.g. --state MA --city boston).
+    --preview           Preview PNG renderer: "raster" (default, NumPy),
+                        "matplotlib" (geopandas plot) or "none".
 
 Examples:
     python arcgis_url_to_geojson.py "https://boston.maps.arcgis.com/apps/mapviewer/index.html?layers=fffb5de90c814daabf2cfd5538b8d22c"
     python arcgis_url_to_geojson.py "https://boston.maps.arcgis.com/apps/mapviewer/index.html?layers=fffb5de90c814daabf2cfd5538b8d22c" output.geojson
 
+Features are transferred as protocol buffers (f=pbf) when the layer supports
+it and the collector package is importable; otherwise f=geojson is used.
+With --geoparquet the layer is also written into the partitioned GeoParquet
+dataset (state=/city=/_source_layer=) used by the collector.
+
+Pages are checkpointed to <output_file>.parts/ while downloading; if the
+download is interrupted, re-running the same command resumes from the last
+completed page.
+
+The preview PNG is rasterized directly from those page files with NumPy
+(--preview raster, the default), which takes seconds even for statewide
+parcel layers; --preview matplotlib renders it with geopandas instead.
+
 Requirements:
-    pip install requests geopandas matplotlib
+    pip install requests numpy
+    Optional: shapely (f=pbf transfer), geopandas and pyarrow (--geoparquet),
+    geopandas and matplotlib (--preview matplotlib)
 """
 
+import argparse
 import json
 import os
 import platform
 import re
 import subprocess
 import sys
+from pathlib import Path
 from urllib.parse import parse_qs, urlparse
 
 import requests
@@ -76,8 +105,100 @@ def get_feature_service_url(item_info: dict) -> str:
     raise ValueError("Could not find feature service URL in item info")
 
 
-def query_features_geojson(service_url: str, layer_index: int = 0) -> dict:
-    """Query all features from a feature service and return as GeoJSON."""
+def add_collector_to_path():
+    """Make the collector's utils package importable from this script."""
+    collector_dir = Path(__file__).resolve().parent.parent / "collector"
+    if str(collector_dir) not in sys.path:
+        sys.path.insert(0, str(collector_dir))
+
+
+def load_pbf_support():
+    """
+    Import the collector's f=pbf decoder and geometry converter.
+
+    Returns (EsriPbfDecoder, EsriGeometryConverter), or None if the collector
+    package or its dependencies (numpy, shapely) are not available.
+    """
+    add_collector_to_path()
+    try:
+        from utils.esri_geometry import EsriGeometryConverter
+        from utils.esri_pbf import EsriPbfDecoder
+    except ImportError:
+        return None
+    return EsriPbfDecoder, EsriGeometryConverter
+
+
+def load_raster_preview():
+    """Import the collector's RasterPreview, or return None if NumPy is missing."""
+    add_collector_to_path()
+    try:
+        from utils.raster_preview import RasterPreview
+    except ImportError:
+        return None
+    return RasterPreview
+
+
+def esri_to_geojson_features(data: dict, converter) -> list:
+    """Convert the features of an ESRI (f=json shaped) response into GeoJSON features."""
+    from shapely.geometry import mapping
+
+    features = data.get("features", [])
+    oid_field = data.get("objectIdFieldName")
+    geometries = converter.to_shapely([f.get("geometry") for f in features])
+
+    geojson_features = []
+    for feature, geometry in zip(features, geometries):
+        attrs = feature.get("attributes") or {}
+        geojson_feature = {
+            "type": "Feature",
+            "geometry": mapping(geometry) if geometry is not None else None,
+            "properties": attrs,
+        }
+        if oid_field and oid_field in attrs:
+            geojson_feature["id"] = attrs[oid_field]
+        geojson_features.append(geojson_feature)
+    return geojson_features
+
+
+def query_page(query_url: str, params: dict, pbf_support) -> tuple[dict, list]:
+    """
+    Fetch one page of features. Returns (response, GeoJSON features).
+
+    Uses f=pbf when pbf_support is given and falls back to f=geojson if the
+    server rejects the protocol-buffer request.
+    """
+    if pbf_support:
+        decoder, converter = pbf_support
+        pbf_params = {
+            **params,
+            "f": "pbf",
+            "outSR": 4326,
+            "quantizationParameters": json.dumps(
+                {"mode": "edit", "originPosition": "upperLeft", "tolerance": 1e-8}
+            ),
+        }
+        response = requests.get(query_url, params=pbf_params)
+        if response.ok and "json" not in response.headers.get("Content-Type", ""):
+            try:
+                data = decoder.decode(response.content)
+                return data, esri_to_geojson_features(data, converter)
+            except (ValueError, IndexError) as e:
+                print(f"  PBF decode failed ({e}), falling back to GeoJSON")
+        else:
+            print("  PBF query rejected, falling back to GeoJSON")
+
+    response = requests.get(query_url, params={**params, "f": "geojson"})
+    response.raise_for_status()
+    data = response.json()
+
+    if "error" in data:
+        raise ValueError(f"ArcGIS API error: {data['error']}")
+
+    return data, data.get("features", [])
+
+
+def layer_query_setup(service_url: str, layer_index: int, transfer_format: str) -> tuple[str, tuple]:
+    """Return the layer's query URL and the pbf support to use for it (or None)."""
     # Ensure we're querying a specific layer
     if not service_url.endswith(f"/{layer_index}"):
         if service_url.endswith("/"):
@@ -85,58 +206,104 @@ def query_features_geojson(service_url: str, layer_index: int = 0) -> dict:
         else:
             service_url = f"{service_url}/{layer_index}"
 
-    query_url = f"{service_url}/query"
+    pbf_support = None
+    if transfer_format != "geojson":
+        pbf_support = load_pbf_support()
+        if pbf_support and transfer_format == "auto":
+            layer_info = requests.get(service_url, params={"f": "json"}).json()
+            if not pbf_support[0].is_supported(layer_info):
+                pbf_support = None
+
+    return f"{service_url}/query", pbf_support
+
+
+def download_features_to_file(
+    service_url: str,
+    output_file: str,
+    layer_index: int = 0,
+    transfer_format: str = "auto",
+    preview_title: str = None,
+    page_handler=None,
+) -> tuple[int, str]:
+    """
+    Download all features page by page into a GeoJSON file, resumably.
+
+    Every page is committed to <output_file>.parts/ as soon as it arrives and
+    the final file is assembled by streaming the pages, so features are never
+    all held in memory. An existing journal for the same layer is resumed.
+    With preview_title, a raster preview is rendered from the same pages.
+    page_handler, if given, is called with the GeoJSON features of each page
+    in order, one page at a time.
+
+    Returns (number of features written, preview image path or None).
+    """
+    add_collector_to_path()
+    from utils.download_journal import DownloadJournal
+
+    query_url, pbf_support = layer_query_setup(service_url, layer_index, transfer_format)
+    journal = DownloadJournal(
+        f"{output_file}.parts",
+        key={"url": query_url, "format": "pbf" if pbf_support else "geojson"},
+    )
+    if journal.resumed:
+        print(f"  Resuming: {journal.feature_count()} features already downloaded")
+    raster_preview = load_raster_preview() if preview_title else None
 
-    all_features = []
     offset = 0
     batch_size = 1000  # ArcGIS typically limits to 1000-2000 per request
 
-    print(f"Querying: {query_url}")
+    print(f"Querying: {query_url} (format={'pbf' if pbf_support else 'geojson'})")
 
     while True:
+        done = journal.entry(f"offset:{offset}")
+        if done:
+            offset += done["count"]
+            if done["count"] < batch_size:
+                break
+            continue
+
         params = {
-            "where": "1=1",  # Get all features
-            "outFields": "*",  # Get all fields
-            "f": "geojson",
+            "where": "1=1",
+            "outFields": "*",
             "resultOffset": offset,
             "resultRecordCount": batch_size,
         }
-
-        response = requests.get(query_url, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        if "error" in data:
-            raise ValueError(f"ArcGIS API error: {data['error']}")
-
-        features = data.get("features", [])
+        data, features = query_page(query_url, params, pbf_support)
         if not features:
             break
 
-        all_features.extend(features)
-        print(f"  Downloaded {len(all_features)} features...")
+        # Preserve CRS if present
+        if "crs" in data and journal.get("crs") is None:
+            journal.set("crs", data["crs"])
+        # Page bounds let the preview size its canvas without re-reading pages
+        bbox = raster_preview.feature_bounds(features) if raster_preview else None
+        journal.commit_page(f"offset:{offset}", features, count=len(features), bbox=bbox)
+        print(f"  Downloaded {journal.feature_count()} features...")
 
-        # Check if we got fewer than requested (means we're done)
         if len(features) < batch_size:
             break
-
-        offset += batch_size
-
-    # Build complete GeoJSON
-    geojson = {
-        "type": "FeatureCollection",
-        "features": all_features,
-    }
-
-    # Preserve CRS if present
-    if "crs" in data:
-        geojson["crs"] = data["crs"]
-
-    return geojson
-
-
-def download_arcgis_geojson(url: str) -> tuple[dict, str]:
-    """Main function to download GeoJSON from an ArcGIS URL."""
+        offset += len(features)
+
+    count = journal.merge_geojson(output_file, crs=journal.get("crs"))
+    image_path = None
+    if raster_preview:
+        records = journal.entries.values()
+        bounds = None
+        # Pages resumed from a run without preview have no bbox; from_pages then scans them
+        if all(r.get("bbox") or not r["features"] for r in records):
+            bounds = raster_preview.union_bounds(r.get("bbox") for r in records)
+        image_path = render_preview(raster_preview, journal.pages(), bounds, preview_title, output_file)
+    if page_handler:
+        for page in journal.pages():
+            text = page.read_text(encoding="utf-8")
+            if text.strip():
+                page_handler(json.loads(f"[{text}]"))
+    journal.remove()
+    return count, image_path
+
+
+def resolve_arcgis_url(url: str) -> tuple[str, str]:
+    """Resolve an ArcGIS map viewer or item URL. Returns (title, service URL)."""
     print(f"Parsing URL: {url}")
     base_domain, layer_id = extract_layer_id(url)
     print(f"  Domain: {base_domain}")
@@ -150,38 +317,80 @@ def download_arcgis_geojson(url: str) -> tuple[dict, str]:
 
     service_url = get_feature_service_url(item_info)
     print(f"  Service URL: {service_url}")
+    return title, service_url
 
-    print("Downloading features...")
-    geojson = query_features_geojson(service_url)
-    print(f"  Total features: {len(geojson['features'])}")
 
-    return geojson, title
+def write_geoparquet(gdf, title: str, dataset_root: str, state: str, city: str) -> list:
+    """Write the downloaded features into the partitioned GeoParquet dataset."""
+    add_collector_to_path()
+    from utils.geoparquet_store import GeoParquetStore
 
+    files = GeoParquetStore(dataset_root).write(gdf, state=state, city=city, layer_name=title)
+    for path in files:
+        print(f"Saved to: {path}")
+    return files
 
-def plot_geojson(geojson: dict, title: str, output_path: str) -> str:
-    """Plot GeoJSON and save as image. Returns the image path."""
+
+def page_frame_collector():
+    """
+    Build a GeoDataFrame page by page from download_features_to_file's pages.
+
+    Returns (page_handler, finish): pass page_handler to the download, then
+    call finish() for the GeoDataFrame. Returns (None, None) without geopandas.
+    """
     try:
         import geopandas as gpd
+        import pandas as pd
+    except ImportError:
+        return None, None
+
+    frames = []
+
+    def page_handler(features: list):
+        frames.append(gpd.GeoDataFrame.from_features(features, crs="EPSG:4326"))
+
+    def finish():
+        if not frames:
+            return gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
+        return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs="EPSG:4326")
+
+    return page_handler, finish
+
+
+def preview_image_path(output_path: str) -> str:
+    return output_path.rsplit(".", 1)[0] + ".png" if output_path else "/tmp/geojson_preview.png"
+
+
+def render_preview(raster_preview, pages: list, bounds: tuple, title: str, output_path: str) -> str:
+    """Rasterize downloaded page files into a PNG preview. Returns the image path."""
+    print("Generating preview image...")
+    preview = raster_preview.from_pages(pages, bounds=bounds)
+    image_path = preview.save_png(preview_image_path(output_path))
+    print(f"  {title}: {preview.feature_count} features, {preview.width}x{preview.height} px")
+    print(f"  Preview saved to: {image_path}")
+    return image_path
+
+
+def plot_geodataframe(gdf, title: str, output_path: str) -> str:
+    """Plot the downloaded features and save as image. Returns the image path."""
+    try:
         import matplotlib.pyplot as plt
     except ImportError:
-        print("Warning: geopandas/matplotlib not installed. Skipping preview.")
+        print("Warning: matplotlib not installed. Skipping preview.")
         print("  Install with: pip install geopandas matplotlib")
         return None
 
     print("Generating preview image...")
 
-    # Convert GeoJSON to GeoDataFrame
-    gdf = gpd.GeoDataFrame.from_features(geojson["features"])
-
     # Create figure
     fig, ax = plt.subplots(1, 1, figsize=(12, 10))
     gdf.plot(ax=ax, edgecolor="black", linewidth=0.3, alpha=0.7)
-    ax.set_title(f"{title}\n({len(geojson['features'])} features)", fontsize=12)
+    ax.set_title(f"{title}\n({len(gdf)} features)", fontsize=12)
     ax.set_xlabel("Longitude")
     ax.set_ylabel("Latitude")
 
     # Save image
-    image_path = output_path.rsplit(".", 1)[0] + ".png" if output_path else "/tmp/geojson_preview.png"
+    image_path = preview_image_path(output_path)
     plt.savefig(image_path, dpi=150, bbox_inches="tight")
     plt.close()
 
@@ -211,27 +420,71 @@ def open_image(image_path: str):
 
 
 def main():
-    if len(sys.argv) < 2:
-        print(__doc__)
-        sys.exit(1)
-
-    url = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    parser = argparse.ArgumentParser(
+        description="Download GeoJSON from an ArcGIS map viewer link and display a preview."
+    )
+    parser.add_argument("url", help="ArcGIS map viewer or item URL")
+    parser.add_argument("output_file", nargs="?", help="Output GeoJSON path (defaults to the item title)")
+    parser.add_argument(
+        "--format",
+        dest="transfer_format",
+        choices=["auto", "pbf", "geojson"],
+        default="auto",
+        help="Query transfer format (default: pbf when supported)",
+    )
+    parser.add_argument("--geoparquet", metavar="DATASET_ROOT", help="Also write to a partitioned GeoParquet dataset")
+    parser.add_argument("--state", help="State partition for --geoparquet (e.g. MA)")
+    parser.add_argument("--city", help="City partition for --geoparquet (e.g. boston)")
+    parser.add_argument(
+        "--preview",
+        choices=["raster", "matplotlib", "none"],
+        default="raster",
+        help="Preview renderer (default: fast NumPy raster)",
+    )
+    args = parser.parse_args()
+    if args.geoparquet and not (args.state and args.city):
+        parser.error("--geoparquet requires --state and --city")
+
+    url = args.url
+    output_file = args.output_file
 
     try:
-        geojson, title = download_arcgis_geojson(url)
+        title, service_url = resolve_arcgis_url(url)
 
         if not output_file:
             # Default to project root with sanitized title
             safe_title = re.sub(r'[^\w\s-]', '', title).strip().replace(' ', '_')
             output_file = f"{safe_title}.geojson"
 
-        with open(output_file, "w") as f:
-            json.dump(geojson, f)
+        raster_preview = args.preview == "raster" and load_raster_preview() is not None
+        page_handler, finish = None, None
+        # GeoParquet output and the matplotlib preview are built from the
+        # downloaded pages, one page at a time, instead of re-reading the merged file
+        if args.geoparquet or (args.preview != "none" and not raster_preview):
+            page_handler, finish = page_frame_collector()
+            if page_handler is None:
+                if args.geoparquet:
+                    raise ImportError("--geoparquet requires geopandas")
+                print("Warning: geopandas not installed. Skipping preview.")
+
+        print("Downloading features...")
+        count, image_path = download_features_to_file(
+            service_url,
+            output_file,
+            transfer_format=args.transfer_format,
+            preview_title=title if raster_preview else None,
+            page_handler=page_handler,
+        )
+        print(f"  Total features: {count}")
         print(f"Saved to: {output_file}")
 
-        # Generate and display preview
-        image_path = plot_geojson(geojson, title, output_file)
+        gdf = finish() if finish else None
+        if args.geoparquet:
+            write_geoparquet(gdf, title, args.geoparquet, args.state, args.city)
+
+        # Generate and display preview (matplotlib if NumPy rasterizing is unavailable)
+        if gdf is not None and args.preview != "none" and not image_path:
+            image_path = plot_geodataframe(gdf, title, output_file)
         if image_path:
             open_image(image_path)
 